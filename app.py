@@ -1,193 +1,417 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from lib.config import SessionLocal, engine
-from lib.base import Base
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from lib.config import AsyncSessionLocal, ensure_schema, get_engine
 from lib.models.customer import Customer
 from lib.models.service import Service
-from lib.models.appointment import Appointment
-from lib.models.payment import Payment
+from lib.models.staff import Staff
+from lib.models.appointment import EXPANDABLE, Appointment, BookingConflictError, parse_expand
+from lib.models.payment import MAX_IDEMPOTENCY_KEY_LENGTH, IdempotencyKeyReusedError, Payment, PaymentAlreadyRefundedError
 from lib.models.inventory import Inventory
 from lib.models.service_inventory import ServiceInventory
-from lib.models.appointment_inventory import AppointmentInventory
-from datetime import datetime
+from lib.models.appointment_inventory import AppointmentInventory, InsufficientStockError
+from lib.models.rollup import RevenueRollup, UsageRollup
+from lib.models.change import MAX_FEED_PAGE
+from lib.models.archive import get_archived, with_archive
+from lib.schemas import (
+    AppointmentRequest, AppointmentOut, AppointmentDetailOut, AvailableSlotOut, BulkBookingResultOut, ChangeFeedOut, CompletionOut,
+    CustomerOut, InventoryOut, MessageOut, PaymentOut, RevenueReportOut, ServiceOut, StaffOut, UsageReportOut,
+)
+from lib.scheduling import find_available_slots
+from lib.stock_alerts import DEFAULT_REORDER_THRESHOLD, stock_events
+from lib.broadcast import sse_events
+from lib.schedule_board import sse_schedule
+from lib.change_feed import MAX_WAIT_SECONDS, parse_entities, poll_changes, sse_changes
+from lib.metrics import MetricsMiddleware, render as render_metrics
+from lib.write_queue import WRITE_QUEUE_ENABLED, WriteQueue
+from lib.versioning import VersionConflictError
+from lib.cache import catalog_cache
+from lib.serialization import dumps
+from lib.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page, aiter_ndjson
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+MAX_BULK_APPOINTMENTS = 500
+
+# Create the schema (dev/test) once the server starts rather than at import time
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global writer
+    ensure_schema()
+    if WRITE_QUEUE_ENABLED:
+        writer = WriteQueue(get_engine())
+        writer.start()
+    yield
+    if writer is not None:
+        writer.stop()
+        writer = None
+
+# Single group-commit writer for the mutating endpoints, when SPA_WRITE_QUEUE=1
+writer = None
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
-def home():
+async def home():
     return {"message": "Welcome to Rejuvenate Spa!"}
 
-# Create database tables on startup
-Base.metadata.create_all(bind=engine)
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-# Dependency for database session
-def get_db():
-    db = SessionLocal()
-    try:
+# Dependency for async database session
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# Runs a committing model method (e.g. Customer.create) on the group-commit writer if enabled
+async def write(db: AsyncSession, fn, *args):
+    if writer is not None:
+        return await writer.run(fn, *args)
+    return await db.run_sync(fn, *args)
+
+# Optimistic concurrency: the ETag of a versioned row is its version, sent back in If-Match
+def version_etag(row):
+    return f'"{row["version"] if isinstance(row, dict) else row.version}"'
+
+def set_etag(response: Response, row):
+    response.headers["ETag"] = version_etag(row)
+    return row
+
+def if_match_version(if_match: str = Header(None)):
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail='If-Match must be an ETag from this API, e.g. "3"')
+
+# Row dicts straight from a column projection, orjson-encoded as `schema`: only its fields are kept
+# and pydantic doesn't re-validate them. Keys missing from a row are left out (like exclude_unset).
+def rows_response(rows, schema, headers=None):
+    fields = schema.model_fields.keys()
+    content = [{name: row[name] for name in fields if name in row} for row in rows] if isinstance(rows, list) else {name: rows[name] for name in fields if name in rows}
+    return Response(content=dumps(content), media_type="application/json", headers=headers)
+
+# Paginated / streamed listing shared by the list endpoints
+async def list_rows(db: AsyncSession, schema, model, order_by: str, after_id: int, limit: int, stream: bool, allowed_orders=("id",), expand=(), include_archived=False):
+    if order_by not in allowed_orders:
+        raise HTTPException(status_code=400, detail=f"order_by must be one of: {', '.join(allowed_orders)}")
+    source = with_archive(model) if include_archived else None
+
+    if stream:
+        if expand:
+            raise HTTPException(status_code=400, detail="expand is not supported with stream=true")
+        return StreamingResponse(aiter_ndjson(AsyncSessionLocal, model, order_by, source=source), media_type="application/x-ndjson")
+
+    try:
+        rows, next_after_id = await db.run_sync(fetch_page, model, order_by, after_id, limit, expand, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rows_response(rows, schema, {"X-Next-After-Id": str(next_after_id)} if next_after_id is not None else None)
+
+# Cached catalog response with ETag / If-None-Match support
+def cached_response(request: Request, entry):
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
 # ---------------------- CUSTOMER ENDPOINTS ----------------------
 
-@app.post("/customers/")
-def create_customer(name: str, email: str, phone: str, db: Session = Depends(get_db)):
-    customer = Customer(name=name, email=email, phone=phone)
-    db.add(customer)
-    db.commit()
-    db.refresh(customer)
-    return customer
-
-@app.get("/customers/")
-def list_customers(db: Session = Depends(get_db)):
-    customers = db.query(Customer).all()
-    return customers
-
-@app.get("/customers/{email}")
-def get_customer(email: str, db: Session = Depends(get_db)):
-    customer = db.query(Customer).filter(Customer.email == email).first()
+@app.post("/customers/", response_model=CustomerOut)
+async def create_customer(name: str, email: str, phone: str, db: AsyncSession = Depends(get_db)):
+    return await write(db, Customer.create, name, email, phone)
+
+@app.get("/customers/", response_model=list[CustomerOut])
+async def list_customers(after_id: int = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), stream: bool = False, db: AsyncSession = Depends(get_db)):
+    return await list_rows(db, CustomerOut, Customer, "id", after_id, limit, stream)
+
+@app.get("/customers/{email}", response_model=CustomerOut)
+async def get_customer(email: str, db: AsyncSession = Depends(get_db)):
+    customer = (await db.execute(Customer.by_email_select(email))).mappings().first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    return rows_response(customer, CustomerOut, {"ETag": version_etag(customer)})
 
-@app.put("/customers/{customer_id}")
-def update_customer(customer_id: int, name: str = None, phone: str = None, db: Session = Depends(get_db)):
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not customer:
+@app.put("/customers/{customer_id}", response_model=CustomerOut)
+async def update_customer(customer_id: int, response: Response, name: str = None, phone: str = None,
+                          expected_version: int = Depends(if_match_version), db: AsyncSession = Depends(get_db)):
+    try:
+        return set_etag(response, (await write(db, Customer.update_info, customer_id, name, phone, expected_version))["customer"])
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError:
         raise HTTPException(status_code=404, detail="Customer not found")
-    
-    if name:
-        customer.name = name
-    if phone:
-        customer.phone = phone
-    db.commit()
-    db.refresh(customer)
-    return customer
-
-@app.delete("/customers/{customer_id}")
-def delete_customer(customer_id: int, db: Session = Depends(get_db)):
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+
+@app.delete("/customers/{customer_id}", response_model=MessageOut)
+async def delete_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
+    customer = await db.get(Customer, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    
-    db.delete(customer)
-    db.commit()
+
+    await db.delete(customer)
+    await db.commit()
     return {"message": "Customer deleted successfully"}
 
 # ---------------------- SERVICE ENDPOINTS ----------------------
 
-@app.post("/services/")
-def add_service(name: str, description: str, price: float, db: Session = Depends(get_db)):
-    service = Service(name=name, description=description, price=price)
+@app.post("/services/", response_model=ServiceOut)
+async def add_service(name: str, description: str, price: float, duration_minutes: int = Query(60, ge=1), db: AsyncSession = Depends(get_db)):
+    service = Service(name=name, description=description, price=price, duration_minutes=duration_minutes)
     db.add(service)
-    db.commit()
-    db.refresh(service)
+    await db.commit()
+    catalog_cache.invalidate("services")
+    await db.refresh(service)
     return service
 
-@app.get("/services/")
-def list_services(db: Session = Depends(get_db)):
-    services = db.query(Service).all()
-    return services
+@app.get("/services/", response_model=list[ServiceOut])
+async def list_services(request: Request, db: AsyncSession = Depends(get_db)):
+    entry = await catalog_cache.aget("services", lambda: db.run_sync(Service.catalog_rows))
+    return cached_response(request, entry)
 
-@app.put("/services/{service_id}")
-def update_service(service_id: int, price: float, db: Session = Depends(get_db)):
-    service = db.query(Service).filter(Service.id == service_id).first()
-    if not service:
+@app.put("/services/{service_id}", response_model=ServiceOut)
+async def update_service(service_id: int, response: Response, price: float = Query(..., gt=0),
+                         expected_version: int = Depends(if_match_version), db: AsyncSession = Depends(get_db)):
+    try:
+        return set_etag(response, (await Service.update_price_async(db, service_id, price, expected_version))["service"])
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError:
         raise HTTPException(status_code=404, detail="Service not found")
-    
-    service.price = price
-    db.commit()
-    db.refresh(service)
-    return service
 
-@app.delete("/services/{service_id}")
-def delete_service(service_id: int, db: Session = Depends(get_db)):
-    service = db.query(Service).filter(Service.id == service_id).first()
+@app.delete("/services/{service_id}", response_model=MessageOut)
+async def delete_service(service_id: int, db: AsyncSession = Depends(get_db)):
+    service = await db.get(Service, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
-    
-    db.delete(service)
-    db.commit()
+
+    await db.delete(service)
+    await db.commit()
+    catalog_cache.invalidate("services")
     return {"message": "Service deleted successfully"}
 
+# ---------------------- STAFF ENDPOINTS ----------------------
+
+@app.get("/staff/", response_model=list[StaffOut])
+async def list_staff(request: Request, db: AsyncSession = Depends(get_db)):
+    entry = await catalog_cache.aget("staff", lambda: db.run_sync(Staff.roster_rows))
+    return cached_response(request, entry)
+
+@app.put("/staff/{staff_id}", response_model=StaffOut)
+async def update_staff_role(staff_id: int, role: str, response: Response,
+                            expected_version: int = Depends(if_match_version), db: AsyncSession = Depends(get_db)):
+    try:
+        return set_etag(response, (await Staff.update_role_async(db, staff_id, role, expected_version))["staff"])
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404 if "not found" in str(e) else 400, detail=str(e))
+
 # ---------------------- APPOINTMENT ENDPOINTS ----------------------
 
-@app.post("/appointments/")
-def book_appointment(customer_id: int, service_id: int, staff_id: int, scheduled_time: datetime, db: Session = Depends(get_db)):
-    appointment = Appointment(customer_id=customer_id, service_id=service_id, staff_id=staff_id, scheduled_time=scheduled_time)
-    db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
-    return appointment
-
-@app.get("/appointments/")
-def list_appointments(db: Session = Depends(get_db)):
-    appointments = db.query(Appointment).all()
-    return appointments
-
-@app.delete("/appointments/{appointment_id}")
-def cancel_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+@app.post("/appointments/", response_model=AppointmentOut)
+async def book_appointment(customer_id: int, service_id: int, staff_id: int, scheduled_time: datetime, db: AsyncSession = Depends(get_db)):
+    try:
+        return await write(db, Appointment.book_appointment, customer_id, service_id, staff_id, scheduled_time)
+    except BookingConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/appointments/bulk", response_model=list[BulkBookingResultOut], response_model_exclude_none=True)
+async def book_appointments_bulk(requests: list[AppointmentRequest], atomic: bool = False, db: AsyncSession = Depends(get_db)):
+    if len(requests) > MAX_BULK_APPOINTMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_APPOINTMENTS} appointments per batch")
+    return await Appointment.book_appointments_bulk_async(db, [r.model_dump() for r in requests], atomic)
+
+@app.post("/appointments/complete", response_model=CompletionOut)
+async def complete_appointments(appointment_ids: list[int], db: AsyncSession = Depends(get_db)):
+    if len(appointment_ids) > MAX_BULK_APPOINTMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_APPOINTMENTS} appointments per batch")
+    try:
+        return await Appointment.complete_appointments_async(db, appointment_ids)
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/appointments/{appointment_id}/complete", response_model=CompletionOut)
+async def complete_appointment(appointment_id: int, db: AsyncSession = Depends(get_db)):
+    try:
+        result = await Appointment.complete_appointments_async(db, [appointment_id])
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result["skipped"]:
+        if not await db.get(Appointment, appointment_id):
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        raise HTTPException(status_code=409, detail="Appointment is already completed")
+    return result
+
+# Parses ?expand=customer,service,staff
+def expand_param(expand: str = Query(None, description=f"Comma-separated relationships to inline: {', '.join(EXPANDABLE)}")):
+    try:
+        return parse_expand(expand)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/appointments/", response_model=list[AppointmentDetailOut], response_model_exclude_unset=True)
+async def list_appointments(after_id: int = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), stream: bool = False, order_by: str = "id", expand: tuple = Depends(expand_param),
+                            include_archived: bool = False, db: AsyncSession = Depends(get_db)):
+    return await list_rows(db, AppointmentDetailOut, Appointment, order_by, after_id, limit, stream, allowed_orders=("id", "scheduled_time"), expand=expand, include_archived=include_archived)
+
+@app.get("/appointments/schedule", response_model=list[AppointmentDetailOut], response_model_exclude_unset=True)
+async def daily_schedule(day: date, staff_id: int = None, expand: str = Query(",".join(EXPANDABLE)), db: AsyncSession = Depends(get_db)):
+    try:
+        return rows_response(await Appointment.daily_schedule_async(db, day, staff_id, parse_expand(expand)), AppointmentDetailOut)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/appointments/schedule/events")
+async def schedule_events_stream(request: Request, day: date = None, staff_id: int = None):
+    """Server-Sent Events: a `snapshot` of the day's schedule, then booked / cancelled / rescheduled / completed events."""
+    day = day or datetime.utcnow().date()
+
+    async def load_schedule():
+        async with AsyncSessionLocal() as db:
+            return await Appointment.daily_schedule_async(db, day, staff_id)
+
+    return StreamingResponse(sse_schedule(request, load_schedule, day, staff_id), media_type="text/event-stream")
+
+@app.get("/appointments/available-slots", response_model=list[AvailableSlotOut])
+async def available_slots(service_id: int, start: datetime, end: datetime, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_db)):
+    try:
+        return await db.run_sync(find_available_slots, service_id, start, end, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/appointments/{appointment_id}", response_model=AppointmentDetailOut, response_model_exclude_unset=True)
+async def get_appointment(appointment_id: int, expand: tuple = Depends(expand_param), include_archived: bool = False, db: AsyncSession = Depends(get_db)):
+    appointment = await Appointment.get_expanded_async(db, appointment_id, expand)
+    if not appointment and include_archived:
+        appointment = await db.run_sync(get_archived, Appointment, appointment_id, expand)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    db.delete(appointment)
-    db.commit()
+    return rows_response(appointment, AppointmentDetailOut)
+
+@app.put("/appointments/{appointment_id}", response_model=AppointmentOut)
+async def reschedule_appointment(appointment_id: int, scheduled_time: datetime, staff_id: int = None, db: AsyncSession = Depends(get_db)):
+    try:
+        return await write(db, Appointment.reschedule, appointment_id, scheduled_time, staff_id)
+    except BookingConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404 if "not found" in str(e) else 400, detail=str(e))
+
+@app.delete("/appointments/{appointment_id}", response_model=MessageOut)
+async def cancel_appointment(appointment_id: int, db: AsyncSession = Depends(get_db)):
+    try:
+        await write(db, Appointment.cancel_appointment, appointment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404 if "not found" in str(e) else 409, detail=str(e))
     return {"message": "Appointment canceled successfully"}
 
 # ---------------------- PAYMENT ENDPOINTS ----------------------
 
-@app.post("/payments/")
-def process_payment(customer_id: int, appointment_id: int, amount: float, db: Session = Depends(get_db)):
-    payment = Payment(customer_id=customer_id, appointment_id=appointment_id, amount=amount)
-    db.add(payment)
-    db.commit()
-    db.refresh(payment)
-    return payment
-
-@app.get("/payments/")
-def list_payments(db: Session = Depends(get_db)):
-    payments = db.query(Payment).all()
-    return payments
-
-@app.delete("/payments/{payment_id}")
-def refund_payment(payment_id: int, db: Session = Depends(get_db)):
-    payment = db.query(Payment).filter(Payment.id == payment_id).first()
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment record not found")
-    
-    db.delete(payment)
-    db.commit()
+@app.post("/payments/", response_model=PaymentOut)
+async def process_payment(response: Response, customer_id: int, appointment_id: int, amount: float,
+                          idempotency_key: str = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+                          db: AsyncSession = Depends(get_db)):
+    # Clients send an Idempotency-Key header so a retry after a timeout cannot charge twice
+    try:
+        result = await write(db, Payment.process_payment, customer_id, appointment_id, amount, idempotency_key)
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result["replayed"]:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result["payment"]
+
+@app.get("/payments/", response_model=list[PaymentOut])
+async def list_payments(after_id: int = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), stream: bool = False, order_by: str = "id",
+                        include_archived: bool = False, db: AsyncSession = Depends(get_db)):
+    return await list_rows(db, PaymentOut, Payment, order_by, after_id, limit, stream, allowed_orders=("id", "payment_date"), include_archived=include_archived)
+
+@app.delete("/payments/{payment_id}", response_model=MessageOut)
+async def refund_payment(payment_id: int, db: AsyncSession = Depends(get_db)):
+    try:
+        await write(db, Payment.refund, payment_id)
+    except PaymentAlreadyRefundedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return {"message": "Payment refunded successfully"}
 
 # ---------------------- INVENTORY ENDPOINTS ----------------------
 
-@app.post("/inventory/")
-def add_inventory_item(name: str, quantity: int, db: Session = Depends(get_db)):
-    inventory = Inventory(name=name, quantity=quantity)
-    db.add(inventory)
-    db.commit()
-    db.refresh(inventory)
-    return inventory
-
-@app.get("/inventory/")
-def list_inventory(db: Session = Depends(get_db)):
-    inventory = db.query(Inventory).all()
-    return inventory
-
-@app.put("/inventory/{product_id}")
-def update_inventory_stock(product_id: int, quantity: int, db: Session = Depends(get_db)):
-    inventory_item = db.query(Inventory).filter(Inventory.id == product_id).first()
-    if not inventory_item:
+@app.post("/inventory/", response_model=InventoryOut)
+async def add_inventory_item(name: str, quantity: int, reorder_threshold: int = Query(DEFAULT_REORDER_THRESHOLD, ge=0), db: AsyncSession = Depends(get_db)):
+    return await write(db, Inventory.add_product, name, quantity, reorder_threshold)
+
+@app.get("/inventory/", response_model=list[InventoryOut])
+async def list_inventory(after_id: int = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), stream: bool = False, db: AsyncSession = Depends(get_db)):
+    return await list_rows(db, InventoryOut, Inventory, "id", after_id, limit, stream)
+
+@app.put("/inventory/{product_id}", response_model=InventoryOut)
+async def update_inventory_stock(product_id: int, response: Response, quantity: int = Query(None, ge=0), reorder_threshold: int = Query(None, ge=0),
+                                 expected_version: int = Depends(if_match_version), db: AsyncSession = Depends(get_db)):
+    try:
+        return set_etag(response, await write(db, Inventory.set_stock, product_id, quantity, reorder_threshold, expected_version))
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError:
         raise HTTPException(status_code=404, detail="Inventory item not found")
-    
-    inventory_item.quantity = quantity
-    db.commit()
-    db.refresh(inventory_item)
-    return inventory_item
-
-@app.get("/inventory/low-stock/")
-def check_low_stock(db: Session = Depends(get_db)):
-    low_stock_items = db.query(Inventory).filter(Inventory.quantity < 5).all()
-    return low_stock_items
+
+@app.get("/inventory/low-stock/", response_model=list[InventoryOut])
+async def check_low_stock(db: AsyncSession = Depends(get_db)):
+    return await Inventory.low_stock_async(db)
+
+@app.get("/inventory/low-stock/events")
+async def low_stock_events(request: Request):
+    """Server-Sent Events stream of low_stock / restocked threshold crossings."""
+    return StreamingResponse(sse_events(stock_events, request), media_type="text/event-stream")
+
+# ---------------------- REPORT ENDPOINTS ----------------------
+# Read from the rollup tables, so the cost depends on the window, not on the payment history
+
+@app.get("/reports/revenue", response_model=list[RevenueReportOut], response_model_exclude_none=True)
+async def revenue_report(start: date, end: date, grain: str = "day", group_by: str = "total", db: AsyncSession = Depends(get_db)):
+    try:
+        return await RevenueRollup.report_async(db, grain, start, end, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/reports/usage", response_model=list[UsageReportOut])
+async def usage_report(start: date, end: date, grain: str = "day", inventory_id: int = None, db: AsyncSession = Depends(get_db)):
+    try:
+        return await UsageRollup.report_async(db, grain, start, end, inventory_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ---------------------- CHANGE FEED ----------------------
+# Deltas since a cursor (the last change id seen) instead of re-listing whole tables
+
+def entities_param(entity: str = Query(None, description="Comma-separated tables to include, e.g. customers,payments")):
+    try:
+        return parse_entities(entity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/changes", response_model=ChangeFeedOut)
+async def change_feed(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_FEED_PAGE),
+                      wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="Seconds to long-poll when nothing is new"),
+                      entities: tuple = Depends(entities_param)):
+    changes, next_cursor = await poll_changes(AsyncSessionLocal, since, limit, entities, wait)
+    return {"changes": changes, "next_cursor": next_cursor}
+
+@app.get("/changes/stream")
+async def change_stream(request: Request, since: int = Query(0, ge=0), entities: tuple = Depends(entities_param),
+                        last_event_id: str = Header(None)):
+    """Server-Sent Events stream of changes; a reconnecting EventSource resumes from Last-Event-ID."""
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a change id")
+        since = int(last_event_id)
+    return StreamingResponse(sse_changes(AsyncSessionLocal, request, since, MAX_FEED_PAGE, entities), media_type="text/event-stream")
@@ -1,13 +1,24 @@
+import sys
+import time
 import click
 from sqlalchemy.orm import Session
-from lib.config import SessionLocal
+from lib.config import SessionLocal, ensure_schema
 from lib.models.customer import Customer
 from lib.models.service import Service
 from lib.models.staff import Staff  
 from lib.models.appointment import Appointment
 from lib.models.payment import Payment
 from lib.models.inventory import Inventory
-from datetime import datetime
+from lib.models.rollup import GRAINS, REVENUE_GROUPS, RevenueRollup
+from lib.models.change import CHANGE_LOGGED_TABLES, MAX_FEED_PAGE, Change
+from lib.rollups import rebuild_rollups
+from lib.archival import ARCHIVE_AFTER_DAYS, DEFAULT_ARCHIVE_CHUNK_SIZE, archive_closed
+from lib.scheduling import find_available_slots
+from lib.cache import catalog_cache
+from lib.importer import IMPORT_SPECS, DEFAULT_CHUNK_SIZE, import_file
+from lib.operations import DEFAULT_BATCH_SIZE, OPERATIONS, adjust_stock, read_operations, run_operations
+from lib.serialization import dumps
+from datetime import datetime, timedelta
 
 # Function implementations
 def get_db():
@@ -57,12 +68,12 @@ def list_customers():
 def list_staff():
     """List all staff members."""
     session = SessionLocal()
-    staff_members = session.query(Staff).all()
+    staff_members = Staff.roster(session)
     session.close()
     if staff_members:
         click.echo("\n👥 All Staff:")
         for staff in staff_members:
-            click.echo(f"- {staff.name}, Role: {staff.role}")
+            click.echo(f"- {staff['name']}, Role: {staff['role']}")
     else:
         click.echo("❌ No staff found.")
 
@@ -74,6 +85,7 @@ def add_service(name, description, price):
     service = Service(name=name, description=description, price=price)
     session.add(service)
     session.commit()
+    catalog_cache.invalidate("services")
     session.refresh(service)
     click.echo(f"✅ Service {service.name} added successfully!")
     session.close()
@@ -81,12 +93,12 @@ def add_service(name, description, price):
 def list_services():
     """List all spa services."""
     session = SessionLocal()
-    services = session.query(Service).all()
+    services = catalog_cache.get("services", lambda: Service.catalog_rows(session)).value
     session.close()
     if services:
         click.echo("\n💆‍♀️ All Services:")
         for service in services:
-            click.echo(f"- {service.name} - {service.description}: ${service.price}")
+            click.echo(f"- {service['name']} - {service['description']}: ${service['price']}")
     else:
         click.echo("❌ No services found.")
 
@@ -95,16 +107,17 @@ def list_services():
 def book_appointment(customer_id, service_id, staff_id, scheduled_time):
     """Book a new appointment."""
     session = SessionLocal()
-    appointment = Appointment(
-        customer_id=customer_id,
-        service_id=service_id,
-        staff_id=staff_id,
-        scheduled_time=datetime.strptime(scheduled_time, "%Y-%m-%d %H:%M")
-    )
-    session.add(appointment)
-    session.commit()
-    session.refresh(appointment)
-    click.echo(f"✅ Appointment {appointment.id} scheduled for Customer {appointment.customer_id} at {appointment.scheduled_time}")
+    try:
+        appointment = Appointment.book_appointment(
+            session,
+            customer_id=customer_id,
+            service_id=service_id,
+            staff_id=staff_id,
+            scheduled_time=datetime.strptime(scheduled_time, "%Y-%m-%d %H:%M")
+        )
+        click.echo(f"✅ Appointment {appointment.id} scheduled for Customer {appointment.customer_id} at {appointment.scheduled_time}")
+    except ValueError as e:
+        click.echo(f"❌ {e}")
     session.close()
 
 def get_appointments(customer_id):
@@ -118,16 +131,49 @@ def get_appointments(customer_id):
     else:
         click.echo("❌ No upcoming appointments found.")
 
+def find_slots(service_id, start_date, days, limit=10):
+    """Show the earliest free slots for a service across all therapists."""
+    session = SessionLocal()
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    try:
+        slots = find_available_slots(session, service_id, start, start + timedelta(days=days), limit)
+    except ValueError as e:
+        click.echo(f"❌ {e}")
+        slots = None
+    session.close()
+    if slots:
+        click.echo("\n🗓 Available Slots:")
+        for slot in slots:
+            click.echo(f"- {slot['start']:%Y-%m-%d %H:%M} - {slot['end']:%H:%M} with {slot['staff_name']} (Staff {slot['staff_id']})")
+    elif slots is not None:
+        click.echo("❌ No free slots in that range.")
+
+def view_schedule(day):
+    """Show a day's appointments with customer, service and staff."""
+    session = SessionLocal()
+    schedule = Appointment.daily_schedule(session, datetime.strptime(day, "%Y-%m-%d").date())
+    session.close()
+    if schedule:
+        click.echo(f"\n🗓 Schedule for {day}:")
+        for app in schedule:
+            click.echo(f"- {app['scheduled_time']:%H:%M} {app['service']['name']} for {app['customer']['name']} with {app['staff']['name']} ({app['status']})")
+    else:
+        click.echo("❌ No appointments on that day.")
+
 # ---------------------- PAYMENT FUNCTIONS ----------------------
 
-def process_payment(customer_id, appointment_id, amount):
+def process_payment(customer_id, appointment_id, amount, idempotency_key=None):
     """Process a payment for an appointment."""
     session = SessionLocal()
-    payment = Payment(customer_id=customer_id, appointment_id=appointment_id, amount=amount, status="Paid")
-    session.add(payment)
-    session.commit()
-    session.refresh(payment)
-    click.echo(f"💰 Payment of ${payment.amount} processed for Customer {payment.customer_id}")
+    try:
+        result = Payment.process_payment(session, customer_id, appointment_id, amount, idempotency_key)
+        payment = result["payment"]
+        if result["replayed"]:
+            click.echo(f"ℹ️ Payment {payment.id} was already processed with this idempotency key")
+        else:
+            click.echo(f"💰 Payment of ${payment.amount} processed for Customer {payment.customer_id}")
+    except ValueError as e:
+        click.echo(f"❌ {e}")
     session.close()
 
 # ---------------------- INVENTORY FUNCTIONS ----------------------
@@ -145,16 +191,44 @@ def add_inventory(product_name, quantity):
 def update_inventory(product_id, quantity):
     """Update inventory stock quantity."""
     session = SessionLocal()
-    inventory_item = session.query(Inventory).filter_by(id=product_id).first()
-    if inventory_item:
-        inventory_item.quantity = quantity
-        session.commit()
-        session.refresh(inventory_item)
+    try:
+        inventory_item = Inventory.set_stock(session, product_id, quantity)
         click.echo(f"🛠 Inventory updated: {inventory_item.product_name} now has {inventory_item.quantity} in stock")
-    else:
-        click.echo("❌ Inventory item not found.")
+    except ValueError as e:
+        click.echo(f"❌ {e}")
     session.close()
 
+def adjust_inventory(product_id, delta):
+    """Add stock to (or, with a negative delta, remove stock from) an inventory item."""
+    session = SessionLocal()
+    try:
+        result = adjust_stock(session, product_id, delta)
+        session.commit()
+        click.echo(f"🛠 Inventory adjusted by {delta:+d}: product {product_id} now has {result['quantity']} in stock")
+    except ValueError as e:
+        session.rollback()
+        click.echo(f"❌ {e}")
+    session.close()
+
+# ---------------------- IMPORT FUNCTIONS ----------------------
+
+def import_records(entity, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Bulk import customers, services, staff or inventory from a CSV/NDJSON file."""
+    session = SessionLocal()
+    try:
+        summary = import_file(
+            session, entity, path, chunk_size,
+            on_progress=lambda s: click.echo(f"⏳ {s['imported']} imported, {s['rejected']} rejected..."),
+        )
+    except (OSError, ValueError) as e:
+        click.echo(f"❌ Import failed: {e}")
+        session.close()
+        return
+    session.close()
+    click.echo(f"✅ Imported {summary['imported']} {entity} ({summary['rejected']} rejected)")
+    if summary["rejects_path"]:
+        click.echo(f"📄 Rejected rows written to {summary['rejects_path']}")
+
 # ---------------------- MENU SYSTEM ----------------------
 
 def display_menu():
@@ -171,7 +245,10 @@ def display_menu():
         click.echo("9. Update Inventory Stock")
         click.echo("10. List Customers")  # 
         click.echo("11. List Staff")  # 
-        click.echo("12. Exit")
+        click.echo("12. Find Available Slots")
+        click.echo("13. Import Records (CSV/NDJSON)")
+        click.echo("14. View Daily Schedule")
+        click.echo("15. Exit")
 
         choice = click.prompt("Enter your choice", type=int)
 
@@ -217,11 +294,218 @@ def display_menu():
         elif choice == 11:  
             list_staff()
         elif choice == 12:
+            service_id = click.prompt("Enter service ID", type=int)
+            start_date = click.prompt("Search from date (YYYY-MM-DD)")
+            days = click.prompt("Number of days to search", type=int, default=7)
+            find_slots(service_id, start_date, days)
+        elif choice == 13:
+            entity = click.prompt("Import into", type=click.Choice(list(IMPORT_SPECS)))
+            path = click.prompt("Path to .csv or .ndjson file")
+            import_records(entity, path)
+        elif choice == 14:
+            day = click.prompt("Enter date (YYYY-MM-DD)")
+            view_schedule(day)
+        elif choice == 15:
             click.echo("✅ Exiting spa management system. Goodbye!")
             return
         else:
             click.echo("❌ Invalid choice, please try again.")
 
+# ---------------------- COMMANDS ----------------------
+# Non-interactive equivalents of the menu entries, e.g. `python cli.py add-customer --name ...`
+
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+    """Rejuvenate Spa management. Without a command, opens the interactive menu."""
+    ensure_schema()
+    if ctx.invoked_subcommand is None:
+        display_menu()
+
+@cli.command("menu")
+def menu_command():
+    """Open the interactive menu."""
+    display_menu()
+
+@cli.command("add-customer")
+@click.option("--name", required=True)
+@click.option("--email", required=True)
+@click.option("--phone", required=True)
+def add_customer_command(name, email, phone):
+    """Add a new customer."""
+    add_customer(name, email, phone)
+
+@cli.command("get-customer")
+@click.argument("email")
+def get_customer_command(email):
+    """Get customer details by email."""
+    get_customer(email)
+
+@cli.command("list-customers")
+def list_customers_command():
+    """List all customers."""
+    list_customers()
+
+@cli.command("list-staff")
+def list_staff_command():
+    """List all staff members."""
+    list_staff()
+
+@cli.command("add-service")
+@click.option("--name", required=True)
+@click.option("--description", required=True)
+@click.option("--price", required=True, type=float)
+def add_service_command(name, description, price):
+    """Add a new spa service."""
+    add_service(name, description, price)
+
+@cli.command("list-services")
+def list_services_command():
+    """List all spa services."""
+    list_services()
+
+@cli.command("book-appointment")
+@click.option("--customer-id", required=True, type=int)
+@click.option("--service-id", required=True, type=int)
+@click.option("--staff-id", required=True, type=int)
+@click.option("--at", "scheduled_time", required=True, help="YYYY-MM-DD HH:MM")
+def book_appointment_command(customer_id, service_id, staff_id, scheduled_time):
+    """Book a new appointment."""
+    book_appointment(customer_id, service_id, staff_id, scheduled_time)
+
+@cli.command("get-appointments")
+@click.argument("customer_id", type=int)
+def get_appointments_command(customer_id):
+    """List appointments for a customer."""
+    get_appointments(customer_id)
+
+@cli.command("find-slots")
+@click.option("--service-id", required=True, type=int)
+@click.option("--from", "start_date", required=True, help="YYYY-MM-DD")
+@click.option("--days", default=7, show_default=True)
+@click.option("--limit", default=10, show_default=True)
+def find_slots_command(service_id, start_date, days, limit):
+    """Show the earliest free slots for a service."""
+    find_slots(service_id, start_date, days, limit)
+
+@cli.command("view-schedule")
+@click.argument("day")
+def view_schedule_command(day):
+    """Show a day's appointments (YYYY-MM-DD)."""
+    view_schedule(day)
+
+@cli.command("process-payment")
+@click.option("--customer-id", required=True, type=int)
+@click.option("--appointment-id", required=True, type=int)
+@click.option("--amount", required=True, type=float)
+@click.option("--idempotency-key", help="Reuse on retries so the payment is only recorded once.")
+def process_payment_command(customer_id, appointment_id, amount, idempotency_key):
+    """Process a payment for an appointment."""
+    process_payment(customer_id, appointment_id, amount, idempotency_key)
+
+@cli.command("add-inventory")
+@click.option("--name", "product_name", required=True)
+@click.option("--quantity", required=True, type=int)
+def add_inventory_command(product_name, quantity):
+    """Add an inventory item."""
+    add_inventory(product_name, quantity)
+
+@cli.command("update-inventory")
+@click.option("--product-id", required=True, type=int)
+@click.option("--quantity", required=True, type=int)
+def update_inventory_command(product_id, quantity):
+    """Set the stock quantity of an inventory item."""
+    update_inventory(product_id, quantity)
+
+@cli.command("adjust-inventory")
+@click.option("--product-id", required=True, type=int)
+@click.option("--delta", required=True, type=int, help="Units to add; negative to remove.")
+def adjust_inventory_command(product_id, delta):
+    """Add or remove stock of an inventory item."""
+    adjust_inventory(product_id, delta)
+
+@cli.command("import")
+@click.argument("entity", type=click.Choice(list(IMPORT_SPECS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True)
+def import_command(entity, path, chunk_size):
+    """Bulk import records from a CSV/NDJSON file."""
+    import_records(entity, path, chunk_size)
+
+@cli.command("run-script", epilog=f"Operations: {', '.join(OPERATIONS)}")
+@click.argument("script", type=click.File("r"))
+@click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True, help="Operations per transaction.")
+@click.option("--stop-on-error", is_flag=True, help="Stop at the first failed operation (earlier ones stay committed).")
+@click.option("--errors-only", is_flag=True, help="Only print failed operations and the summary.")
+def run_script_command(script, batch_size, stop_on_error, errors_only):
+    """Run an NDJSON file of operations (or - for stdin) over one session.
+
+    Each line is an object such as {"op": "set_stock", "product_id": 3, "quantity": 40}.
+    Prints one JSON result per operation, then a JSON summary.
+    """
+    def emit(record):
+        if not (errors_only and record["ok"]):
+            click.echo(dumps(record))
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        summary = run_operations(session, read_operations(script), batch_size, stop_on_error, on_result=emit)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    click.echo(dumps({"summary": summary}))
+    if summary["failed"]:
+        sys.exit(1)
+
+@cli.command("revenue-report")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), required=True)
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), required=True)
+@click.option("--grain", type=click.Choice(GRAINS), default="day", show_default=True)
+@click.option("--by", "group_by", type=click.Choice(REVENUE_GROUPS), default="total", show_default=True)
+def revenue_report_command(start, end, grain, group_by):
+    """Show revenue per day or month from the rollup tables."""
+    with SessionLocal() as session:
+        rows = RevenueRollup.report(session, grain, start.date(), end.date(), group_by)
+    if not rows:
+        click.echo("❌ No payments in that period.")
+    for row in rows:
+        label = "" if group_by == "total" else f" {group_by} {row[f'{group_by}_id']}"
+        click.echo(f"📈 {row['period_start']}{label}: {row['payments']} payments, ${row['amount_cents'] / 100:,.2f}")
+
+@cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the revenue and usage rollups from payments and inventory usage."""
+    with SessionLocal() as session:
+        counts = rebuild_rollups(session)
+    click.echo(f"✅ Rebuilt {counts['revenue_rollups']} revenue and {counts['usage_rollups']} usage rollup rows")
+
+@cli.command("changes")
+@click.option("--since", default=0, show_default=True, help="Cursor: the last change id already processed.")
+@click.option("--limit", default=100, show_default=True, type=click.IntRange(1, MAX_FEED_PAGE))
+@click.option("--entity", "entities", multiple=True, type=click.Choice(CHANGE_LOGGED_TABLES), help="Repeat to include several tables.")
+def changes_command(since, limit, entities):
+    """Print the change log after a cursor, one JSON change per line."""
+    with SessionLocal() as session:
+        changes, next_cursor = Change.feed(session, since, limit, entities)
+    for change in changes:
+        click.echo(dumps(change))
+    click.echo(f"➡️ Next cursor: {next_cursor}", err=True)
+
+@cli.command("prune-changes")
+@click.option("--days", required=True, type=click.IntRange(1), help="Keep this many days of change log.")
+def prune_changes_command(days):
+    """Delete change log entries older than --days."""
+    with SessionLocal() as session:
+        deleted = Change.prune(session, datetime.utcnow() - timedelta(days=days))
+    click.echo(f"🧹 Deleted {deleted} change log entries")
+
+@cli.command("archive")
+@click.option("--older-than-days", default=ARCHIVE_AFTER_DAYS, show_default=True, type=click.IntRange(1))
+@click.option("--chunk-size", default=DEFAULT_ARCHIVE_CHUNK_SIZE, show_default=True, type=click.IntRange(1), help="Appointments per transaction.")
+def archive_command(older_than_days, chunk_size):
+    """Move closed appointments older than the horizon, with their payments and usage, to the archive tables."""
+    with SessionLocal() as session:
+        counts = archive_closed(session, datetime.utcnow() - timedelta(days=older_than_days), chunk_size)
+    click.echo(f"📦 Archived {counts['appointments']} appointments, {counts['payments']} payments and {counts['appointment_inventory']} usage rows")
+
 # Entry point
 if __name__ == "__main__":
-    display_menu()
+    cli()
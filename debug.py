@@ -11,37 +11,34 @@ sys.path.append(".")
 from lib.models.customer import Customer
 
 
-# Initialize database session
-db = SessionLocal()
-
 # Function to test customer queries
-def test_customers():
+def test_customers(db: Session):
     print("\n🔍 Testing Customer Queries")
     customer = db.query(Customer).first()
     print("First Customer:", customer.name if customer else "No customers found.")
 
 # Function to test service queries
-def test_services():
+def test_services(db: Session):
     print("\n🔍 Testing Service Queries")
     services = db.query(Service).all()
     for service in services:
         print(f"- {service.name}: ${service.price}")
 
 # Function to test appointments
-def test_appointments():
+def test_appointments(db: Session):
     print("\n🔍 Testing Appointments")
     upcoming = db.query(Appointment).filter(Appointment.scheduled_time > datetime.now()).all()
     print(f"Upcoming Appointments: {len(upcoming)}")
 
 # Function to test payments
-def test_payments():
+def test_payments(db: Session):
     print("\n🔍 Testing Payments")
     payments = db.query(Payment).all()
     for payment in payments:
         print(f"- Payment ID {payment.id}: ${payment.amount}")
 
 # Function to test inventory stock
-def test_inventory():
+def test_inventory(db: Session):
     print("\n🔍 Testing Inventory Stock")
     inventory_items = db.query(Inventory).all()
     for item in inventory_items:
@@ -49,10 +46,12 @@ def test_inventory():
 
 # Run all debug functions
 if __name__ == "__main__":
-    test_customers()
-    test_services()
-    test_appointments()
-    test_payments()
-    test_inventory()
+    db = SessionLocal()  # Initialize database session
+    test_customers(db)
+    test_services(db)
+    test_appointments(db)
+    test_payments(db)
+    test_inventory(db)
+    db.close()
 
     print("\n✅ Debugging complete!")
@@ -0,0 +1,95 @@
+"""Moves closed appointments, payments and usage rows into the archive tables.
+
+A completed or cancelled appointment whose time is older than the horizon is
+moved together with its payments and inventory usage rows. Payments and usage
+rows whose appointment is no longer live (archived, or hard-deleted before
+cancellations became status changes) follow once they are past the horizon
+themselves.
+
+Each chunk is one short transaction: INSERT ... SELECT into the archive, then
+DELETE from the live table. The change log's triggers record those deletes;
+the chunk relabels them as op "archive" so change feed consumers can tell
+them apart from real deletes. The newest row of each table always stays live:
+SQLite hands out max(id) + 1 for tables without AUTOINCREMENT, and this way an
+archived id is never reused.
+
+    python cli.py archive --older-than-days 365
+"""
+import os
+from datetime import datetime
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from lib.models.appointment import CLOSED_STATUSES, Appointment
+from lib.models.appointment_inventory import AppointmentInventory
+from lib.models.archive import ARCHIVE_TABLES
+from lib.models.change import Change
+from lib.models.payment import Payment
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("SPA_ARCHIVE_AFTER_DAYS", "365"))
+DEFAULT_ARCHIVE_CHUNK_SIZE = 500
+
+
+def _move(db: Session, model, condition, archived_at: datetime):
+    """Copies the matching live rows into the model's archive table and deletes them; returns their ids."""
+    live = model.__table__
+    condition = condition & (live.c.id < select(func.max(live.c.id)).scalar_subquery())
+    db.execute(insert(ARCHIVE_TABLES[model]).from_select(
+        [*(column.name for column in live.columns), "archived_at"],
+        select(*live.columns, literal(archived_at)).where(condition),
+    ))
+    return db.scalars(live.delete().where(condition).returning(live.c.id)).all()
+
+
+def _archive_chunk(db: Session, moves, archived_at: datetime):
+    """Runs `moves` [(model, condition)] in one transaction and relabels their change log entries."""
+    last_change = db.scalar(select(func.max(Change.id))) or 0
+    counts = {}
+    for model, condition in moves:
+        ids = _move(db, model, condition, archived_at)
+        counts[model.__tablename__] = len(ids)
+        if ids:
+            db.execute(
+                update(Change)
+                .where(Change.id > last_change, Change.entity == model.__tablename__, Change.entity_id.in_(ids), Change.op == "delete")
+                .values(op="archive")
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    return counts
+
+
+def archive_closed(db: Session, before: datetime, chunk_size: int = DEFAULT_ARCHIVE_CHUNK_SIZE):
+    """Archives everything closed before `before` in chunks of `chunk_size` appointments; returns row counts."""
+    archived_at = datetime.utcnow()
+    totals = {model.__tablename__: 0 for model in ARCHIVE_TABLES}
+
+    def add(counts):
+        for table, count in counts.items():
+            totals[table] += count
+        return sum(counts.values())
+
+    after_id = 0
+    while True:
+        ids = db.scalars(
+            select(Appointment.id)
+            .where(Appointment.id > after_id, Appointment.status.in_(CLOSED_STATUSES), Appointment.scheduled_time < before)
+            .order_by(Appointment.id)
+            .limit(chunk_size)
+        ).all()
+        if not ids:
+            break
+        after_id = ids[-1]
+        add(_archive_chunk(db, [
+            (AppointmentInventory, AppointmentInventory.appointment_id.in_(ids)),
+            (Payment, Payment.appointment_id.in_(ids)),
+            (Appointment, Appointment.id.in_(ids)),
+        ], archived_at))
+
+    # Rows whose appointment is no longer live
+    for model, moment in ((Payment, Payment.payment_date), (AppointmentInventory, AppointmentInventory.created_at)):
+        orphaned = model.appointment_id.not_in(select(Appointment.id)) & (moment < before)
+        while True:
+            ids = db.scalars(select(model.id).where(orphaned).order_by(model.id).limit(chunk_size)).all()
+            if not ids or not add(_archive_chunk(db, [(model, model.id.in_(ids))], archived_at)):
+                break
+    return totals
@@ -0,0 +1,230 @@
+"""In-process endpoint benchmarks with stored baselines and regression thresholds.
+
+    SPA_DB_PROFILE=bench python -m lib.bench                  # run and compare against bench_baseline.json
+    SPA_DB_PROFILE=bench python -m lib.bench --save-baseline  # record a new baseline
+
+The app from app.py is driven through httpx's ASGI transport (no sockets),
+against a synthetic dataset from lib.datagen. The booking, payment and stock
+scenarios write, so the dataset is reseeded (same arguments and seed, same
+rows) before every run and each run starts from identical data. Each scenario reports
+p50/p95/p99 latency, throughput and SQL statements per request. The run fails
+when p95 latency regresses past the threshold or any scenario issues more
+queries per request than its baseline.
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+DEFAULT_BASELINE_PATH = "bench_baseline.json"
+DEFAULT_ITERATIONS = 200
+DEFAULT_WARMUP = 20
+DEFAULT_THRESHOLD = 0.25  # allowed p95 slowdown against the baseline
+MIN_REGRESSION_MS = 0.5  # p95 changes smaller than this are timer noise, whatever the ratio
+
+DEFAULT_DATASET = {"customers": 20000, "staff": 40, "days": 90, "seed": 42}
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._increment)
+
+    def _increment(self, *args):
+        self.count += 1
+
+
+def prepare_dataset(dataset: dict = DEFAULT_DATASET):
+    """Drops whatever the bench database holds and seeds the synthetic dataset; returns sample ids."""
+    from sqlalchemy import func, select
+    from lib.base import Base
+    from lib.cache import catalog_cache
+    from lib.config import SessionLocal, create_schema, get_engine
+    from lib.datagen import generate
+    from lib.models.customer import Customer
+    from lib.models.appointment import Appointment
+    from lib.models.inventory import Inventory
+    from lib.models.service import Service
+    from lib.models.staff import Staff
+    from lib.scheduling import THERAPIST_ROLE
+
+    Base.metadata.drop_all(bind=get_engine())
+    create_schema()
+    catalog_cache.invalidate("services", "staff")
+    with SessionLocal() as db:
+        generate(db, **dataset)
+
+        rng = random.Random(dataset.get("seed", 42))
+        first_day, last_day = db.execute(select(func.min(Appointment.scheduled_time), func.max(Appointment.scheduled_time))).one()
+        return {
+            "emails": [row for row in db.scalars(select(Customer.email).order_by(func.random()).limit(500))],
+            "customer_ids": list(db.scalars(select(Customer.id).limit(5000))),
+            "appointment_ids": list(db.scalars(select(Appointment.id).limit(5000))),
+            "therapist_ids": list(db.scalars(select(Staff.id).where(Staff.role == THERAPIST_ROLE))),
+            "service_ids": list(db.scalars(select(Service.id))),
+            "inventory_ids": list(db.scalars(select(Inventory.id))),
+            "days": [(first_day + timedelta(days=offset)).date().isoformat() for offset in range(dataset.get("days", 1))],
+            # Bookings go one per day after everything already booked, so they never conflict
+            "booking_base": datetime.combine(max(last_day.date(), date.today()) + timedelta(days=1), time(10, 0)),
+            "rng": rng,
+        }
+
+
+# name -> function(i, sample) returning (method, url, params)
+SCENARIOS = {
+    "customer_by_email": lambda i, s: ("GET", f"/customers/{s['rng'].choice(s['emails'])}", None),
+    "list_customers": lambda i, s: ("GET", "/customers/", {"after_id": s["rng"].choice(s["customer_ids"]), "limit": 100}),
+    "list_appointments": lambda i, s: ("GET", "/appointments/", {"after_id": s["rng"].choice(s["appointment_ids"]), "limit": 100, "order_by": "scheduled_time"}),
+    "list_appointments_expanded": lambda i, s: ("GET", "/appointments/", {"after_id": s["rng"].choice(s["appointment_ids"]), "limit": 100, "expand": "customer,service,staff"}),
+    "daily_schedule": lambda i, s: ("GET", "/appointments/schedule", {"day": s["rng"].choice(s["days"])}),
+    "list_services": lambda i, s: ("GET", "/services/", None),
+    "list_staff": lambda i, s: ("GET", "/staff/", None),
+    "available_slots": lambda i, s: ("GET", "/appointments/available-slots", {
+        "service_id": s["rng"].choice(s["service_ids"]), "start": f"{(day := s['rng'].choice(s['days']))}T09:00:00",
+        "end": f"{day}T18:00:00", "limit": 10,
+    }),
+    "book_appointment": lambda i, s: ("POST", "/appointments/", {
+        "customer_id": s["rng"].choice(s["customer_ids"]), "service_id": s["rng"].choice(s["service_ids"]),
+        "staff_id": s["rng"].choice(s["therapist_ids"]),
+        "scheduled_time": (s["booking_base"] + timedelta(days=i)).isoformat(),
+    }),
+    "process_payment": lambda i, s: ("POST", "/payments/", {
+        "customer_id": s["rng"].choice(s["customer_ids"]), "appointment_id": s["rng"].choice(s["appointment_ids"]), "amount": 80.0,
+    }),
+    "update_inventory": lambda i, s: ("PUT", f"/inventory/{s['rng'].choice(s['inventory_ids'])}", {"quantity": s["rng"].randint(0, 400)}),
+    "low_stock": lambda i, s: ("GET", "/inventory/low-stock/", None),
+}
+
+
+def percentile(sorted_values: list, fraction: float):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client, counter: QueryCounter, name: str, sample: dict, iterations: int, warmup: int):
+    """Runs one scenario sequentially and returns its latency, throughput and query statistics."""
+    build = SCENARIOS[name]
+    latencies, queries, errors = [], [], 0
+    started = timer.perf_counter()
+    for i in range(warmup + iterations):
+        method, url, params = build(i, sample)
+        if i == warmup:
+            started = timer.perf_counter()
+        before = counter.count
+        request_started = timer.perf_counter()
+        response = await client.request(method, url, params=params)
+        elapsed = timer.perf_counter() - request_started
+        if response.status_code >= 400:
+            errors += 1
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(counter.count - before)
+    total = timer.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "rps": round(iterations / total, 1),
+        "queries": round(statistics.mean(queries), 2),
+        "errors": errors,
+    }
+
+
+async def run_benchmarks(scenarios=None, iterations: int = DEFAULT_ITERATIONS, warmup: int = DEFAULT_WARMUP,
+                         dataset: dict = DEFAULT_DATASET, on_result=None):
+    """Reseeds the dataset, runs the selected scenarios in-process and returns {scenario: stats}."""
+    import httpx
+    from app import app
+    from lib.config import get_async_engine
+
+    sample = prepare_dataset(dataset)
+    counter = QueryCounter(get_async_engine().sync_engine)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in scenarios or SCENARIOS:
+            results[name] = await run_scenario(client, counter, name, sample, iterations, warmup)
+            if on_result:
+                on_result(name, results[name])
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD):
+    """Returns a list of human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, stats in results.items():
+        if stats["errors"]:
+            regressions.append(f"{name}: {stats['errors']} failed requests")
+        base = baseline.get(name)
+        if not base:
+            continue
+        if stats["p95_ms"] > max(base["p95_ms"] * (1 + threshold), base["p95_ms"] + MIN_REGRESSION_MS):
+            regressions.append(f"{name}: p95 {stats['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms (+{threshold:.0%} allowed)")
+        if stats["queries"] > base["queries"]:
+            regressions.append(f"{name}: {stats['queries']} queries/request vs baseline {base['queries']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    import click
+
+    # The dataset is dropped and reseeded in the bench database by default
+    os.environ.setdefault("SPA_DB_PROFILE", "bench")
+
+    @click.command()
+    @click.option("--scenario", "scenarios", multiple=True, type=click.Choice(list(SCENARIOS)), help="Run only these (repeatable).")
+    @click.option("--iterations", default=DEFAULT_ITERATIONS, show_default=True)
+    @click.option("--warmup", default=DEFAULT_WARMUP, show_default=True)
+    @click.option("--customers", default=DEFAULT_DATASET["customers"], show_default=True)
+    @click.option("--staff", default=DEFAULT_DATASET["staff"], show_default=True)
+    @click.option("--days", default=DEFAULT_DATASET["days"], show_default=True)
+    @click.option("--seed", default=DEFAULT_DATASET["seed"], show_default=True)
+    @click.option("--baseline", "baseline_path", default=DEFAULT_BASELINE_PATH, show_default=True)
+    @click.option("--save-baseline", is_flag=True, help="Store this run as the new baseline instead of comparing.")
+    @click.option("--threshold", default=DEFAULT_THRESHOLD, show_default=True, help="Allowed p95 slowdown (0.25 = 25%).")
+    def main(scenarios, iterations, warmup, customers, staff, days, seed, baseline_path, save_baseline, threshold):
+        """Benchmark the API endpoints and check them against a baseline."""
+        from lib.config import DB_PROFILE
+
+        if DB_PROFILE not in ("bench", "test"):
+            raise click.UsageError(f"Refusing to benchmark against the {DB_PROFILE} profile; use SPA_DB_PROFILE=bench or test.")
+        dataset = {"customers": customers, "staff": staff, "days": days, "seed": seed}
+        click.echo(f"{'scenario':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}")
+        report = lambda name, s: click.echo(
+            f"{name:<28}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['rps']:>9.0f}{s['queries']:>9.2f}"
+        )
+        results = asyncio.run(run_benchmarks(scenarios, iterations, warmup, dataset, on_result=report))
+
+        failed = {name: stats["errors"] for name, stats in results.items() if stats["errors"]}
+        if save_baseline:
+            if failed:
+                raise click.ClickException(f"Not saving a baseline with failed requests: {failed}")
+            with open(baseline_path, "w") as f:
+                json.dump({"dataset": dataset, "results": results}, f, indent=2)
+            click.echo(f"✅ Baseline saved to {baseline_path}")
+            return
+        if not os.path.exists(baseline_path):
+            raise click.ClickException(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get("dataset") != dataset:
+            click.echo(f"⚠️ Baseline was recorded on a different dataset: {baseline.get('dataset')}")
+        regressions = compare(results, baseline["results"], threshold)
+        for regression in regressions:
+            click.echo(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        click.echo("✅ No regressions against the baseline")
+
+    main()
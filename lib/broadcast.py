@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+HEARTBEAT_SECONDS = 15
+
+
+class Broadcaster:
+    """In-process fan-out of events to asyncio subscribers and plain callbacks.
+
+    `publish` is safe to call from any thread (sync sessions, the CLI, the event
+    loop itself). Each subscriber gets a bounded queue; a slow subscriber loses
+    its oldest events instead of holding up the publisher or everyone else.
+    """
+
+    def __init__(self, max_queue_size: int = 256):
+        self.max_queue_size = max_queue_size
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self):
+        """Registers an asyncio.Queue that receives every published event until the block exits."""
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def add_listener(self, callback):
+        """Calls `callback(event)` synchronously for every published event."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    @property
+    def has_audience(self):
+        """Whether anything (a subscriber or a listener) would receive a published event."""
+        return bool(self._subscribers or self._listeners)
+
+    def publish(self, event: dict):
+        for callback in list(self._listeners):
+            callback(event)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+
+def _offer(queue: asyncio.Queue, event: dict):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+def publish_on_commit(db: Session, broadcaster: Broadcaster, event: dict):
+    """Queues an event on the session; it is published only if the transaction commits.
+
+    An event with a "render" callable is a placeholder: just before the commit,
+    if the broadcaster has an audience, `render()` is called (it may query) and
+    the events it returns are published instead; otherwise it is dropped unrendered.
+    """
+    db.info.setdefault("pending_events", []).append((broadcaster, event))
+
+
+@event.listens_for(Session, "before_commit")
+def render_pending_events(session):
+    if session.in_nested_transaction():
+        return
+    pending = session.info.get("pending_events")
+    if not pending or not any("render" in event for _, event in pending):
+        return
+    rendered = []
+    for broadcaster, pending_event in pending:
+        if "render" not in pending_event:
+            rendered.append((broadcaster, pending_event))
+        elif broadcaster.has_audience:
+            rendered.extend((broadcaster, event) for event in pending_event["render"]())
+    pending[:] = rendered
+
+
+@event.listens_for(Session, "after_commit")
+def publish_pending_events(session):
+    if session.in_nested_transaction():
+        return  # a SAVEPOINT was released; wait for the outer commit
+    deferred = session.info.get("deferred_events")
+    for broadcaster, pending in session.info.pop("pending_events", []):
+        if deferred is not None:
+            deferred.append((broadcaster.publish, pending))  # the write queue publishes after its group commits
+        else:
+            broadcaster.publish(pending)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def mark_savepoint(session, transaction):
+    if transaction.nested:
+        session.info.setdefault("pending_event_marks", {})[transaction] = len(session.info.get("pending_events", ()))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def clear_savepoint_marks(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("pending_event_marks", None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_pending_events(session, previous_transaction):
+    if previous_transaction.nested:
+        # Only the events queued inside the rolled-back savepoint are dropped
+        mark = session.info.get("pending_event_marks", {}).pop(previous_transaction, None)
+        if mark is not None:
+            del session.info.get("pending_events", [])[mark:]
+        return
+    session.info.pop("pending_events", None)
+
+
+def format_sse(event: dict, event_type: str = None, event_id=None):
+    """Formats one Server-Sent Events message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_type:
+        lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_events(broadcaster: Broadcaster, request, event_type_key: str = "type"):
+    """Yields SSE messages for every event published while the client stays connected."""
+    with broadcaster.subscribe() as queue:
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event, event.get(event_type_key))
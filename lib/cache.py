@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from lib.serialization import dumps
+
+CATALOG_TTL_SECONDS = float(os.environ.get("SPA_CATALOG_TTL", "300"))
+RECENT_PAYMENT_KEYS = int(os.environ.get("SPA_RECENT_PAYMENT_KEYS", "10000"))
+
+CacheEntry = namedtuple("CacheEntry", ["value", "body", "etag", "expires_at"])
+
+
+class ReadThroughCache:
+    """In-process read-through cache with a TTL and explicit invalidation.
+
+    Entries keep the loaded rows, their pre-serialized JSON body and an ETag,
+    so a hit costs neither a query nor serialization. Each key carries a
+    version that `invalidate` bumps; a load that raced with an invalidation is
+    returned to its caller but not stored.
+    """
+
+    def __init__(self, ttl_seconds: float = CATALOG_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            return None
+        return entry
+
+    def version(self, key: str):
+        return self._versions.get(key, 0)
+
+    def store(self, key: str, value, version: int):
+        body = dumps(value)
+        entry = CacheEntry(value, body, f'"{hashlib.sha1(body).hexdigest()}"', time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = entry
+        return entry
+
+    def get(self, key: str, loader):
+        """Returns the cached entry for `key`, calling `loader()` on a miss."""
+        entry = self.lookup(key)
+        if entry is None:
+            version = self.version(key)
+            entry = self.store(key, loader(), version)
+        return entry
+
+    async def aget(self, key: str, loader):
+        """Async variant of `get`; `loader` is a coroutine function."""
+        entry = self.lookup(key)
+        if entry is None:
+            version = self.version(key)
+            entry = self.store(key, await loader(), version)
+        return entry
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._entries.pop(key, None)
+
+
+class LRUCache:
+    """Bounded in-process mapping that evicts the least recently used key."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Service catalog ("services") and staff roster ("staff")
+catalog_cache = ReadThroughCache()
+# Idempotency key -> payment id of recently processed payments
+recent_payment_keys = LRUCache(RECENT_PAYMENT_KEYS)
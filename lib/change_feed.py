@@ -0,0 +1,102 @@
+"""Long-poll and SSE delivery of the change log (lib.models.change).
+
+Consumers keep a cursor (the last change id they processed) and ask for what
+came after it instead of re-listing whole tables. The log itself is written by
+triggers; this module only decides when to look again. Sessions in this
+process that write something publish a wake-up once they commit, so waiting
+readers answer immediately. Writes from other processes (the CLI, other
+workers) are picked up by re-checking every SPA_CHANGE_POLL_SECONDS.
+"""
+import asyncio
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from lib.broadcast import HEARTBEAT_SECONDS, Broadcaster, format_sse
+from lib.models.change import CHANGE_LOGGED_TABLES, Change
+
+CHANGE_POLL_SECONDS = float(os.environ.get("SPA_CHANGE_POLL_SECONDS", "1"))
+MAX_WAIT_SECONDS = 60
+
+# Carries no data: a hint that the log may have grown
+change_events = Broadcaster(max_queue_size=1)
+
+
+def parse_entities(entity: str = None):
+    """Comma-separated table names to filter the feed on (empty = all)."""
+    entities = tuple(name.strip() for name in (entity or "").split(",") if name.strip())
+    unknown = set(entities) - set(CHANGE_LOGGED_TABLES)
+    if unknown:
+        raise ValueError(f"entity must be among: {', '.join(CHANGE_LOGGED_TABLES)}")
+    return entities
+
+
+@event.listens_for(Session, "after_flush")
+def mark_flush(session, flush_context):
+    session.info["wrote_changes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote_changes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def publish_change_wakeup(session):
+    if session.in_nested_transaction() or not session.info.pop("wrote_changes", False):
+        return
+    deferred = session.info.get("deferred_events")
+    if deferred is not None:
+        deferred.append((change_events.publish, {"type": "changes"}))
+    else:
+        change_events.publish({"type": "changes"})
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget_change_writes(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop("wrote_changes", None)
+
+
+async def _wait_for_wakeup(queue: asyncio.Queue, timeout: float):
+    try:
+        await asyncio.wait_for(queue.get(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def poll_changes(session_factory, since: int, limit: int, entities: tuple = (), wait: float = 0):
+    """Returns (changes, next_cursor), waiting up to `wait` seconds for the first change after `since`.
+
+    Each check uses a short-lived session, so a waiting client holds no pooled connection.
+    """
+    deadline = time.monotonic() + wait
+    with change_events.subscribe() as queue:
+        while True:
+            async with session_factory() as db:
+                changes, cursor = await Change.feed_async(db, since, limit, entities)
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return changes, cursor
+            since = cursor
+            await _wait_for_wakeup(queue, min(remaining, CHANGE_POLL_SECONDS))
+
+
+async def sse_changes(session_factory, request, since: int, limit: int, entities: tuple = ()):
+    """Yields each change after `since` as an SSE message (id = cursor, event = table), then follows the log."""
+    last_sent = time.monotonic()
+    with change_events.subscribe() as queue:
+        while not await request.is_disconnected():
+            async with session_factory() as db:
+                changes, since = await Change.feed_async(db, since, limit, entities)
+            for change in changes:
+                yield format_sse(change, change["entity"], change["id"])
+            if len(changes) == limit:
+                continue  # still catching up
+            if changes:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await _wait_for_wakeup(queue, CHANGE_POLL_SECONDS)
@@ -1,24 +1,175 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from .base import Base
+from .slow_query import install_slow_query_logger
+from .metrics import install_engine_metrics
 import sys
 import os
+import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Nothing here connects to the database or builds an engine at import time:
+# engines are created on first use and the schema only on `ensure_schema()`.
 
-# Import all models
-from lib.models.customer import Customer
-from lib.models.service import Service
-from lib.models.appointment import Appointment
-from lib.models.payment import Payment
-from lib.models.inventory import Inventory
-from lib.models.staff import Staff
-from lib.models.service_inventory import ServiceInventory
-from lib.models.appointment_inventory import AppointmentInventory
+# ---------------------- ENGINE PROFILES ----------------------
+# Selected with SPA_DB_PROFILE (dev / prod / bench / test); SPA_DATABASE_URL overrides the file.
 
-engine = create_engine('sqlite:///rejuvenate_spa.db', echo=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-session = SessionLocal()
+ENGINE_PROFILES = {
+    "dev": {
+        "url": "sqlite:///rejuvenate_spa.db",
+        "pragmas": {"busy_timeout": 5000},
+        "engine": {},
+        "create_schema": True,
+    },
+    "prod": {
+        "url": "sqlite:///rejuvenate_spa.db",
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -64000,      # 64 MB page cache per connection
+            "mmap_size": 268435456,    # 256 MB memory-mapped reads
+            "temp_store": "MEMORY",
+        },
+        "engine": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10, "pool_recycle": 3600},
+        "create_schema": False,  # schema is managed by `alembic upgrade head`
+    },
+    "bench": {
+        "url": "sqlite:///rejuvenate_spa_bench.db",
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "busy_timeout": 5000,
+            "cache_size": -128000,
+            "mmap_size": 1073741824,
+            "temp_store": "MEMORY",
+        },
+        "engine": {"pool_size": 20, "max_overflow": 0},
+        "create_schema": True,
+    },
+    "test": {
+        # Shared-cache in-memory database so the sync and async engines see the same tables
+        "url": "sqlite:///file:rejuvenate_spa_test?mode=memory&cache=shared&uri=true",
+        "pragmas": {},
+        "engine": {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}},
+        "create_schema": True,
+    },
+}
 
+DB_PROFILE = os.environ.get("SPA_DB_PROFILE", "dev")
+if DB_PROFILE not in ENGINE_PROFILES:
+    raise ValueError(f"Unknown SPA_DB_PROFILE '{DB_PROFILE}', expected one of: {', '.join(ENGINE_PROFILES)}")
 
-Base.metadata.create_all(bind=engine)
+DATABASE_URL = os.environ.get("SPA_DATABASE_URL", ENGINE_PROFILES[DB_PROFILE]["url"])
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Opt-in slow-query log, e.g. SPA_SLOW_QUERY_MS=50 SPA_SLOW_QUERY_SAMPLE=0.1
+SLOW_QUERY_MS = os.environ.get("SPA_SLOW_QUERY_MS")
+SLOW_QUERY_SAMPLE = float(os.environ.get("SPA_SLOW_QUERY_SAMPLE", "1.0"))
+
+
+def apply_pragmas(engine, pragmas: dict):
+    """Runs the profile's PRAGMAs on every new DBAPI connection."""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def begin_before_savepoint(engine):
+    """Opens the transaction explicitly when a SAVEPOINT would otherwise start it.
+
+    pysqlite only emits BEGIN before INSERT/UPDATE/DELETE, so a SAVEPOINT issued
+    first would open a transaction of its own and its RELEASE would commit (and
+    sync) it: nested transactions would be neither atomic with their parent nor
+    cheap. Plain reads keep pysqlite's deferred BEGIN, so a read-then-write
+    request still writes against the latest snapshot.
+    """
+    @event.listens_for(engine, "savepoint")
+    def emit_begin(conn, name):
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN")
+
+
+def build_engines(profile_name: str, url: str, async_url: str):
+    """Creates the sync and async engines for a profile."""
+    profile = ENGINE_PROFILES[profile_name]
+    sync_engine = create_engine(url, **profile["engine"])
+    async_engine = create_async_engine(async_url, **profile["engine"])
+
+    for name, target in (("sync", sync_engine), ("async", async_engine.sync_engine)):
+        apply_pragmas(target, profile["pragmas"])
+        begin_before_savepoint(target)
+        install_engine_metrics(target, name)
+        if SLOW_QUERY_MS is not None:
+            install_slow_query_logger(target, float(SLOW_QUERY_MS), SLOW_QUERY_SAMPLE)
+    return sync_engine, async_engine
+
+
+_engines = None
+_engines_lock = threading.Lock()
+
+
+def get_engines():
+    """Returns the (sync, async) engines, building them on first use."""
+    global _engines
+    if _engines is None:
+        with _engines_lock:
+            if _engines is None:
+                _engines = build_engines(DB_PROFILE, DATABASE_URL, ASYNC_DATABASE_URL)
+    return _engines
+
+
+def get_engine():
+    return get_engines()[0]
+
+
+def get_async_engine():
+    return get_engines()[1]
+
+
+def __getattr__(name):
+    # `from lib.config import engine` still works; the engine is built when first asked for
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySessionFactory:
+    """Callable like a sessionmaker, but only creates it (and its engine) on the first call."""
+
+    def __init__(self, make_factory):
+        self._make_factory = make_factory
+        self._factory = None
+
+    def __call__(self, **kwargs):
+        if self._factory is None:
+            self._factory = self._make_factory()
+        return self._factory(**kwargs)
+
+
+SessionLocal = LazySessionFactory(lambda: sessionmaker(autocommit=False, autoflush=False, bind=get_engine()))
+
+# Async session factory on the same database, used by the FastAPI endpoints
+AsyncSessionLocal = LazySessionFactory(lambda: async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False))
+
+
+def create_schema():
+    """Creates any missing tables and indexes from the models."""
+    # Import all models so every table is registered on Base.metadata
+    import lib.models.customer, lib.models.service, lib.models.staff, lib.models.appointment  # noqa: F401
+    import lib.models.payment, lib.models.inventory, lib.models.service_inventory, lib.models.appointment_inventory  # noqa: F401
+    import lib.models.rollup, lib.models.change, lib.models.archive  # noqa: F401
+    Base.metadata.create_all(bind=get_engine())
+
+
+def ensure_schema():
+    """Startup hook: creates the schema unless the profile leaves it to alembic migrations."""
+    if os.environ.get("SPA_CREATE_SCHEMA", str(int(ENGINE_PROFILES[DB_PROFILE]["create_schema"]))) == "1":
+        create_schema()
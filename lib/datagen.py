@@ -0,0 +1,314 @@
+"""Synthetic, reproducible datasets at production scale for load testing.
+
+Example (about 1M appointments):
+    SPA_DB_PROFILE=bench python -m lib.datagen --customers 500000 --staff 160 --days 1500
+
+The same arguments and --seed always produce the same rows. Everything is
+written with executemany INSERTs in batches of --batch-size, with explicit
+ids so payments and inventory usage can reference appointments without
+reading them back; the revenue and usage rollups are rebuilt at the end.
+"""
+import random
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from itertools import accumulate, islice
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.models.appointment import Appointment, STATUS_COMPLETED, STATUS_SCHEDULED
+from lib.models.payment import Payment
+from lib.models.inventory import Inventory
+from lib.models.service_inventory import ServiceInventory
+from lib.models.appointment_inventory import AppointmentInventory
+from lib.scheduling import THERAPIST_ROLE, OPENING_TIME, CLOSING_TIME, SLOT_STEP_MINUTES
+from lib.stock_alerts import DEFAULT_REORDER_THRESHOLD
+from lib.cache import catalog_cache
+from lib.rollups import rebuild_rollups
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_START = date(2025, 1, 1)
+
+FIRST_NAMES = [
+    "Alice", "Amara", "Ben", "Carlos", "Chloe", "David", "Elena", "Fatima", "George", "Grace",
+    "Hana", "Ivan", "Jade", "Kofi", "Laura", "Liam", "Mei", "Nadia", "Omar", "Priya",
+    "Quinn", "Rosa", "Sam", "Tariq", "Uma", "Victor", "Wanjiru", "Xavier", "Yusuf", "Zoe",
+]
+LAST_NAMES = [
+    "Adams", "Baker", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Hassan", "Ito", "Johnson",
+    "Kamau", "Lopez", "Mwangi", "Novak", "Otieno", "Patel", "Rossi", "Smith", "Tanaka", "Wright",
+]
+
+# (name, description, price, duration_minutes, popularity weight)
+SERVICE_CATALOG = [
+    ("Swedish Massage", "Full-body relaxation massage", 80.0, 60, 20),
+    ("Deep Tissue Massage", "Targeted muscle tension relief", 95.0, 60, 14),
+    ("Hot Stone Massage", "Massage with heated basalt stones", 110.0, 90, 6),
+    ("Express Massage", "Back, neck and shoulders", 45.0, 30, 10),
+    ("Classic Facial", "Cleanse, exfoliate and hydrate", 70.0, 60, 15),
+    ("Anti-Aging Facial", "Peptide and collagen treatment", 120.0, 75, 5),
+    ("Manicure", "Nail shaping and polish", 35.0, 45, 12),
+    ("Pedicure", "Foot soak, scrub and polish", 50.0, 60, 10),
+    ("Body Scrub", "Salt or sugar exfoliation", 65.0, 45, 4),
+    ("Aromatherapy", "Essential-oil massage", 90.0, 60, 8),
+    ("Couples Massage", "Side-by-side massage", 180.0, 90, 3),
+    ("Reflexology", "Pressure-point foot therapy", 60.0, 45, 5),
+]
+SERVICE_INDEXES = range(len(SERVICE_CATALOG))
+SERVICE_CUM_WEIGHTS = list(accumulate(weight for *_, weight in SERVICE_CATALOG))
+
+# (product name, services using it with quantity per appointment)
+INVENTORY_CATALOG = [
+    ("Massage Oil", {"Swedish Massage": 1, "Deep Tissue Massage": 1, "Express Massage": 1, "Couples Massage": 2}),
+    ("Basalt Stones Set", {"Hot Stone Massage": 1}),
+    ("Facial Cleanser", {"Classic Facial": 1, "Anti-Aging Facial": 1}),
+    ("Collagen Serum", {"Anti-Aging Facial": 1}),
+    ("Nail Polish", {"Manicure": 1, "Pedicure": 1}),
+    ("Foot Soak Salts", {"Pedicure": 2, "Reflexology": 1}),
+    ("Sea Salt Scrub", {"Body Scrub": 2}),
+    ("Essential Oils", {"Aromatherapy": 2, "Couples Massage": 1}),
+    ("Towels", {name: 2 for name, *_ in SERVICE_CATALOG}),
+]
+
+# Chance that a free 15-minute slot gets booked, by hour of day and by weekday (Monday first)
+HOURLY_DEMAND = {9: 0.35, 10: 0.5, 11: 0.6, 12: 0.8, 13: 0.75, 14: 0.5, 15: 0.55, 16: 0.75, 17: 0.85}
+WEEKDAY_DEMAND = [0.65, 0.65, 0.7, 0.75, 0.95, 1.0, 0.85]
+
+NON_THERAPIST_ROLES = ["Receptionist", "Manager"]
+
+
+def next_id(db: Session, model):
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def write_batches(db: Session, model, rows, batch_size: int):
+    """Inserts an iterable of row dicts in executemany batches, committing each one."""
+    written = 0
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        db.execute(insert(model), batch)
+        db.commit()
+        written += len(batch)
+    return written
+
+
+def customer_rows(rng: random.Random, first_id: int, count: int, start: datetime):
+    for customer_id in range(first_id, first_id + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        created_at = start - timedelta(days=rng.randint(0, 730), minutes=rng.randint(0, 1439))
+        yield {
+            "id": customer_id,
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}.{customer_id}@example.com",
+            "phone": f"07{rng.randint(0, 99999999):08d}",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def staff_rows(rng: random.Random, first_id: int, count: int, start: datetime):
+    for offset, staff_id in enumerate(range(first_id, first_id + count)):
+        # Roughly one in eight staff members is front desk or management
+        role = rng.choice(NON_THERAPIST_ROLES) if offset % 8 == 7 else THERAPIST_ROLE
+        yield {
+            "id": staff_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "role": role,
+            "created_at": start,
+            "updated_at": start,
+        }
+
+
+def days_off(staff_index: int):
+    """Two rotating days off a week, so every weekday is staffed."""
+    return {staff_index % 7, (staff_index + 3) % 7}
+
+
+def staff_day(rng: random.Random, day: date, utilization: float):
+    """Yields (start, end, catalog index) for one therapist's non-overlapping bookings on a day."""
+    opening = datetime.combine(day, OPENING_TIME)
+    closing = datetime.combine(day, CLOSING_TIME)
+    day_demand = utilization * WEEKDAY_DEMAND[day.weekday()]
+    cursor = opening
+    while cursor < closing:
+        if rng.random() < day_demand * HOURLY_DEMAND.get(cursor.hour, 0):
+            index = rng.choices(SERVICE_INDEXES, cum_weights=SERVICE_CUM_WEIGHTS)[0]
+            end = cursor + timedelta(minutes=SERVICE_CATALOG[index][3])
+            if end <= closing:
+                yield cursor, end, index
+                cursor = end
+                continue
+        cursor += timedelta(minutes=SLOT_STEP_MINUTES)
+
+
+def customer_picker(rng: random.Random, first_id: int, count: int, repeat_skew: float):
+    """Picks customers with a heavy-tailed (Pareto) weight, so a minority are frequent regulars.
+
+    `repeat_skew` is the Pareto shape: lower values concentrate more visits on the regulars.
+    """
+    cum_weights = list(accumulate(rng.paretovariate(repeat_skew) for _ in range(count)))
+    total = cum_weights[-1]
+    return lambda: first_id + bisect_right(cum_weights, rng.random() * total)
+
+
+def booking_rows(rng: random.Random, first_id: int, therapists: list, services: list, bill_of_materials: dict,
+                 pick_customer, start: date, days: int, as_of: datetime, utilization: float, out: dict):
+    """Yields appointment rows day by day; payments and usage rows for completed visits go to `out`."""
+    appointment_id = first_id
+    for day_offset in range(days):
+        day = start + timedelta(days=day_offset)
+        for staff_index, staff_id in enumerate(therapists):
+            if day.weekday() in days_off(staff_index):
+                continue
+            for begin, end, index in staff_day(rng, day, utilization):
+                service_id, price = services[index]
+                completed = end <= as_of
+                booked_at = begin - timedelta(days=rng.randint(0, 21), minutes=rng.randint(0, 600))
+                customer_id = pick_customer()
+                yield {
+                    "id": appointment_id,
+                    "customer_id": customer_id,
+                    "service_id": service_id,
+                    "staff_id": staff_id,
+                    "scheduled_time": begin,
+                    "end_time": end,
+                    "status": STATUS_COMPLETED if completed else STATUS_SCHEDULED,
+                    "completed_at": end if completed else None,
+                    "created_at": booked_at,
+                    "updated_at": end if completed else booked_at,
+                }
+                if completed:
+                    out["payments"].append({
+                        "customer_id": customer_id,
+                        "appointment_id": appointment_id,
+                        "amount": price,
+                        "service_id": service_id,
+                        "staff_id": staff_id,
+                        "payment_date": end,
+                        "updated_at": end,
+                    })
+                    for inventory_id, quantity_used in bill_of_materials[service_id]:
+                        out["usage"].append({
+                            "appointment_id": appointment_id,
+                            "inventory_id": inventory_id,
+                            "quantity_used": quantity_used,
+                            "created_at": end,
+                            "updated_at": end,
+                        })
+                appointment_id += 1
+
+
+def generate(db: Session, customers: int = 10000, staff: int = 20, days: int = 90, start: date = DEFAULT_START,
+             as_of: datetime = None, seed: int = 42, batch_size: int = DEFAULT_BATCH_SIZE,
+             utilization: float = 0.8, repeat_skew: float = 3.0, on_progress=None):
+    """Generates a full dataset and returns the number of rows written per table.
+
+    Rows are appended after the current maximum ids, so an existing dataset is
+    extended rather than replaced. `as_of` (default: two weeks before the end of
+    the range) splits completed, paid visits from upcoming scheduled ones.
+    """
+    rng = random.Random(seed)
+    start_at = datetime.combine(start, OPENING_TIME)
+    as_of = as_of or datetime.combine(start + timedelta(days=max(days - 14, 0)), OPENING_TIME)
+    report = on_progress or (lambda table, count: None)
+    counts = {}
+
+    first_customer = next_id(db, Customer)
+    counts["customers"] = write_batches(db, Customer, customer_rows(rng, first_customer, customers, start_at), batch_size)
+    report("customers", counts["customers"])
+
+    first_staff = next_id(db, Staff)
+    staff_members = list(staff_rows(rng, first_staff, staff, start_at))
+    counts["staff"] = write_batches(db, Staff, staff_members, batch_size)
+    therapists = [row["id"] for row in staff_members if row["role"] == THERAPIST_ROLE]
+    report("staff", counts["staff"])
+
+    first_service = next_id(db, Service)
+    service_rows = [
+        {"id": first_service + index, "name": name, "description": description, "price": price,
+         "duration_minutes": duration, "created_at": start_at, "updated_at": start_at}
+        for index, (name, description, price, duration, _) in enumerate(SERVICE_CATALOG)
+    ]
+    counts["services"] = write_batches(db, Service, service_rows, batch_size)
+    service_ids = {row["name"]: row["id"] for row in service_rows}
+    report("services", counts["services"])
+
+    first_item = next_id(db, Inventory)
+    inventory_rows, links = [], []
+    bill_of_materials = {service_id: [] for service_id in service_ids.values()}
+    for offset, (product_name, used_by) in enumerate(INVENTORY_CATALOG):
+        inventory_id = first_item + offset
+        quantity = rng.randint(0, 400)
+        inventory_rows.append({
+            "id": inventory_id, "product_name": product_name, "quantity": quantity,
+            "reorder_threshold": DEFAULT_REORDER_THRESHOLD, "is_low_stock": quantity < DEFAULT_REORDER_THRESHOLD,
+            "created_at": start_at, "updated_at": start_at,
+        })
+        for service_name, quantity_used in used_by.items():
+            service_id = service_ids[service_name]
+            bill_of_materials[service_id].append((inventory_id, quantity_used))
+            links.append({"service_id": service_id, "inventory_id": inventory_id, "quantity_used": quantity_used,
+                          "created_at": start_at, "updated_at": start_at})
+    counts["inventory"] = write_batches(db, Inventory, inventory_rows, batch_size)
+    counts["service_inventory"] = write_batches(db, ServiceInventory, links, batch_size)
+    report("inventory", counts["inventory"])
+    catalog_cache.invalidate("services", "staff")
+
+    if not customers or not therapists:
+        return counts
+
+    pick_customer = customer_picker(rng, first_customer, customers, repeat_skew)
+    services = [(service_ids[name], price) for name, _, price, *_ in SERVICE_CATALOG]
+    pending = {"payments": [], "usage": []}
+    appointments = booking_rows(
+        rng, next_id(db, Appointment), therapists, services, bill_of_materials,
+        pick_customer, start, days, as_of, utilization, pending,
+    )
+    for table in ("appointments", "payments", "appointment_inventory"):
+        counts[table] = 0
+    while batch := list(islice(appointments, batch_size)):
+        db.execute(insert(Appointment), batch)
+        for model, key, table in ((Payment, "payments", "payments"), (AppointmentInventory, "usage", "appointment_inventory")):
+            if pending[key]:
+                db.execute(insert(model), pending[key])
+                counts[table] += len(pending[key])
+                pending[key].clear()
+        db.commit()
+        counts["appointments"] += len(batch)
+        report("appointments", counts["appointments"])
+
+    # Payments and usage went in as raw INSERTs, so the rollups are recomputed once at the end
+    counts.update(rebuild_rollups(db))
+    report("revenue_rollups", counts["revenue_rollups"])
+    return counts
+
+
+if __name__ == "__main__":
+    import time
+    import click
+    from lib.config import SessionLocal, ensure_schema
+
+    @click.command()
+    @click.option("--customers", default=10000, show_default=True, help="Customers to create.")
+    @click.option("--staff", default=20, show_default=True, help="Staff members (about 7 in 8 are therapists).")
+    @click.option("--days", default=90, show_default=True, help="Days of appointment history and bookings.")
+    @click.option("--start", type=click.DateTime(["%Y-%m-%d"]), default=str(DEFAULT_START), show_default=True)
+    @click.option("--seed", default=42, show_default=True, help="Random seed; same arguments give the same data.")
+    @click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True)
+    @click.option("--utilization", default=0.8, show_default=True, help="Scales how busy therapists are (0-1).")
+    def main(customers, staff, days, start, seed, batch_size, utilization):
+        """Generate a synthetic spa dataset."""
+        ensure_schema()
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            counts = generate(
+                db, customers=customers, staff=staff, days=days, start=start.date(), seed=seed,
+                batch_size=batch_size, utilization=utilization,
+                on_progress=lambda table, count: click.echo(f"⏳ {table}: {count:,}"),
+            )
+        click.echo(f"✅ Generated in {time.perf_counter() - started:.1f}s:")
+        for table, count in counts.items():
+            click.echo(f"- {table}: {count:,}")
+
+    main()
@@ -0,0 +1,65 @@
+"""Import-time budget for the entry points.
+
+Wall-clock import times mostly measure SQLAlchemy and FastAPI and the speed
+of the machine, so the budget covers the project's own overhead: each entry
+point is imported in a fresh interpreter right after its third-party
+baseline, and the extra time is compared to the baseline's own import time.
+tests/test_import_budget.py runs the check; `python -m lib.import_budget`
+prints the numbers. Importing must also stay side-effect free: no engine
+built, no database touched.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+_SQLALCHEMY = ("sqlalchemy", "sqlalchemy.orm", "sqlalchemy.ext.asyncio")
+
+# entry point -> (third-party modules imported first, allowed own import time as a fraction of theirs)
+IMPORT_BUDGETS = {
+    "lib.config": (_SQLALCHEMY, 0.1),
+    "cli": ((*_SQLALCHEMY, "click"), 0.5),
+    "app": ((*_SQLALCHEMY, "fastapi"), 0.5),
+}
+
+_PROBE = (
+    "import time; started = time.perf_counter(); import {baseline}; loaded = time.perf_counter(); "
+    "import {module}; done = time.perf_counter(); "
+    "import lib.config; print((loaded - started) * 1000, (done - loaded) * 1000, lib.config._engines is None)"
+)
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module: str, baseline: tuple, runs: int = 5):
+    """Returns (median baseline ms, median own ms, whether the import left the engines unbuilt)."""
+    baseline_timings, own_timings, lazy = [], [], True
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(baseline=", ".join(baseline), module=module)],
+            capture_output=True, text=True, check=True, cwd=_ROOT,
+        )
+        baseline_ms, own_ms, engines_unbuilt = result.stdout.split()
+        baseline_timings.append(float(baseline_ms))
+        own_timings.append(float(own_ms))
+        lazy = lazy and engines_unbuilt == "True"
+    return statistics.median(baseline_timings), statistics.median(own_timings), lazy
+
+
+def check_import_budget(budgets: dict = IMPORT_BUDGETS, runs: int = 5):
+    """Returns {module: (baseline ms, own ms, budget ms, lazy)} and the modules that fail."""
+    results = {}
+    for module, (baseline, fraction) in budgets.items():
+        baseline_ms, own_ms, lazy = measure_import(module, baseline, runs)
+        results[module] = (baseline_ms, own_ms, baseline_ms * fraction, lazy)
+    failures = [module for module, (_, own_ms, budget_ms, lazy) in results.items() if own_ms > budget_ms or not lazy]
+    return results, failures
+
+
+if __name__ == "__main__":
+    results, failures = check_import_budget()
+    for module, (baseline_ms, own_ms, budget_ms, lazy) in results.items():
+        note = "" if lazy else " (built an engine at import)"
+        print(f"{'❌' if module in failures else '✅'} {module}: {own_ms:.0f} ms of {budget_ms:.0f} ms "
+              f"on top of {baseline_ms:.0f} ms for {', '.join(IMPORT_BUDGETS[module][0])}{note}")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,190 @@
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.models.inventory import Inventory
+from lib.cache import catalog_cache
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _text(value):
+    value = str(value).strip()
+    if not value:
+        raise ValueError("must not be empty")
+    return value
+
+
+def _optional_text(value):
+    return str(value).strip() or None
+
+
+def _email(value):
+    value = _text(value)
+    if "@" not in value:
+        raise ValueError("is not a valid email")
+    return value
+
+
+def _positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise ValueError("must be greater than zero")
+    return number
+
+
+def _positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise ValueError("must be greater than zero")
+    return number
+
+
+def _non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise ValueError("must not be negative")
+    return number
+
+
+# field -> (converter, required); missing optional fields fall back to the column default
+IMPORT_SPECS = {
+    "customers": {
+        "model": Customer,
+        "upsert_on": "email",
+        "fields": {"name": (_text, True), "email": (_email, True), "phone": (_text, True)},
+    },
+    "services": {
+        "model": Service,
+        "fields": {
+            "name": (_text, True),
+            "description": (_optional_text, False),
+            "price": (_positive_float, True),
+            "duration_minutes": (_positive_int, False),
+        },
+    },
+    "staff": {
+        "model": Staff,
+        "fields": {"name": (_text, True), "role": (_text, True)},
+    },
+    "inventory": {
+        "model": Inventory,
+        "fields": {"product_name": (_text, True), "quantity": (_non_negative_int, True)},
+    },
+}
+
+
+def iter_records(path: str):
+    """Streams (line number, record) pairs from a CSV or NDJSON file without loading it."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as source:
+        if extension == ".csv":
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+        elif extension in (".ndjson", ".jsonl"):
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, e
+        else:
+            raise ValueError(f"Unsupported import file type '{extension}', expected .csv or .ndjson")
+
+
+def validate_record(spec: dict, record):
+    """Converts a raw record to column values, raising ValueError with the reason if it is invalid."""
+    if isinstance(record, Exception):
+        raise ValueError(f"unreadable line ({record})")
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+
+    row = {}
+    for field, (convert, required) in spec["fields"].items():
+        raw = record.get(field)
+        if raw is None or raw == "":
+            if required:
+                raise ValueError(f"{field} is required")
+            continue
+        try:
+            row[field] = convert(raw)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{field} {e}")
+    return row
+
+
+def write_chunk(db: Session, spec: dict, rows: list):
+    """Writes one chunk with a single executemany; customers are upserted on email."""
+    model = spec["model"]
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault("created_at", now)
+        row["updated_at"] = now
+
+    if spec.get("upsert_on"):
+        key = spec["upsert_on"]
+        rows = list({row[key]: row for row in rows}.values())  # last occurrence in the chunk wins
+        stmt = sqlite_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={field: stmt.excluded[field] for field in spec["fields"] if field != key}
+            | {"updated_at": stmt.excluded.updated_at, "version": model.version + 1},
+        )
+    else:
+        stmt = insert(model)
+
+    db.execute(stmt, rows)
+    db.commit()
+    return len(rows)
+
+
+def import_file(db: Session, entity: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, rejects_path: str = None, on_progress=None):
+    """Imports a CSV/NDJSON file into `entity` in bounded chunks.
+
+    Rejected rows are appended to `rejects_path` (NDJSON, with line number and
+    reason) as they are found, so memory use depends only on `chunk_size`.
+    """
+    if entity not in IMPORT_SPECS:
+        raise ValueError(f"Unknown import target '{entity}', expected one of: {', '.join(IMPORT_SPECS)}")
+    spec = IMPORT_SPECS[entity]
+    rejects_path = rejects_path or f"{path}.rejected.ndjson"
+    summary = {"imported": 0, "rejected": 0, "rejects_path": None}
+
+    records = iter_records(path)
+    rejects = None
+    try:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+
+            rows = []
+            for line_number, record in chunk:
+                try:
+                    rows.append(validate_record(spec, record))
+                except ValueError as e:
+                    if rejects is None:
+                        rejects = open(rejects_path, "w", encoding="utf-8")
+                        summary["rejects_path"] = rejects_path
+                    rejected = record if isinstance(record, dict) else None
+                    rejects.write(json.dumps({"line": line_number, "reason": str(e), "record": rejected}, default=str) + "\n")
+                    summary["rejected"] += 1
+
+            if rows:
+                summary["imported"] += write_chunk(db, spec, rows)
+                catalog_cache.invalidate(entity)
+            if on_progress:
+                on_progress(summary)
+    finally:
+        if rejects is not None:
+            rejects.close()
+    return summary
@@ -0,0 +1,195 @@
+"""Request, SQL and pool metrics, rendered in the Prometheus text format.
+
+`MetricsMiddleware` times every request and opens a per-request context;
+the engine hooks from `install_engine_metrics` add each statement's count
+and duration to it, so every route gets latency, queries-per-request and
+query-time histograms. Session commits are timed too, and so is how long
+each pooled connection stays checked out.
+With SPA_SLOW_REQUEST_MS set, requests slower than that are logged together
+with their slowest SQL statements.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("spa.slow_request")
+
+SLOW_REQUEST_MS = os.environ.get("SPA_SLOW_REQUEST_MS")
+SLOW_REQUEST_STATEMENTS = 5  # slowest statements included in a slow-request log line
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """A labelled Prometheus histogram (cumulative buckets, _sum and _count)."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help_text, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for label_values, (counts, total) in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LATENCY = Histogram("spa_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram("spa_http_request_queries", "SQL statements issued per request.", ("method", "route"), QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_TIME = Histogram("spa_http_request_query_seconds", "Time spent executing SQL per request.", ("method", "route"))
+QUERY_LATENCY = Histogram("spa_db_query_duration_seconds", "Latency of individual SQL statements.")
+COMMIT_LATENCY = Histogram("spa_db_commit_duration_seconds", "Session commit latency, including the final flush.")
+POOL_CHECKOUT_DURATION = Histogram("spa_db_pool_checkout_seconds", "How long a connection stays checked out of the pool.", ("engine",))
+
+ALL_METRICS = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_QUERY_TIME, QUERY_LATENCY, COMMIT_LATENCY, POOL_CHECKOUT_DURATION)
+_checked_out = {}  # engine name -> connections currently checked out
+_checked_out_lock = threading.Lock()
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_time", "statements")
+
+    def __init__(self, keep_statements: bool):
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = [] if keep_statements else None
+
+
+_current_request = ContextVar("spa_request_stats", default=None)
+
+
+def install_engine_metrics(engine, name: str):
+    """Hooks a (sync) engine so its statements, and its pool checkouts, are measured."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        QUERY_LATENCY.observe(elapsed)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed
+            if stats.statements is not None:
+                stats.statements.append((elapsed, statement))
+
+    # Pool events registered on the engine carry over to the pool engine.dispose() creates,
+    # and fire for every pool class, StaticPool included
+    _checked_out.setdefault(name, 0)
+
+    @event.listens_for(engine, "checkout")
+    def record_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["metrics_checkout_start"] = time.perf_counter()
+        with _checked_out_lock:
+            _checked_out[name] += 1
+
+    @event.listens_for(engine, "checkin")
+    def record_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("metrics_checkout_start", None)
+        if started is None:
+            return
+        POOL_CHECKOUT_DURATION.observe(time.perf_counter() - started, name)
+        with _checked_out_lock:
+            _checked_out[name] -= 1
+
+
+@event.listens_for(Session, "before_commit")
+def start_commit_timer(session):
+    session.info["metrics_commit_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def record_commit(session):
+    if session.in_nested_transaction():
+        return  # a SAVEPOINT release, not the commit being timed
+    started = session.info.pop("metrics_commit_start", None)
+    if started is not None:
+        COMMIT_LATENCY.observe(time.perf_counter() - started)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    lines += ["# HELP spa_db_pool_checked_out Connections currently checked out.", "# TYPE spa_db_pool_checked_out gauge"]
+    with _checked_out_lock:
+        checked_out = sorted(_checked_out.items())
+    for name, count in checked_out:
+        lines.append(f'spa_db_pool_checked_out{{engine="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and SQL usage for every HTTP request."""
+
+    def __init__(self, app, slow_request_ms: float = None):
+        self.app = app
+        if slow_request_ms is None and SLOW_REQUEST_MS is not None:
+            slow_request_ms = float(SLOW_REQUEST_MS)
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(keep_statements=self.slow_request_ms is not None)
+        token = _current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            # Label by route template, not raw path, to keep the series count bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUEST_LATENCY.observe(elapsed, method, route, str(status))
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_QUERY_TIME.observe(stats.query_time, method, route)
+            if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+                slowest = sorted(stats.statements, reverse=True)[:SLOW_REQUEST_STATEMENTS]
+                logger.warning(
+                    "Slow request (%.1f ms, %d queries, %.1f ms in SQL): %s %s%s",
+                    elapsed * 1000, stats.queries, stats.query_time * 1000, method, scope["path"],
+                    "".join(f"\n  {seconds * 1000:.1f} ms: {sql}" for seconds, sql in slowest),
+                )
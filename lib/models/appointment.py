@@ -1,19 +1,66 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
-from sqlalchemy.orm import relationship, Session
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload, relationship, Session
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from lib.base import Base
 from lib.models.customer import Customer
 from lib.models.service import Service
 from lib.models.staff import Staff
+from lib.models.appointment_inventory import AppointmentInventory
+from lib.schedule_board import queue_schedule_event, queue_schedule_events
+
+STATUS_SCHEDULED = "Scheduled"
+STATUS_COMPLETED = "Completed"
+STATUS_CANCELLED = "Cancelled"
+CLOSED_STATUSES = (STATUS_COMPLETED, STATUS_CANCELLED)
+
+# Relationships that `?expand=` may inline; all are many-to-one, so a join adds no rows
+EXPANDABLE = ("customer", "service", "staff")
+
+
+def parse_expand(expand: str):
+    """Parses a comma-separated `expand` value into a tuple of relationship names."""
+    names = tuple(dict.fromkeys(name.strip() for name in (expand or "").split(",") if name.strip()))
+    unknown = [name for name in names if name not in EXPANDABLE]
+    if unknown:
+        raise ValueError(f"Cannot expand {', '.join(unknown)}; expand may include: {', '.join(EXPANDABLE)}")
+    return names
+
+
+def _column_dict(obj):
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+class BookingConflictError(ValueError):
+    """Raised when a staff member is already booked for an overlapping time."""
+
+    def __init__(self, conflicting_appointment_id: int):
+        super().__init__(f"Staff member is already booked (appointment {conflicting_appointment_id}).")
+        self.conflicting_appointment_id = conflicting_appointment_id
+
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Per-staff interval index: overlap checks and availability are range seeks on this
+        Index("ix_appointments_staff_id_scheduled_time", "staff_id", "scheduled_time"),
+        # A customer's upcoming appointments
+        Index("ix_appointments_customer_id_scheduled_time", "customer_id", "scheduled_time"),
+        # Daily schedule and order_by=scheduled_time pages across all staff
+        Index("ix_appointments_scheduled_time", "scheduled_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
     service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
     staff_id = Column(Integer, ForeignKey("staff.id"), nullable=False)
     scheduled_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime)  # scheduled_time + service duration, set when booked
+    status = Column(String, nullable=False, default=STATUS_SCHEDULED, server_default=STATUS_SCHEDULED)
+    completed_at = Column(DateTime)
+    cancelled_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)  # ✅ Store appointment creation timestamp
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ✅ Track modifications
 
@@ -21,36 +68,374 @@ class Appointment(Base):
     service = relationship("Service")
     staff = relationship("Staff")
 
+    @classmethod
+    def expand_options(cls, expand: tuple):
+        """Loader options that join the requested relationships into the same SELECT.
+
+        The joins are outer joins: customers and services can be hard-deleted, and
+        an appointment whose related row is gone is still listed, with that key None.
+        Anything not expanded raises instead of lazy-loading, so a forgotten
+        relationship shows up as an error rather than as N extra queries.
+        """
+        return [*(joinedload(getattr(cls, name)) for name in expand), raiseload("*")]
+
+    def to_dict(self, expand: tuple = ()):
+        """The appointment's columns plus each expanded relationship as a nested dict."""
+        data = _column_dict(self)
+        for name in expand:
+            related = getattr(self, name)
+            data[name] = _column_dict(related) if related is not None else None
+        return data
+
+    @classmethod
+    def get_expanded(cls, db: Session, appointment_id: int, expand: tuple = ()):
+        """Returns one appointment as a dict with the requested relationships inlined, or None."""
+        appointment = db.execute(
+            select(cls).options(*cls.expand_options(expand)).where(cls.id == appointment_id)
+        ).scalar_one_or_none()
+        return appointment.to_dict(expand) if appointment else None
+
+    @classmethod
+    async def get_expanded_async(cls, db: AsyncSession, appointment_id: int, expand: tuple = ()):
+        """Async variant of `get_expanded`."""
+        return await db.run_sync(cls.get_expanded, appointment_id, expand)
+
+    @classmethod
+    def daily_schedule_select(cls, day: date, staff_id: int = None, expand: tuple = EXPANDABLE):
+        """The single joined SELECT behind `daily_schedule`."""
+        start = datetime.combine(day, datetime.min.time())
+        stmt = (
+            select(cls)
+            .options(*cls.expand_options(expand))
+            .where(cls.scheduled_time >= start, cls.scheduled_time < start + timedelta(days=1), cls.status != STATUS_CANCELLED)
+            .order_by(cls.scheduled_time, cls.staff_id, cls.id)
+        )
+        if staff_id is not None:
+            stmt = stmt.where(cls.staff_id == staff_id)
+        return stmt
+
+    @classmethod
+    def daily_schedule(cls, db: Session, day: date, staff_id: int = None, expand: tuple = EXPANDABLE):
+        """Lists a day's appointments in time order with customer, service and staff inlined.
+
+        The whole day is one joined SELECT, however many appointments it holds.
+        """
+        stmt = cls.daily_schedule_select(day, staff_id, expand)
+        return [appointment.to_dict(expand) for appointment in db.scalars(stmt)]
+
+    @classmethod
+    async def daily_schedule_async(cls, db: AsyncSession, day: date, staff_id: int = None, expand: tuple = EXPANDABLE):
+        """Async variant of `daily_schedule`."""
+        return await db.run_sync(cls.daily_schedule, day, staff_id, expand)
+
+    @classmethod
+    def conflict_select(cls, staff_id: int, start: datetime, end: datetime, max_duration: int, exclude_id: int = None):
+        """The overlap check behind `find_conflict`.
+
+        Only appointments starting within the longest service duration before `start`
+        can overlap, so this is a bounded range seek on (staff_id, scheduled_time).
+        """
+        stmt = select(cls.id).where(
+            cls.staff_id == staff_id,
+            cls.scheduled_time > start - timedelta(minutes=max_duration),
+            cls.scheduled_time < end,
+            or_(cls.end_time > start, cls.end_time.is_(None)),
+            cls.status != STATUS_CANCELLED,
+        )
+        if exclude_id is not None:
+            stmt = stmt.where(cls.id != exclude_id)
+        return stmt.order_by(cls.scheduled_time).limit(1)
+
+    @classmethod
+    def find_conflict(cls, db: Session, staff_id: int, start: datetime, end: datetime, exclude_id: int = None):
+        """Returns the first appointment of the staff member overlapping [start, end), or None."""
+        return db.execute(cls.conflict_select(staff_id, start, end, Service.max_duration(db), exclude_id)).first()
+
     @classmethod
     def book_appointment(cls, db: Session, customer_id: int, service_id: int, staff_id: int, scheduled_time: datetime):
-        """Schedules a new appointment."""
+        """Schedules a new appointment, rejecting it if the staff member is already busy."""
+        try:
+            appointment = cls.add_booking(db, customer_id, service_id, staff_id, scheduled_time)
+        except BookingConflictError:
+            db.rollback()
+            raise
+
+        db.commit()
+        db.refresh(appointment)
+        return appointment
+
+    @classmethod
+    def add_booking(cls, db: Session, customer_id: int, service_id: int, staff_id: int, scheduled_time: datetime):
+        """Inserts and conflict-checks a booking without committing; the caller owns the transaction.
+
+        On a conflict the new row is still in the transaction, so the caller must roll back.
+        """
         if scheduled_time < datetime.utcnow():
             raise ValueError("Scheduled time must be in the future!")
 
+        service = db.get(Service, service_id)
+        if not service:
+            raise ValueError("Service not found!")
+        end_time = scheduled_time + timedelta(minutes=service.duration_minutes)
+
         appointment = cls(
             customer_id=customer_id, 
-            service_id=service_id, 
+            service=service,  # already loaded: a board event inlines it without another SELECT
             staff_id=staff_id, 
             scheduled_time=scheduled_time,
-            created_at=datetime.utcnow
+            end_time=end_time,
+            created_at=datetime.utcnow()
         )
         db.add(appointment)
+        # Insert first, then check: the INSERT takes SQLite's write lock, so a concurrent
+        # booking of the same slot waits here and then sees this row in its own check.
+        db.flush()
+        conflict = cls.find_conflict(db, staff_id, scheduled_time, end_time, exclude_id=appointment.id)
+        if conflict:
+            raise BookingConflictError(conflict.id)
+        queue_schedule_event(db, "booked", lambda: appointment.to_dict(EXPANDABLE))
+        return appointment
+
+    @classmethod
+    def reschedule(cls, db: Session, appointment_id: int, scheduled_time: datetime, staff_id: int = None):
+        """Moves a scheduled appointment to a new time (and optionally another staff member)."""
+        appointment = db.get(cls, appointment_id)
+        if not appointment:
+            raise ValueError("Appointment not found!")
+        if appointment.status != STATUS_SCHEDULED:
+            raise ValueError(f"Only scheduled appointments can be rescheduled (this one is {appointment.status}).")
+        if scheduled_time < datetime.utcnow():
+            raise ValueError("Scheduled time must be in the future!")
+
+        previous = {"scheduled_time": appointment.scheduled_time, "staff_id": appointment.staff_id}
+        appointment.scheduled_time = scheduled_time
+        appointment.end_time = scheduled_time + timedelta(minutes=appointment.service.duration_minutes)
+        if staff_id is not None:
+            appointment.staff_id = staff_id
+        # Same order as add_booking: the UPDATE takes the write lock before the overlap check
+        db.flush()
+        conflict = cls.find_conflict(db, appointment.staff_id, scheduled_time, appointment.end_time, exclude_id=appointment.id)
+        if conflict:
+            db.rollback()
+            raise BookingConflictError(conflict.id)
+        db.expire(appointment, ["staff"])
+        queue_schedule_event(db, "rescheduled", lambda: appointment.to_dict(EXPANDABLE), previous)
         db.commit()
-        db.refresh(appointment)
         return appointment
 
+    @classmethod
+    async def reschedule_async(cls, db: AsyncSession, appointment_id: int, scheduled_time: datetime, staff_id: int = None):
+        """Async variant of `reschedule`."""
+        return await db.run_sync(cls.reschedule, appointment_id, scheduled_time, staff_id)
+
+    @classmethod
+    def queue_schedule_events(cls, db: Session, event_type: str, appointment_ids: list):
+        """Queues board events for appointments written with Core statements, loaded in one joined SELECT if a board is listening."""
+        if not appointment_ids:
+            return
+        stmt = select(cls).options(*cls.expand_options(EXPANDABLE)).where(cls.id.in_(appointment_ids)).order_by(cls.id)
+        queue_schedule_events(db, event_type, lambda: [appointment.to_dict(EXPANDABLE) for appointment in db.scalars(stmt)])
+
+    @classmethod
+    async def find_conflict_async(cls, db: AsyncSession, staff_id: int, start: datetime, end: datetime, exclude_id: int = None):
+        """Async variant of `find_conflict`."""
+        return await db.run_sync(cls.find_conflict, staff_id, start, end, exclude_id)
+
+    @classmethod
+    async def book_appointment_async(cls, db: AsyncSession, customer_id: int, service_id: int, staff_id: int, scheduled_time: datetime):
+        """Async variant of `book_appointment`."""
+        return await db.run_sync(cls.book_appointment, customer_id, service_id, staff_id, scheduled_time)
+
+    @classmethod
+    def stored_intervals_select(cls, staff_ids, start: datetime, end: datetime, max_duration: int, exclude_ids=()):
+        """Booked intervals of several staff members that may overlap [start, end), in (staff_id, time) order."""
+        stmt = select(cls.id, cls.staff_id, cls.scheduled_time, cls.end_time).where(
+            cls.staff_id.in_(staff_ids),
+            cls.scheduled_time > start - timedelta(minutes=max_duration),
+            cls.scheduled_time < end,
+            cls.status != STATUS_CANCELLED,
+        )
+        if exclude_ids:
+            stmt = stmt.where(cls.id.notin_(exclude_ids))
+        return stmt.order_by(cls.staff_id, cls.scheduled_time)
+
+    @classmethod
+    def _stored_conflicts(cls, db: Session, candidates: dict, exclude_ids=()):
+        """Maps each candidate index to a stored appointment it overlaps, using one range query.
+
+        `candidates` maps request index -> (staff_id, start, end).
+        """
+        max_minutes = Service.max_duration(db)
+        max_duration = timedelta(minutes=max_minutes)
+        stored = defaultdict(list)
+        stmt = cls.stored_intervals_select(
+            {staff_id for staff_id, _, _ in candidates.values()},
+            min(start for _, start, _ in candidates.values()),
+            max(end for _, _, end in candidates.values()),
+            max_minutes,
+            exclude_ids,
+        )
+        for appointment_id, staff_id, start, end in db.execute(stmt):
+            stored[staff_id].append((start, end or start + max_duration, appointment_id))
+
+        conflicts = {}
+        for index, (staff_id, start, end) in candidates.items():
+            intervals = stored[staff_id]
+            before_end = intervals[:bisect_left(intervals, (end,))]
+            clash = next((
+                interval for interval in reversed(before_end)
+                if interval[0] > start - max_duration and interval[1] > start
+            ), None)
+            if clash:
+                conflicts[index] = clash[2]
+        return conflicts
+
+    @classmethod
+    def book_appointments_bulk(cls, db: Session, requests: list, atomic: bool = False):
+        """Books a batch of appointments in one transaction and returns a result per request.
+
+        Conflicts inside the batch and against stored appointments are found with a
+        fixed number of set-based queries. Like `book_appointment`, stored conflicts
+        are checked again after the insert, so concurrent bookers are serialized.
+        With `atomic=True` nothing is booked unless every request succeeds.
+        """
+        now = datetime.utcnow()
+        results = [None] * len(requests)
+        services = dict(db.query(Service.id, Service.duration_minutes).filter(
+            Service.id.in_({r["service_id"] for r in requests})
+        ).all())
+
+        def reject(index, status, detail):
+            results[index] = {"index": index, "status": status, "detail": detail}
+
+        candidates = {}
+        for index, request in enumerate(requests):
+            if request["scheduled_time"] < now:
+                reject(index, "invalid", "Scheduled time must be in the future!")
+            elif request["service_id"] not in services:
+                reject(index, "invalid", "Service not found!")
+            else:
+                end_time = request["scheduled_time"] + timedelta(minutes=services[request["service_id"]])
+                candidates[index] = (request["staff_id"], request["scheduled_time"], end_time)
+
+        if candidates:
+            for index, appointment_id in cls._stored_conflicts(db, candidates).items():
+                reject(index, "conflict", f"Staff member is already booked (appointment {appointment_id}).")
+                del candidates[index]
+
+        # Conflicts within the batch: earlier requests for the same slot win
+        accepted = {}
+        kept_by_staff = defaultdict(list)
+        for index, (staff_id, start, end) in candidates.items():
+            clash = next((
+                other for other, other_start, other_end in kept_by_staff[staff_id]
+                if other_start < end and start < other_end
+            ), None)
+            if clash is not None:
+                reject(index, "conflict", f"Overlaps request {clash} in this batch.")
+            else:
+                kept_by_staff[staff_id].append((index, start, end))
+                accepted[index] = (staff_id, start, end)
+
+        if accepted:
+            order = sorted(accepted)
+            new_ids = db.scalars(
+                insert(cls).returning(cls.id, sort_by_parameter_order=True),
+                [{**requests[i], "end_time": accepted[i][2], "created_at": now, "updated_at": now} for i in order],
+            ).all()
+            inserted = dict(zip(order, new_ids))
+
+            # Re-check now that the insert holds the write lock: catches concurrent bookings
+            late_conflicts = cls._stored_conflicts(db, accepted, exclude_ids=new_ids)
+            for index in order:
+                if index in late_conflicts:
+                    reject(index, "conflict", f"Staff member is already booked (appointment {late_conflicts[index]}).")
+                else:
+                    results[index] = {"index": index, "status": "booked", "appointment_id": inserted[index]}
+            if late_conflicts:
+                db.execute(delete(cls).where(cls.id.in_([inserted[i] for i in late_conflicts])))
+            cls.queue_schedule_events(db, "booked", [inserted[i] for i in order if i not in late_conflicts])
+
+        if atomic and any(result["status"] != "booked" for result in results):
+            db.rollback()
+            for result in results:
+                if result["status"] == "booked":
+                    result.update(status="not_booked", detail="Batch rolled back.")
+                    del result["appointment_id"]
+            return results
+
+        db.commit()
+        return results
+
+    @classmethod
+    async def book_appointments_bulk_async(cls, db: AsyncSession, requests: list, atomic: bool = False):
+        """Async variant of `book_appointments_bulk`."""
+        return await db.run_sync(cls.book_appointments_bulk, requests, atomic)
+
+    @classmethod
+    def complete_appointments(cls, db: Session, appointment_ids: list):
+        """Marks appointments completed and consumes their service inventory in one transaction.
+
+        The status flip is a conditional UPDATE, so an appointment can only be completed
+        (and its stock deducted) once even if several requests race. If any item is short
+        the whole batch is rolled back and InsufficientStockError is raised.
+        """
+        now = datetime.utcnow()
+        completed = db.execute(
+            update(cls)
+            .where(cls.id.in_(appointment_ids), cls.status == STATUS_SCHEDULED)
+            .values(status=STATUS_COMPLETED, completed_at=now, updated_at=now)
+            .returning(cls.id, cls.service_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        consumed = AppointmentInventory.consume_for_appointments(db, [tuple(row) for row in completed])
+        cls.queue_schedule_events(db, "completed", [appointment_id for appointment_id, _ in completed])
+        db.commit()
+
+        completed_ids = {appointment_id for appointment_id, _ in completed}
+        return {
+            "completed": sorted(completed_ids),
+            "skipped": [i for i in appointment_ids if i not in completed_ids],
+            "inventory_consumed": consumed,
+        }
+
+    @classmethod
+    async def complete_appointments_async(cls, db: AsyncSession, appointment_ids: list):
+        """Async variant of `complete_appointments`."""
+        return await db.run_sync(cls.complete_appointments, appointment_ids)
+
     @classmethod
     def cancel_appointment(cls, db: Session, appointment_id: int):
-        """Cancels an appointment by removing it from the database."""
+        """Cancels a scheduled appointment; the row stays (status Cancelled) and frees the slot."""
         appointment = db.query(cls).filter(cls.id == appointment_id).first()
         if not appointment:
             raise ValueError("Appointment not found!")
-        
-        db.delete(appointment)
+        if appointment.status != STATUS_SCHEDULED:
+            raise ValueError(f"Only scheduled appointments can be cancelled (this one is {appointment.status}).")
+
+        appointment.status = STATUS_CANCELLED
+        appointment.cancelled_at = datetime.utcnow()
+        queue_schedule_event(db, "cancelled", lambda: appointment.to_dict(EXPANDABLE))
         db.commit()
         return {"message": "Appointment successfully canceled."}
 
+    @classmethod
+    async def cancel_appointment_async(cls, db: AsyncSession, appointment_id: int):
+        """Async variant of `cancel_appointment`."""
+        return await db.run_sync(cls.cancel_appointment, appointment_id)
+
+    @classmethod
+    def upcoming_select(cls, customer_id: int, now: datetime):
+        """A customer's appointments after `now`: a range seek on (customer_id, scheduled_time)."""
+        return select(cls).where(cls.customer_id == customer_id, cls.scheduled_time > now, cls.status != STATUS_CANCELLED)
+
     @classmethod
     def get_upcoming_appointments(cls, db: Session, customer_id: int):
         """Retrieves all upcoming appointments for a customer."""
-        return db.query(cls).filter(cls.customer_id == customer_id, cls.scheduled_time > datetime.utcnow()).all()
+        return db.scalars(cls.upcoming_select(customer_id, datetime.utcnow())).all()
+
+    @classmethod
+    async def get_upcoming_appointments_async(cls, db: AsyncSession, customer_id: int):
+        """Async variant of `get_upcoming_appointments`."""
+        return await db.run_sync(cls.get_upcoming_appointments, customer_id)
@@ -1,11 +1,30 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, case, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, relationship
+from collections import defaultdict
 from datetime import datetime
 from lib.base import Base
 from lib.models.inventory import Inventory
+from lib.models.service_inventory import ServiceInventory
+from lib.models.rollup import UsageRollup
+from lib.stock_alerts import queue_crossing
+
+
+class InsufficientStockError(ValueError):
+    """Raised when consumption would take an inventory item below zero."""
+
+    def __init__(self, shortages: dict):
+        items = ", ".join(f"item {item_id} (needs {needed})" for item_id, needed in sorted(shortages.items()))
+        super().__init__(f"Not enough stock available: {items}")
+        self.shortages = shortages
+
 
 class AppointmentInventory(Base):
     __tablename__ = "appointment_inventory"
+    __table_args__ = (
+        Index("ix_appointment_inventory_appointment_id", "appointment_id"),
+        Index("ix_appointment_inventory_inventory_id", "inventory_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     appointment_id = Column(Integer, ForeignKey("appointments.id"), nullable=False)
@@ -25,26 +44,106 @@ class AppointmentInventory(Base):
             appointment_id=appointment_id,
             inventory_id=inventory_id,
             quantity_used=quantity_used,
-            created_at=datetime.utcnow
+            created_at=datetime.utcnow()
         )
         db.add(appointment_inventory)
+        UsageRollup.add(db, appointment_inventory.created_at, {inventory_id: quantity_used})
         db.commit()
         db.refresh(appointment_inventory)
         return appointment_inventory
 
+    @classmethod
+    async def record_inventory_usage_async(cls, db: AsyncSession, appointment_id: int, inventory_id: int, quantity_used: int):
+        """Async variant of `record_inventory_usage`."""
+        return await db.run_sync(cls.record_inventory_usage, appointment_id, inventory_id, quantity_used)
+
     @classmethod
     def deduct_inventory(cls, db: Session, inventory_id: int, quantity_used: int):
-        """Deducts inventory stock from the Inventory table."""
-        inventory_item = db.query(Inventory).filter(Inventory.id == inventory_id).first()
-        
-        if not inventory_item:
-            raise ValueError("Inventory item not found!")
-        
-        if inventory_item.quantity < quantity_used:
+        """Deducts inventory stock with a single conditional UPDATE, so stock never goes negative."""
+        updated = db.execute(
+            update(Inventory)
+            .where(Inventory.id == inventory_id, Inventory.quantity >= quantity_used)
+            .values(
+                quantity=Inventory.quantity - quantity_used,
+                is_low_stock=Inventory.quantity - quantity_used < Inventory.reorder_threshold,
+                updated_at=datetime.utcnow(),
+                version=Inventory.version + 1,
+            )
+            .returning(Inventory.quantity, Inventory.reorder_threshold)
+        ).first()
+        if updated is None:
+            db.rollback()
+            if not db.get(Inventory, inventory_id):
+                raise ValueError("Inventory item not found!")
             raise ValueError("Not enough stock available!")
 
-        inventory_item.quantity -= quantity_used  # Deduct from inventory stock
-        inventory_item.updated_at = datetime.utcnow  #  Update timestamp
+        quantity, threshold = updated
+        queue_crossing(db, inventory_id, quantity + quantity_used < threshold, quantity, threshold)
         db.commit()
-        db.refresh(inventory_item)
-        return inventory_item
+        return db.get(Inventory, inventory_id, populate_existing=True)
+
+    @classmethod
+    def consume_for_appointments(cls, db: Session, appointments: list):
+        """Deducts the bill of materials for (appointment_id, service_id) pairs and records the usage.
+
+        All inventory lines are deducted by one conditional UPDATE (quantity >= needed)
+        and the usage rows are written with one bulk INSERT. Raises InsufficientStockError
+        without changing anything if any item is short; the caller owns the commit.
+        """
+        service_ids = {service_id for _, service_id in appointments}
+        bill_of_materials = defaultdict(list)
+        for service_id, inventory_id, quantity_used in db.execute(ServiceInventory.bill_of_materials_select(service_ids)):
+            bill_of_materials[service_id].append((inventory_id, quantity_used))
+
+        needed = defaultdict(int)
+        usage_rows = []
+        now = datetime.utcnow()
+        for appointment_id, service_id in appointments:
+            for inventory_id, quantity_used in bill_of_materials[service_id]:
+                needed[inventory_id] += quantity_used
+                usage_rows.append({
+                    "appointment_id": appointment_id,
+                    "inventory_id": inventory_id,
+                    "quantity_used": quantity_used,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+        if not needed:
+            return {}
+
+        amount = case(needed, value=Inventory.id)
+        updated = db.execute(
+            update(Inventory)
+            .where(Inventory.id.in_(needed), Inventory.quantity >= amount)
+            .values(
+                quantity=Inventory.quantity - amount,
+                is_low_stock=Inventory.quantity - amount < Inventory.reorder_threshold,
+                updated_at=now,
+                version=Inventory.version + 1,
+            )
+            .returning(Inventory.id, Inventory.quantity, Inventory.reorder_threshold)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if len(updated) != len(needed):
+            db.rollback()
+            in_stock = dict(db.query(Inventory.id, Inventory.quantity).filter(Inventory.id.in_(needed)))
+            raise InsufficientStockError({
+                item_id: quantity for item_id, quantity in needed.items()
+                if in_stock.get(item_id, 0) < quantity
+            })
+
+        for inventory_id, quantity, threshold in updated:
+            queue_crossing(db, inventory_id, quantity + needed[inventory_id] < threshold, quantity, threshold)
+        db.execute(insert(cls), usage_rows)
+        UsageRollup.add(db, now, needed)
+        return dict(needed)
+
+    @classmethod
+    async def consume_for_appointments_async(cls, db: AsyncSession, appointments: list):
+        """Async variant of `consume_for_appointments`."""
+        return await db.run_sync(cls.consume_for_appointments, appointments)
+
+    @classmethod
+    async def deduct_inventory_async(cls, db: AsyncSession, inventory_id: int, quantity_used: int):
+        """Async variant of `deduct_inventory`."""
+        return await db.run_sync(cls.deduct_inventory, inventory_id, quantity_used)
@@ -0,0 +1,64 @@
+from sqlalchemy import Boolean, Column, DateTime, Index, Table, literal_column, select
+from sqlalchemy.orm import Session
+from lib.base import Base
+from lib.models.appointment import Appointment
+from lib.models.payment import Payment
+from lib.models.appointment_inventory import AppointmentInventory
+
+
+def archive_table(model, *indexes):
+    """Cold copy of `model`'s table: the same columns (ids kept, no foreign keys) plus archived_at."""
+    live = model.__table__
+    columns = [Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable) for column in live.columns]
+    return Table(f"{live.name}_archive", Base.metadata, *columns, Column("archived_at", DateTime, nullable=False), *indexes)
+
+
+appointments_archive = archive_table(
+    Appointment,
+    Index("ix_appointments_archive_customer_id_scheduled_time", "customer_id", "scheduled_time"),
+    Index("ix_appointments_archive_scheduled_time", "scheduled_time"),
+)
+payments_archive = archive_table(
+    Payment,
+    Index("ix_payments_archive_customer_id_payment_date", "customer_id", "payment_date"),
+    Index("ix_payments_archive_appointment_id", "appointment_id"),
+)
+appointment_inventory_archive = archive_table(
+    AppointmentInventory,
+    Index("ix_appointment_inventory_archive_appointment_id", "appointment_id"),
+)
+
+ARCHIVE_TABLES = {
+    Appointment: appointments_archive,
+    Payment: payments_archive,
+    AppointmentInventory: appointment_inventory_archive,
+}
+
+
+def with_archive(model):
+    """A subquery over the live and archived rows of `model`, with the live table's columns.
+
+    Read paths that are asked to include archived data select from this instead
+    of the table; everything else only ever touches the (small) live table.
+    """
+    live = model.__table__
+    archive = ARCHIVE_TABLES[model]
+    return (
+        select(*live.columns, literal_column("0", Boolean).label("archived"))
+        .union_all(select(*(archive.c[column.name] for column in live.columns), literal_column("1")))
+        .subquery(f"{live.name}_all")
+    )
+
+
+def get_archived(db: Session, model, object_id: int, expand: tuple = ()):
+    """One archived row as a dict (archived=True), or None; `expand`ed relationships are fetched by primary key."""
+    archive = ARCHIVE_TABLES[model]
+    row = db.execute(select(archive).where(archive.c.id == object_id)).mappings().first()
+    if row is None:
+        return None
+    data = {**row, "archived": True}
+    for name in expand:
+        relationship = model.__mapper__.relationships[name]
+        related = db.get(relationship.mapper.class_, data[next(iter(relationship.local_columns)).name])
+        data[name] = {column.key: getattr(related, column.key) for column in related.__table__.columns} if related is not None else None
+    return data
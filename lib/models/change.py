@@ -0,0 +1,98 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from datetime import datetime
+from lib.base import Base
+
+# Tables whose inserts, updates and deletes are captured; the rollups are derived data and excluded
+CHANGE_LOGGED_TABLES = (
+    "customers", "services", "staff", "appointments", "payments",
+    "inventory", "service_inventory", "appointment_inventory",
+)
+OPERATIONS = (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD"))
+MAX_FEED_PAGE = 1000
+
+
+def change_trigger_sql(table: str):
+    """CREATE TRIGGER statements that append a change row for every write to `table`."""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS changes_{table}_{op} AFTER {op.upper()} ON {table} "
+        f"BEGIN INSERT INTO changes (entity, entity_id, op, changed_at) "
+        f"VALUES ('{table}', {row}.id, '{op}', strftime('%Y-%m-%d %H:%M:%f', 'now')); END"
+        for op, row in OPERATIONS
+    ]
+
+
+class Change(Base):
+    """Append-only change log, written by SQLite triggers in the same transaction as the change.
+
+    Triggers rather than session hooks, so bulk Core statements, imports and
+    raw SQL are captured as well. `id` is the feed cursor: it is AUTOINCREMENT
+    (never reused) and SQLite has a single writer, so ids become visible in
+    commit order and a reader never skips a row that commits later.
+    """
+    __tablename__ = "changes"
+    __table_args__ = (
+        Index("ix_changes_entity_id", "entity", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # table name
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # insert / update / delete
+    changed_at = Column(DateTime, nullable=False)
+
+    @classmethod
+    def feed_select(cls, since: int, high: int, limit: int, entities: tuple = ()):
+        """One page of the log: a primary-key range scan, or (entity, id) index range scans when filtered."""
+        stmt = select(cls.id, cls.entity, cls.entity_id, cls.op, cls.changed_at).where(cls.id > since, cls.id <= high)
+        if entities:
+            stmt = stmt.where(cls.entity.in_(entities))
+        return stmt.order_by(cls.id).limit(limit)
+
+    @classmethod
+    def feed(cls, db: Session, since: int = 0, limit: int = 100, entities: tuple = ()):
+        """Changes after cursor `since`, oldest first, each with the row's current data (None once deleted).
+
+        Returns (changes, next_cursor). The high-water mark is read before the
+        page, so every id up to it is already committed and the cursor can skip
+        past it even when an entity filter matched nothing.
+        """
+        high = db.scalar(select(func.max(cls.id))) or 0
+        changes = [dict(row) for row in db.execute(cls.feed_select(since, high, limit, entities)).mappings()]
+        next_cursor = changes[-1]["id"] if len(changes) == limit else max(since, high)
+
+        # One IN query per entity for the current state of the changed rows
+        ids_by_entity = {}
+        for change in changes:
+            ids_by_entity.setdefault(change["entity"], set()).add(change["entity_id"])
+        rows = {}
+        for entity, ids in ids_by_entity.items():
+            table = Base.metadata.tables[entity]
+            for row in db.execute(select(table).where(table.c.id.in_(ids))).mappings():
+                rows[entity, row["id"]] = dict(row)
+        for change in changes:
+            change["data"] = rows.get((change["entity"], change["entity_id"]))
+        return changes, next_cursor
+
+    @classmethod
+    async def feed_async(cls, db: AsyncSession, since: int = 0, limit: int = 100, entities: tuple = ()):
+        """Async variant of `feed`."""
+        return await db.run_sync(cls.feed, since, limit, entities)
+
+    @classmethod
+    def prune(cls, db: Session, before: datetime):
+        """Deletes log entries older than `before`; consumers further behind must resync from the list endpoints."""
+        deleted = db.query(cls).filter(cls.changed_at < before).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+# create_all() also installs the triggers (IF NOT EXISTS, so re-running is harmless)
+@event.listens_for(Base.metadata, "after_create")
+def create_change_triggers(metadata, connection, **kw):
+    for table in CHANGE_LOGGED_TABLES:
+        if table in metadata.tables:
+            for statement in change_trigger_sql(table):
+                connection.exec_driver_sql(statement)
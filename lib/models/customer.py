@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from lib.base import Base
+from lib.versioning import check_version, commit_versioned, version_column
 
 class Customer(Base):
     __tablename__ = "customers"
@@ -12,6 +14,9 @@ class Customer(Base):
     phone = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)  # ✅ Auto-set timestamp
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = version_column()  # Bumped on every update; UPDATEs only apply to the version that was read
+
+    __mapper_args__ = {"version_id_col": version}
 
     @classmethod
     def create(cls, db: Session, name: str, email: str, phone: str):
@@ -22,6 +27,16 @@ class Customer(Base):
         db.refresh(customer)  # ✅ Ensure latest data is retrieved
         return customer
 
+    @classmethod
+    async def create_async(cls, db: AsyncSession, name: str, email: str, phone: str):
+        """Async variant of `create`."""
+        return await db.run_sync(cls.create, name, email, phone)
+
+    @classmethod
+    def by_email_select(cls, email: str):
+        """The customer's columns for an email, a lookup on the unique email index."""
+        return select(*cls.__table__.columns).where(cls.email == email)
+
     @classmethod
     def get_by_email(cls, db: Session, email: str):
         """Fetches a customer by email or returns an error if not found."""
@@ -31,18 +46,29 @@ class Customer(Base):
         return customer
 
     @classmethod
-    def update_info(cls, db: Session, customer_id: int, name: str = None, phone: str = None):
+    async def get_by_email_async(cls, db: AsyncSession, email: str):
+        """Async variant of `get_by_email`."""
+        return await db.run_sync(cls.get_by_email, email)
+
+    @classmethod
+    def update_info(cls, db: Session, customer_id: int, name: str = None, phone: str = None, expected_version: int = None):
         """Updates customer details if found; otherwise, returns an error."""
         customer = db.query(cls).filter(cls.id == customer_id).first()
         if not customer:
             raise ValueError("Customer not found.")
+        check_version(customer, expected_version)
 
         if name:
             customer.name = name
         if phone:
             customer.phone = phone
 
-        customer.updated_at = datetime.utcnow  # ✅ Apply timestamp update
-        db.commit()
+        customer.updated_at = datetime.utcnow()  # ✅ Apply timestamp update
+        commit_versioned(db, customer)
         db.refresh(customer)  # ✅ Ensure updated timestamp is applied
         return {"message": "Customer updated successfully!", "customer": customer}
+
+    @classmethod
+    async def update_info_async(cls, db: AsyncSession, customer_id: int, name: str = None, phone: str = None, expected_version: int = None):
+        """Async variant of `update_info`."""
+        return await db.run_sync(cls.update_info, customer_id, name, phone, expected_version)
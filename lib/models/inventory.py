@@ -1,26 +1,61 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from lib.base import Base
+from lib.stock_alerts import DEFAULT_REORDER_THRESHOLD, queue_crossing
+from lib.versioning import check_version, commit_versioned, version_column
+
+
+def _initial_low_stock(context):
+    """Column default: an item is low on stock when inserted below its reorder threshold."""
+    params = context.get_current_parameters()
+    threshold = params.get("reorder_threshold")
+    return params["quantity"] < (DEFAULT_REORDER_THRESHOLD if threshold is None else threshold)
+
 
 class Inventory(Base):
     __tablename__ = "inventory"
+    __table_args__ = (
+        # Partial index: the low-stock endpoint only ever reads flagged rows
+        Index("ix_inventory_low_stock", "is_low_stock", sqlite_where=text("is_low_stock = 1")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_name = Column(String, nullable=False)
     quantity = Column(Integer, nullable=False)
+    reorder_threshold = Column(Integer, nullable=False, default=DEFAULT_REORDER_THRESHOLD, server_default=str(DEFAULT_REORDER_THRESHOLD))
+    is_low_stock = Column(Boolean, nullable=False, default=_initial_low_stock, server_default="0")  # quantity < reorder_threshold, kept in sync on every stock change
     created_at = Column(DateTime, default=datetime.utcnow)  # Store timestamp when product is added
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ✅ Update timestamp when modified
+    version = version_column()  # Bumped on every update, including the bulk stock UPDATEs
+
+    __mapper_args__ = {"version_id_col": version}
+
+    def apply_stock(self, db: Session, quantity: int = None, reorder_threshold: int = None):
+        """Sets quantity and/or threshold, keeping `is_low_stock` in sync and queuing crossing events."""
+        was_low = self.quantity < self.reorder_threshold
+        if quantity is not None:
+            self.quantity = quantity
+        if reorder_threshold is not None:
+            self.reorder_threshold = reorder_threshold
+        self.is_low_stock = self.quantity < self.reorder_threshold
+        queue_crossing(db, self.id, was_low, self.quantity, self.reorder_threshold)
 
     @classmethod
-    def add_product(cls, db: Session, product_name: str, quantity: int):
+    def add_product(cls, db: Session, product_name: str, quantity: int, reorder_threshold: int = DEFAULT_REORDER_THRESHOLD):
         """Adds a new inventory item."""
-        product = cls(product_name=product_name, quantity=quantity, created_at=datetime.utcnow)
+        product = cls(product_name=product_name, quantity=quantity, reorder_threshold=reorder_threshold, created_at=datetime.utcnow())
         db.add(product)
         db.commit()
         db.refresh(product)
         return product
 
+    @classmethod
+    async def add_product_async(cls, db: AsyncSession, product_name: str, quantity: int, reorder_threshold: int = DEFAULT_REORDER_THRESHOLD):
+        """Async variant of `add_product`."""
+        return await db.run_sync(cls.add_product, product_name, quantity, reorder_threshold)
+
     @classmethod
     def update_stock(cls, db: Session, product_id: int, quantity: int):
         """Updates inventory stock, ensuring the product exists."""
@@ -31,8 +66,52 @@ class Inventory(Base):
         if quantity < 0 and abs(quantity) > product.quantity:
             raise ValueError("Insufficient stock to remove!")
 
-        product.quantity += quantity  # Adjust stock
-        product.updated_at = datetime.utcnow  # Apply timestamp update
-        db.commit()
+        product.apply_stock(db, quantity=product.quantity + quantity)  # Adjust stock
+        product.updated_at = datetime.utcnow()  # Apply timestamp update
+        commit_versioned(db, product)
         db.refresh(product)
         return {"message": "Stock updated successfully!", "product": product}
+
+    @classmethod
+    async def update_stock_async(cls, db: AsyncSession, product_id: int, quantity: int):
+        """Async variant of `update_stock`."""
+        return await db.run_sync(cls.update_stock, product_id, quantity)
+
+    @classmethod
+    def set_stock(cls, db: Session, product_id: int, quantity: int = None, reorder_threshold: int = None, expected_version: int = None):
+        """Sets the stock level and/or reorder threshold of a product."""
+        if quantity is not None and quantity < 0:
+            raise ValueError("Quantity cannot be negative.")
+        if reorder_threshold is not None and reorder_threshold < 0:
+            raise ValueError("Reorder threshold cannot be negative.")
+
+        product = db.get(cls, product_id)
+        if not product:
+            raise ValueError("Product not found.")
+        check_version(product, expected_version)
+
+        product.apply_stock(db, quantity=quantity, reorder_threshold=reorder_threshold)
+        commit_versioned(db, product)
+        db.refresh(product)
+        return product
+
+    @classmethod
+    async def set_stock_async(cls, db: AsyncSession, product_id: int, quantity: int = None, reorder_threshold: int = None, expected_version: int = None):
+        """Async variant of `set_stock`."""
+        return await db.run_sync(cls.set_stock, product_id, quantity, reorder_threshold, expected_version)
+
+    @classmethod
+    def low_stock_select(cls):
+        """Items below their reorder threshold, a lookup on the partial low-stock index."""
+        return select(*cls.__table__.columns).where(cls.is_low_stock == True)
+
+    @classmethod
+    def low_stock(cls, db: Session):
+        """Lists items below their reorder threshold."""
+        rows = db.execute(cls.low_stock_select()).mappings()
+        return [dict(row) for row in rows]
+
+    @classmethod
+    async def low_stock_async(cls, db: AsyncSession):
+        """Async variant of `low_stock`."""
+        return await db.run_sync(cls.low_stock)
@@ -1,39 +1,204 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, String, Index, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from lib.base import Base
+from lib.cache import recent_payment_keys
+from lib.models.appointment import Appointment
+from lib.models.rollup import UNATTRIBUTED, RevenueRollup, to_cents
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+STATUS_PAID = "Paid"
+STATUS_REFUNDED = "Refunded"
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """An idempotency key was sent again with a different customer, appointment or amount."""
+
+    def __init__(self, payment_id: int):
+        super().__init__(f"Idempotency key already used for payment {payment_id} with different details.")
+        self.payment_id = payment_id
+
+
+class PaymentAlreadyRefundedError(ValueError):
+    """Raised when refunding a payment that was already refunded."""
+
+    def __init__(self, payment_id: int):
+        super().__init__(f"Payment {payment_id} was already refunded.")
+        self.payment_id = payment_id
+
+
+def _amount_cents(context):
+    return to_cents(context.get_current_parameters()["amount"])
+
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Payment history per customer, in date order
+        Index("ix_payments_customer_id_payment_date", "customer_id", "payment_date"),
+        Index("ix_payments_appointment_id", "appointment_id"),
+        # Retried requests are matched on this; NULL (no key sent) never conflicts
+        Index("ix_payments_idempotency_key", "idempotency_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
     appointment_id = Column(Integer, ForeignKey("appointments.id"), nullable=False)
     amount = Column(Float, nullable=False)
+    amount_cents = Column(Integer, nullable=False, default=_amount_cents)  # `amount` in exact cents; what the rollups add up
     payment_date = Column(DateTime, default=datetime.utcnow)  # ✅ Auto-set timestamp
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ✅ Track modifications
+    idempotency_key = Column(String(MAX_IDEMPOTENCY_KEY_LENGTH), nullable=True)  # Client-chosen key; a retry with it returns this payment
+    status = Column(String, nullable=False, default=STATUS_PAID, server_default=STATUS_PAID)
+    refunded_at = Column(DateTime)
+    # Revenue attribution as of the payment, so a later reschedule cannot move it between staff members
+    service_id = Column(Integer)
+    staff_id = Column(Integer)
+
+    @classmethod
+    def idempotency_key_select(cls, idempotency_key: str):
+        """The payment stored under a key, a lookup on the unique key index."""
+        return select(cls).where(cls.idempotency_key == idempotency_key)
+
+    @classmethod
+    def history_select(cls, customer_id: int):
+        """A customer's payments in date order, a range seek on (customer_id, payment_date)."""
+        return select(cls).where(cls.customer_id == customer_id).order_by(cls.payment_date)
 
     @classmethod
-    def process_payment(cls, db: Session, customer_id: int, appointment_id: int, amount: float):
-        """Processes a payment and ensures the amount is valid."""
+    def find_by_idempotency_key(cls, db: Session, idempotency_key: str):
+        """The payment recorded under a key: a primary-key get for recent keys, else a unique-index lookup."""
+        payment_id = recent_payment_keys.get(idempotency_key)
+        if payment_id is not None:
+            payment = db.get(cls, payment_id)
+            if payment is not None and payment.idempotency_key == idempotency_key:
+                return payment
+            recent_payment_keys.discard(idempotency_key)  # archived or rolled back
+        payment = db.scalars(cls.idempotency_key_select(idempotency_key)).first()
+        if payment is not None:
+            recent_payment_keys.put(idempotency_key, payment.id)
+        return payment
+
+    def check_replay(self, customer_id: int, appointment_id: int, amount: float):
+        """Raises IdempotencyKeyReusedError unless a retry asks for the same payment."""
+        if (self.customer_id, self.appointment_id, self.amount) != (customer_id, appointment_id, amount):
+            raise IdempotencyKeyReusedError(self.id)
+
+    @classmethod
+    def add_payment(cls, db: Session, customer_id: int, appointment_id: int, amount: float, idempotency_key: str = None):
+        """Records a payment without committing; returns (payment, replayed).
+
+        With an idempotency key, a payment already stored under it is returned
+        instead of inserting a second one (replayed=True). A concurrent request
+        that inserts the same key first makes our INSERT fail on the unique
+        index; that is caught in a SAVEPOINT and answered the same way.
+        """
         if amount <= 0:
             raise ValueError("Payment amount must be greater than zero.")
+        if idempotency_key is not None and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            raise ValueError(f"Idempotency key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters.")
+
+        if idempotency_key is not None:
+            existing = cls.find_by_idempotency_key(db, idempotency_key)
+            if existing is not None:
+                existing.check_replay(customer_id, appointment_id, amount)
+                return existing, True
 
         payment = cls(
             customer_id=customer_id,
             appointment_id=appointment_id,
             amount=amount,
-            payment_date=datetime.utcnow
+            payment_date=datetime.utcnow(),
+            idempotency_key=idempotency_key,
         )
-        db.add(payment)
-        db.commit()
+        payment.take_snapshot(db)
+        if idempotency_key is None:
+            db.add(payment)
+            db.flush()
+        else:
+            try:
+                with db.begin_nested():
+                    db.add(payment)
+            except IntegrityError:
+                existing = cls.find_by_idempotency_key(db, idempotency_key)
+                if existing is None:
+                    raise
+                existing.check_replay(customer_id, appointment_id, amount)
+                return existing, True
+            recent_payment_keys.put(idempotency_key, payment.id)
+        payment.add_to_rollups(db)
+        return payment, False
+
+    def take_snapshot(self, db: Session):
+        """Stores the amount in cents and the appointment's current service and staff member on the payment."""
+        appointment = db.get(Appointment, self.appointment_id)
+        self.amount_cents = to_cents(self.amount)
+        self.service_id = appointment.service_id if appointment else UNATTRIBUTED
+        self.staff_id = appointment.staff_id if appointment else UNATTRIBUTED
+
+    def add_to_rollups(self, db: Session, sign: int = 1):
+        """Counts this payment (or, with sign=-1, takes it back out) in the revenue rollups.
+
+        Uses the cents and attribution stored on the payment, so a refund takes it
+        out of the same rows the payment went into.
+        """
+        if self.amount_cents is None or self.service_id is None or self.staff_id is None:
+            self.take_snapshot(db)  # inserted behind the model's back
+        RevenueRollup.add(db, self.payment_date, self.service_id, self.staff_id, self.amount_cents, sign)
+
+    @classmethod
+    def process_payment(cls, db: Session, customer_id: int, appointment_id: int, amount: float, idempotency_key: str = None):
+        """Processes a payment and ensures the amount is valid; a retried idempotency key returns the original."""
+        try:
+            payment, replayed = cls.add_payment(db, customer_id, appointment_id, amount, idempotency_key)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if replayed:
+            return {"message": "Payment already processed.", "payment": payment, "replayed": True}
         db.refresh(payment)
-        return {"message": "Payment processed successfully!", "payment": payment}
+        return {"message": "Payment processed successfully!", "payment": payment, "replayed": False}
+
+    @classmethod
+    async def process_payment_async(cls, db: AsyncSession, customer_id: int, appointment_id: int, amount: float, idempotency_key: str = None):
+        """Async variant of `process_payment`."""
+        return await db.run_sync(cls.process_payment, customer_id, appointment_id, amount, idempotency_key)
+
+    @classmethod
+    def refund(cls, db: Session, payment_id: int):
+        """Marks a payment refunded and takes it out of the revenue rollups; the record is kept.
+
+        A retry with the payment's idempotency key keeps returning it (now refunded)
+        rather than charging again.
+        """
+        payment = db.get(cls, payment_id)
+        if not payment:
+            raise ValueError("Payment record not found")
+        if payment.status == STATUS_REFUNDED:
+            raise PaymentAlreadyRefundedError(payment_id)
+        payment.add_to_rollups(db, sign=-1)
+        payment.status = STATUS_REFUNDED
+        payment.refunded_at = datetime.utcnow()
+        db.commit()
+        return payment
+
+    @classmethod
+    async def refund_async(cls, db: AsyncSession, payment_id: int):
+        """Async variant of `refund`."""
+        return await db.run_sync(cls.refund, payment_id)
 
     @classmethod
     def get_payment_history(cls, db: Session, customer_id: int):
         """Retrieves payment history for a customer."""
-        payments = db.query(cls).filter(cls.customer_id == customer_id).all()
+        payments = db.scalars(cls.history_select(customer_id)).all()
         if not payments:
             raise ValueError("No payment history found for this customer.")
         return payments
+
+    @classmethod
+    async def get_payment_history_async(cls, db: AsyncSession, customer_id: int):
+        """Async variant of `get_payment_history`."""
+        return await db.run_sync(cls.get_payment_history, customer_id)
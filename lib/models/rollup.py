@@ -0,0 +1,136 @@
+from sqlalchemy import Column, Integer, String, Date, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from lib.base import Base
+
+# Every change is added to both grains, so a report reads one row per period whatever its length
+GRAINS = ("day", "month")
+REVENUE_GROUPS = ("total", "service", "staff")
+UNATTRIBUTED = 0  # service/staff id for payments whose appointment no longer exists
+
+
+def to_cents(amount: float) -> int:
+    """Integer cents for an amount as it was written (1.005 -> 101), rounded half away from zero.
+
+    Goes through the float's shortest decimal repr, so binary error such as
+    1.005 * 100 == 100.49999999999999 cannot round the wrong way.
+    """
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def period_starts(moment: datetime):
+    """(grain, first day of the period) for every grain containing `moment`."""
+    day = moment.date()
+    return (("day", day), ("month", day.replace(day=1)))
+
+
+def _check_grain(grain: str):
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of: {', '.join(GRAINS)}")
+
+
+class RevenueRollup(Base):
+    """Payment count and revenue per day or month, service and staff member."""
+    __tablename__ = "revenue_rollups"
+
+    grain = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    service_id = Column(Integer, primary_key=True)
+    staff_id = Column(Integer, primary_key=True)
+    payments = Column(Integer, nullable=False, default=0)
+    amount_cents = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def add(cls, db: Session, paid_at: datetime, service_id: int, staff_id: int, amount_cents: int, sign: int = 1):
+        """Adds (sign=1) or removes (sign=-1) one payment in the same transaction as the payment itself."""
+        cents = amount_cents * sign
+        stmt = insert(cls)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[cls.grain, cls.period_start, cls.service_id, cls.staff_id],
+                set_={"payments": cls.payments + stmt.excluded.payments, "amount_cents": cls.amount_cents + stmt.excluded.amount_cents},
+            ),
+            [
+                {"grain": grain, "period_start": start, "service_id": service_id, "staff_id": staff_id, "payments": sign, "amount_cents": cents}
+                for grain, start in period_starts(paid_at)
+            ],
+        )
+
+    @classmethod
+    def report_select(cls, grain: str, start: date, end: date, group_by: str = "total"):
+        """The revenue report query: a primary-key range scan over the window's rollup rows."""
+        _check_grain(grain)
+        if group_by not in REVENUE_GROUPS:
+            raise ValueError(f"group_by must be one of: {', '.join(REVENUE_GROUPS)}")
+        keys = [cls.period_start] + ([] if group_by == "total" else [getattr(cls, f"{group_by}_id")])
+        return (
+            select(*keys, func.sum(cls.payments).label("payments"), func.sum(cls.amount_cents).label("amount_cents"))
+            .where(cls.grain == grain, cls.period_start >= start, cls.period_start <= end)
+            .group_by(*keys)
+            .order_by(*keys)
+        )
+
+    @classmethod
+    def report(cls, db: Session, grain: str, start: date, end: date, group_by: str = "total"):
+        """Revenue per period between `start` and `end` (inclusive), optionally split by service or staff."""
+        rows = db.execute(cls.report_select(grain, start, end, group_by)).mappings()
+        return [dict(row) for row in rows if row["payments"]]
+
+    @classmethod
+    async def report_async(cls, db: AsyncSession, grain: str, start: date, end: date, group_by: str = "total"):
+        """Async variant of `report`."""
+        return await db.run_sync(cls.report, grain, start, end, group_by)
+
+
+class UsageRollup(Base):
+    """Units of each inventory item consumed per day or month."""
+    __tablename__ = "usage_rollups"
+
+    grain = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    inventory_id = Column(Integer, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def add(cls, db: Session, used_at: datetime, units_by_item: dict):
+        """Adds {inventory_id: units} consumed at `used_at`, in the caller's transaction."""
+        if not units_by_item:
+            return
+        stmt = insert(cls)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[cls.grain, cls.period_start, cls.inventory_id],
+                set_={"units": cls.units + stmt.excluded.units},
+            ),
+            [
+                {"grain": grain, "period_start": start, "inventory_id": inventory_id, "units": units}
+                for grain, start in period_starts(used_at)
+                for inventory_id, units in units_by_item.items()
+            ],
+        )
+
+    @classmethod
+    def report_select(cls, grain: str, start: date, end: date, inventory_id: int = None):
+        """The usage report query: a primary-key range scan over the window's rollup rows."""
+        _check_grain(grain)
+        stmt = (
+            select(cls.period_start, cls.inventory_id, cls.units)
+            .where(cls.grain == grain, cls.period_start >= start, cls.period_start <= end)
+            .order_by(cls.period_start, cls.inventory_id)
+        )
+        if inventory_id is not None:
+            stmt = stmt.where(cls.inventory_id == inventory_id)
+        return stmt
+
+    @classmethod
+    def report(cls, db: Session, grain: str, start: date, end: date, inventory_id: int = None):
+        """Units consumed per period and item between `start` and `end` (inclusive)."""
+        return [dict(row) for row in db.execute(cls.report_select(grain, start, end, inventory_id)).mappings()]
+
+    @classmethod
+    async def report_async(cls, db: AsyncSession, grain: str, start: date, end: date, inventory_id: int = None):
+        """Async variant of `report`."""
+        return await db.run_sync(cls.report, grain, start, end, inventory_id)
@@ -1,40 +1,79 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from lib.base import Base
+from lib.cache import catalog_cache
+from lib.versioning import check_version, commit_versioned, version_column
 
 class Service(Base):
     __tablename__ = "services"
+    __table_args__ = (
+        # max(duration_minutes) bounds every overlap check; with this index it is a single seek
+        Index("ix_services_duration_minutes", "duration_minutes"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(String)
     price = Column(Float, nullable=False)
+    duration_minutes = Column(Integer, nullable=False, default=60, server_default="60")  # How long the staff member is booked for
     created_at = Column(DateTime, default=datetime.utcnow)  # Track when the service is added
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ✅ Track modifications
+    version = version_column()  # Bumped on every update; UPDATEs only apply to the version that was read
+
+    __mapper_args__ = {"version_id_col": version}
 
     @classmethod
-    def add_service(cls, db: Session, name: str, description: str, price: float):
+    def add_service(cls, db: Session, name: str, description: str, price: float, duration_minutes: int = 60):
         """Adds a new service."""
         if price <= 0:
             raise ValueError("Service price must be greater than zero.")
+        if duration_minutes <= 0:
+            raise ValueError("Service duration must be greater than zero.")
 
-        service = cls(name=name, description=description, price=price, created_at=datetime.utcnow)
+        service = cls(name=name, description=description, price=price, duration_minutes=duration_minutes, created_at=datetime.utcnow())
         db.add(service)
         db.commit()
+        catalog_cache.invalidate("services")
         db.refresh(service)  # ✅ Ensure latest data is retrieved
         return {"message": "Service added successfully!", "service": service}
 
+    @classmethod
+    async def add_service_async(cls, db: AsyncSession, name: str, description: str, price: float, duration_minutes: int = 60):
+        """Async variant of `add_service`."""
+        return await db.run_sync(cls.add_service, name, description, price, duration_minutes)
+
+    @classmethod
+    def max_duration_select(cls):
+        """The longest service duration in minutes: how far back an overlapping booking can start."""
+        return select(func.max(cls.duration_minutes))
+
+    @classmethod
+    def max_duration(cls, db: Session):
+        """Runs `max_duration_select`, defaulting to 60 minutes while there are no services."""
+        return db.scalar(cls.max_duration_select()) or 60
+
+    @classmethod
+    def catalog_rows(cls, db: Session):
+        """Loads the service catalog as plain rows (column projection, no ORM objects)."""
+        return [dict(row) for row in db.execute(select(*cls.__table__.columns).order_by(cls.id)).mappings()]
+
     @classmethod
     def list_services(cls, db: Session):
-        """Lists all available services."""
-        services = db.query(cls).all()
+        """Lists all available services (read through the catalog cache)."""
+        services = catalog_cache.get("services", lambda: cls.catalog_rows(db)).value
         if not services:
             raise ValueError("No services found.")
         return services
 
     @classmethod
-    def update_price(cls, db: Session, service_id: int, price: float):
+    async def list_services_async(cls, db: AsyncSession):
+        """Async variant of `list_services`."""
+        return await db.run_sync(cls.list_services)
+
+    @classmethod
+    def update_price(cls, db: Session, service_id: int, price: float, expected_version: int = None):
         """Updates the price of a service."""
         if price <= 0:
             raise ValueError("Service price must be greater than zero.")
@@ -42,9 +81,16 @@ class Service(Base):
         service = db.query(cls).filter(cls.id == service_id).first()
         if not service:
             raise ValueError("Service not found.")
+        check_version(service, expected_version)
 
         service.price = price
-        service.updated_at = datetime.utcnow  # Apply timestamp update
-        db.commit()
+        service.updated_at = datetime.utcnow()  # Apply timestamp update
+        commit_versioned(db, service)
+        catalog_cache.invalidate("services")
         db.refresh(service)  # Ensure updated timestamp is applied
         return {"message": "Service price updated successfully!", "service": service}
+
+    @classmethod
+    async def update_price_async(cls, db: AsyncSession, service_id: int, price: float, expected_version: int = None):
+        """Async variant of `update_price`."""
+        return await db.run_sync(cls.update_price, service_id, price, expected_version)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, relationship
 from datetime import datetime
 from lib.base import Base
@@ -7,6 +8,11 @@ from lib.models.service import Service
 
 class ServiceInventory(Base):
     __tablename__ = "service_inventory"
+    __table_args__ = (
+        # Covering index: the bill of materials for a service is read without touching the table
+        Index("ix_service_inventory_service_id_covering", "service_id", "inventory_id", "quantity_used"),
+        Index("ix_service_inventory_inventory_id", "inventory_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
@@ -19,34 +25,39 @@ class ServiceInventory(Base):
     inventory = relationship("Inventory")
 
     @classmethod
-    def link_service_to_inventory(cls, db: Session, service_id: int, inventory_id: int, quantity_used: int):
-        """Links a service to an inventory item and defines quantity used per service."""
-        inventory_item = db.query(Inventory).filter(Inventory.id == inventory_id).first()
+    def bill_of_materials_select(cls, service_ids):
+        """(service_id, inventory_id, quantity_used) for the services, read from the covering index alone."""
+        return select(cls.service_id, cls.inventory_id, cls.quantity_used).where(cls.service_id.in_(service_ids))
 
-        if not inventory_item:
-            raise ValueError("Inventory item not found!")
+    @classmethod
+    def link_service_to_inventory(cls, db: Session, service_id: int, inventory_id: int, quantity_used: int):
+        """Links a service to an inventory item and defines quantity used per service.
 
+        This only records the bill of materials; stock is deducted when an
+        appointment for the service is completed.
+        """
         if quantity_used <= 0:
             raise ValueError("Quantity used must be greater than zero!")
 
-        if quantity_used > inventory_item.quantity:
-            raise ValueError("Insufficient stock available!")
+        if not db.get(Inventory, inventory_id):
+            raise ValueError("Inventory item not found!")
 
         service_inventory = cls(
             service_id=service_id, 
             inventory_id=inventory_id, 
             quantity_used=quantity_used, 
-            created_at=datetime.utcnow
+            created_at=datetime.utcnow()
         )
-        
-        inventory_item.quantity -= quantity_used  # ✅ Deduct from inventory stock
-        inventory_item.updated_at = datetime.utcnow  # ✅ Apply timestamp update
-
         db.add(service_inventory)
         db.commit()
         db.refresh(service_inventory)
         return {"message": "Service linked successfully!", "service_inventory": service_inventory}
 
+    @classmethod
+    async def link_service_to_inventory_async(cls, db: AsyncSession, service_id: int, inventory_id: int, quantity_used: int):
+        """Async variant of `link_service_to_inventory`."""
+        return await db.run_sync(cls.link_service_to_inventory, service_id, inventory_id, quantity_used)
+
     @classmethod
     def get_inventory_for_service(cls, db: Session, service_id: int):
         """Gets all inventory items linked to a service."""
@@ -54,3 +65,8 @@ class ServiceInventory(Base):
         if not inventory_items:
             raise ValueError("No inventory found for this service.")
         return inventory_items
+
+    @classmethod
+    async def get_inventory_for_service_async(cls, db: AsyncSession, service_id: int):
+        """Async variant of `get_inventory_for_service`."""
+        return await db.run_sync(cls.get_inventory_for_service, service_id)
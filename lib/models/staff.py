@@ -1,16 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from lib.base import Base
+from lib.cache import catalog_cache
+from lib.versioning import check_version, commit_versioned, version_column
 
 class Staff(Base):
     __tablename__ = "staff"
+    __table_args__ = (
+        # Covering index for the (id, name) list of a role, e.g. the therapists searched for free slots
+        Index("ix_staff_role_name", "role", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     role = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)  # ✅ Track when staff is registered
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ✅ Track modifications
+    version = version_column()  # Bumped on every update; UPDATEs only apply to the version that was read
+
+    __mapper_args__ = {"version_id_col": version}
 
     @classmethod
     def register_staff(cls, db: Session, name: str, role: str):
@@ -18,12 +28,38 @@ class Staff(Base):
         if not name or not role:
             raise ValueError("Name and role must be provided!")
 
-        staff = cls(name=name, role=role, created_at=datetime.utcnow)
+        staff = cls(name=name, role=role, created_at=datetime.utcnow())
         db.add(staff)
         db.commit()
+        catalog_cache.invalidate("staff")
         db.refresh(staff)  # ✅ Ensure latest data is retrieved
         return {"message": "Staff registered successfully!", "staff": staff}
 
+    @classmethod
+    async def register_staff_async(cls, db: AsyncSession, name: str, role: str):
+        """Async variant of `register_staff`."""
+        return await db.run_sync(cls.register_staff, name, role)
+
+    @classmethod
+    def roster_rows(cls, db: Session):
+        """Loads the staff roster as plain rows (column projection, no ORM objects)."""
+        return [dict(row) for row in db.execute(select(*cls.__table__.columns).order_by(cls.id)).mappings()]
+
+    @classmethod
+    def roster(cls, db: Session):
+        """Lists all staff members (read through the roster cache)."""
+        return catalog_cache.get("staff", lambda: cls.roster_rows(db)).value
+
+    @classmethod
+    async def roster_async(cls, db: AsyncSession):
+        """Async variant of `roster`."""
+        return await db.run_sync(cls.roster)
+
+    @classmethod
+    def role_roster_select(cls, role: str):
+        """(id, name) of the staff with a role, read from the covering (role, name) index alone."""
+        return select(cls.id, cls.name).where(cls.role == role)
+
     @classmethod
     def get_staff_by_role(cls, db: Session, role: str):
         """Retrieves all staff members with a specific role."""
@@ -33,7 +69,12 @@ class Staff(Base):
         return staff_members
 
     @classmethod
-    def update_role(cls, db: Session, staff_id: int, role: str):
+    async def get_staff_by_role_async(cls, db: AsyncSession, role: str):
+        """Async variant of `get_staff_by_role`."""
+        return await db.run_sync(cls.get_staff_by_role, role)
+
+    @classmethod
+    def update_role(cls, db: Session, staff_id: int, role: str, expected_version: int = None):
         """Updates the role of a staff member."""
         if not role:
             raise ValueError("Role must be provided!")
@@ -41,9 +82,16 @@ class Staff(Base):
         staff = db.query(cls).filter(cls.id == staff_id).first()
         if not staff:
             raise ValueError("Staff member not found.")
+        check_version(staff, expected_version)
 
         staff.role = role
-        staff.updated_at = datetime.utcnow  # ✅ Apply timestamp update
-        db.commit()
+        staff.updated_at = datetime.utcnow()  # ✅ Apply timestamp update
+        commit_versioned(db, staff)
+        catalog_cache.invalidate("staff")
         db.refresh(staff)  # ✅ Ensure updated timestamp is applied
         return {"message": "Staff role updated successfully!", "staff": staff}
+
+    @classmethod
+    async def update_role_async(cls, db: AsyncSession, staff_id: int, role: str, expected_version: int = None):
+        """Async variant of `update_role`."""
+        return await db.run_sync(cls.update_role, staff_id, role, expected_version)
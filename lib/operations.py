@@ -0,0 +1,219 @@
+"""Scripted batch operations over a single session.
+
+Each operation is one JSON object per line, e.g.
+    {"op": "set_stock", "product_id": 3, "quantity": 40}
+    {"op": "update_customer", "email": "alice@gmail.com", "phone": "0700000000"}
+
+`run_operations` applies them in transaction batches of `batch_size`: each
+operation runs inside its own SAVEPOINT, so a failing one is rolled back and
+reported without losing the rest of its batch, and each batch is one commit.
+Handlers only flush; they never commit.
+"""
+import json
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import Session
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.models.appointment import Appointment
+from lib.models.payment import Payment
+from lib.models.inventory import Inventory
+from lib.stock_alerts import DEFAULT_REORDER_THRESHOLD
+from lib.cache import catalog_cache
+from lib.versioning import check_version
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _get(db: Session, model, object_id: int, label: str):
+    obj = db.get(model, object_id)
+    if obj is None:
+        raise ValueError(f"{label} {object_id} not found.")
+    return obj
+
+
+def add_customer(db: Session, name: str, email: str, phone: str):
+    customer = Customer(name=name, email=email, phone=phone)
+    db.add(customer)
+    db.flush()
+    return {"customer_id": customer.id}
+
+
+def update_customer(db: Session, customer_id: int = None, email: str = None, name: str = None, phone: str = None, expected_version: int = None):
+    """Updates a customer found by id or, for batch jobs keyed on email, by email."""
+    if customer_id is not None:
+        customer = _get(db, Customer, customer_id, "Customer")
+    elif email is not None:
+        customer = db.query(Customer).filter(Customer.email == email).first()
+        if customer is None:
+            raise ValueError(f"Customer {email} not found.")
+    else:
+        raise ValueError("customer_id or email is required.")
+    check_version(customer, expected_version)
+    if name:
+        customer.name = name
+    if phone:
+        customer.phone = phone
+    customer.updated_at = datetime.utcnow()
+    db.flush()
+    return {"customer_id": customer.id, "version": customer.version}
+
+
+def add_service(db: Session, name: str, description: str, price: float, duration_minutes: int = 60):
+    if price <= 0:
+        raise ValueError("Service price must be greater than zero.")
+    service = Service(name=name, description=description, price=price, duration_minutes=duration_minutes)
+    db.add(service)
+    db.flush()
+    return {"service_id": service.id}
+
+
+def update_service_price(db: Session, service_id: int, price: float, expected_version: int = None):
+    if price <= 0:
+        raise ValueError("Service price must be greater than zero.")
+    service = _get(db, Service, service_id, "Service")
+    check_version(service, expected_version)
+    service.price = price
+    service.updated_at = datetime.utcnow()
+    db.flush()
+    return {"service_id": service.id, "price": service.price, "version": service.version}
+
+
+def register_staff(db: Session, name: str, role: str):
+    if not name or not role:
+        raise ValueError("Name and role must be provided!")
+    staff = Staff(name=name, role=role)
+    db.add(staff)
+    db.flush()
+    return {"staff_id": staff.id}
+
+
+def book_appointment(db: Session, customer_id: int, service_id: int, staff_id: int, scheduled_time: str):
+    appointment = Appointment.add_booking(db, customer_id, service_id, staff_id, datetime.fromisoformat(scheduled_time))
+    return {"appointment_id": appointment.id, "end_time": appointment.end_time}
+
+
+def process_payment(db: Session, customer_id: int, appointment_id: int, amount: float, idempotency_key: str = None):
+    """With an idempotency key, re-running a script does not charge twice."""
+    payment, replayed = Payment.add_payment(db, customer_id, appointment_id, amount, idempotency_key)
+    return {"payment_id": payment.id, "replayed": replayed}
+
+
+def add_inventory(db: Session, product_name: str, quantity: int, reorder_threshold: int = DEFAULT_REORDER_THRESHOLD):
+    item = Inventory(product_name=product_name, quantity=quantity, reorder_threshold=reorder_threshold)
+    db.add(item)
+    db.flush()
+    return {"product_id": item.id}
+
+
+def set_stock(db: Session, product_id: int, quantity: int = None, reorder_threshold: int = None, expected_version: int = None):
+    """Records a stock count (absolute quantity) and/or a new reorder threshold."""
+    if quantity is not None and quantity < 0:
+        raise ValueError("Quantity cannot be negative.")
+    if reorder_threshold is not None and reorder_threshold < 0:
+        raise ValueError("Reorder threshold cannot be negative.")
+    item = _get(db, Inventory, product_id, "Product")
+    check_version(item, expected_version)
+    item.apply_stock(db, quantity=quantity, reorder_threshold=reorder_threshold)
+    db.flush()
+    return {"product_id": item.id, "quantity": item.quantity, "is_low_stock": item.is_low_stock}
+
+
+def adjust_stock(db: Session, product_id: int, delta: int):
+    """Adds (or, with a negative delta, removes) stock."""
+    item = _get(db, Inventory, product_id, "Product")
+    if item.quantity + delta < 0:
+        raise ValueError("Insufficient stock to remove!")
+    item.apply_stock(db, quantity=item.quantity + delta)
+    db.flush()
+    return {"product_id": item.id, "quantity": item.quantity, "is_low_stock": item.is_low_stock}
+
+
+# op name -> (handler, catalog cache keys to invalidate once its batch commits)
+OPERATIONS = {
+    "add_customer": (add_customer, ()),
+    "update_customer": (update_customer, ()),
+    "add_service": (add_service, ("services",)),
+    "update_service_price": (update_service_price, ("services",)),
+    "register_staff": (register_staff, ("staff",)),
+    "book_appointment": (book_appointment, ()),
+    "process_payment": (process_payment, ()),
+    "add_inventory": (add_inventory, ()),
+    "set_stock": (set_stock, ()),
+    "adjust_stock": (adjust_stock, ()),
+}
+
+
+def read_operations(lines):
+    """Yields (line number, parsed operation or the JSON error) for an NDJSON stream; skips blanks and # comments."""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, e
+
+
+def apply_operation(db: Session, operation):
+    """Runs one operation in a SAVEPOINT; returns (result, error message), exactly one of them None."""
+    if isinstance(operation, Exception):
+        return None, f"Invalid JSON: {operation}"
+    if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+        return None, f"Unknown op; expected one of: {', '.join(OPERATIONS)}"
+
+    handler, _ = OPERATIONS[operation["op"]]
+    args = {key: value for key, value in operation.items() if key != "op"}
+    try:
+        with db.begin_nested():
+            return handler(db, **args), None
+    except IntegrityError as e:
+        return None, f"Constraint violated: {e.orig}"
+    except StaleDataError:
+        return None, "Version conflict: the row was changed by another writer; re-read it and retry."
+    except (ValueError, TypeError) as e:
+        return None, str(e)
+
+
+def run_operations(db: Session, operations, batch_size: int = DEFAULT_BATCH_SIZE, stop_on_error: bool = False, on_result=None):
+    """Applies (line number, operation) pairs in transaction batches; returns a summary.
+
+    `on_result(record)` is called for every operation once its batch has committed.
+    Unexpected database errors roll back the current batch and propagate.
+    """
+    summary = {"operations": 0, "succeeded": 0, "failed": 0, "batches": 0}
+    operations = iter(operations)
+    stopped = False
+    while not stopped and (batch := list(islice(operations, batch_size))):
+        records, invalidate = [], set()
+        try:
+            for line_number, operation in batch:
+                result, error = apply_operation(db, operation)
+                record = {"line": line_number, "op": operation.get("op") if isinstance(operation, dict) else None}
+                if error is None:
+                    record.update(ok=True, result=result)
+                    invalidate.update(OPERATIONS[operation["op"]][1])
+                else:
+                    record.update(ok=False, error=error)
+                records.append(record)
+                if error is not None and stop_on_error:
+                    stopped = True
+                    break
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        if invalidate:
+            catalog_cache.invalidate(*invalidate)
+
+        summary["batches"] += 1
+        for record in records:
+            summary["operations"] += 1
+            summary["succeeded" if record["ok"] else "failed"] += 1
+            if on_result:
+                on_result(record)
+    return summary
@@ -0,0 +1,97 @@
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import Session
+from lib.serialization import dumps
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+
+
+def keyset_select(model, order_by: str = "id", cursor: tuple = None, limit: int = DEFAULT_PAGE_SIZE, options=None, source=None):
+    """Builds a keyset-paginated SELECT ordered by (order_by, id); a nullable `order_by` column is fine.
+
+    Selects the model's columns, or whole entities when loader `options` are given.
+    `source` pages over another selectable with the same columns (e.g. live + archived rows).
+    """
+    columns = (model.__table__ if source is None else source).columns
+    order_column, id_column = columns[order_by], columns["id"]
+    stmt = select(*columns) if options is None else select(model).options(*options)
+
+    if cursor is not None:
+        last_value, last_id = cursor
+        if order_by == "id":
+            stmt = stmt.where(id_column > last_id)
+        elif last_value is None:
+            # SQLite sorts NULLs first: the rest of the NULLs, then every non-NULL value
+            stmt = stmt.where(or_(
+                and_(order_column.is_(None), id_column > last_id),
+                order_column.is_not(None),
+            ))
+        else:
+            stmt = stmt.where(or_(
+                order_column > last_value,
+                and_(order_column == last_value, id_column > last_id),
+            ))
+
+    if order_by == "id":
+        return stmt.order_by(id_column).limit(limit)
+    return stmt.order_by(order_column, id_column).limit(limit)
+
+
+def resolve_cursor(db: Session, model, order_by: str, after_id: int, source=None):
+    """Turns an `after_id` into the (order value, id) pair the next page starts after."""
+    if after_id is None:
+        return None
+    if order_by == "id":
+        return (after_id, after_id)
+
+    columns = (model.__table__ if source is None else source).columns
+    row = db.execute(
+        select(columns[order_by]).where(columns["id"] == after_id)
+    ).first()
+    if row is None:
+        raise ValueError(f"Unknown cursor: after_id={after_id}")
+    return (row[0], after_id)  # the value may be NULL; keyset_select pages on from there
+
+
+def fetch_page(db: Session, model, order_by: str = "id", after_id: int = None, limit: int = DEFAULT_PAGE_SIZE, expand: tuple = (), source=None):
+    """Returns one page of rows as dicts plus the `after_id` of the next page (None on the last page).
+
+    With `expand`, the model's `expand_options` eager-load those relationships into
+    the page query and `to_dict` inlines them, so the page is still one SELECT.
+    """
+    if expand and source is not None:
+        raise ValueError("expand is not supported together with archived rows")
+    cursor = resolve_cursor(db, model, order_by, after_id, source)
+    if expand:
+        stmt = keyset_select(model, order_by, cursor, limit, options=model.expand_options(expand))
+        rows = [obj.to_dict(expand) for obj in db.scalars(stmt)]
+    else:
+        rows = [dict(row) for row in db.execute(keyset_select(model, order_by, cursor, limit, source=source)).mappings()]
+    next_after_id = rows[-1]["id"] if len(rows) == limit else None
+    return rows, next_after_id
+
+
+def _encode_chunk(rows):
+    return b"".join(dumps(dict(row)) + b"\n" for row in rows)
+
+
+async def aiter_ndjson(async_session_factory, model, order_by: str = "id", chunk_size: int = STREAM_CHUNK_SIZE, source=None):
+    """Yields every row of the model as NDJSON, reading the table in keyset chunks.
+
+    Each chunk uses its own short-lived session so no read transaction is held
+    open for the whole stream and memory stays bounded by `chunk_size`.
+    """
+    cursor = None
+    while True:
+        async with async_session_factory() as db:
+            rows = (await db.execute(keyset_select(model, order_by, cursor, chunk_size, source=source))).mappings().all()
+        if not rows:
+            return
+
+        yield _encode_chunk(rows)
+
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        cursor = (last[order_by], last["id"])
@@ -0,0 +1,86 @@
+"""EXPLAIN QUERY PLAN checks for the hot read paths.
+
+The statements come from the same builders the code runs (`*_select`
+helpers on the models), so a changed query is checked as it now is.
+tests/test_query_plans.py runs the check against a seeded, ANALYZEd schema;
+`python -m lib.query_plans` prints the plans for a migrated database.
+"""
+import sys
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.models.appointment import Appointment
+from lib.models.payment import Payment
+from lib.models.inventory import Inventory
+from lib.models.service_inventory import ServiceInventory
+from lib.models.rollup import RevenueRollup, UsageRollup
+from lib.models.change import Change
+from lib.pagination import keyset_select
+from lib.scheduling import THERAPIST_ROLE, busy_intervals_select
+
+_NOW = datetime(2030, 1, 1, 9, 0)
+
+
+def hot_queries():
+    """name -> statement, built by the helpers behind each hot path."""
+    end = _NOW + timedelta(hours=1)
+    return {
+        "customer by email": Customer.by_email_select("someone@example.com"),
+        "upcoming appointments": Appointment.upcoming_select(1, _NOW),
+        "longest service duration": Service.max_duration_select(),
+        "staff booking conflicts": Appointment.conflict_select(1, _NOW, end, 120, exclude_id=1),
+        "bulk booking conflicts": Appointment.stored_intervals_select({1, 2}, _NOW, end, 120, exclude_ids=[1]),
+        "busy intervals": busy_intervals_select([1, 2], _NOW, _NOW + timedelta(days=7), 120),
+        "therapist roster": Staff.role_roster_select(THERAPIST_ROLE),
+        "daily schedule": Appointment.daily_schedule_select(date(2030, 1, 1)),
+        "appointments by scheduled_time page": keyset_select(Appointment, "scheduled_time", (_NOW, 1)),
+        "payment history": Payment.history_select(1),
+        "payment by idempotency key": Payment.idempotency_key_select("retry-key"),
+        "low stock": Inventory.low_stock_select(),
+        "bill of materials": ServiceInventory.bill_of_materials_select([1, 2]),
+        "monthly revenue report": RevenueRollup.report_select("month", date(2030, 1, 1), date(2030, 12, 31), "service"),
+        "daily usage report": UsageRollup.report_select("day", date(2030, 1, 1), date(2030, 1, 31)),
+        "change feed page": Change.feed_select(100, 200, 100),
+        "change feed of some tables": Change.feed_select(100, 200, 100, ("customers", "payments")),
+    }
+
+
+def explain(db: Session, stmt):
+    """Returns the EXPLAIN QUERY PLAN detail lines for a statement."""
+    compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    """Plan lines that read a whole table or index instead of seeking into it.
+
+    A min()/max() over an unindexed column shows up as a bare "SEARCH <table>"
+    with no index, but still reads every row.
+    """
+    return [line for line in plan if line.startswith("SCAN ") or (line.startswith("SEARCH ") and " USING " not in line)]
+
+
+def check_query_plans(db: Session, queries: dict = None):
+    """Returns {query name: plan} for every query, and the names that fall back to a scan."""
+    queries = hot_queries() if queries is None else queries
+    plans = {name: explain(db, stmt) for name, stmt in queries.items()}
+    failures = [name for name, plan in plans.items() if full_scans(plan)]
+    return plans, failures
+
+
+if __name__ == "__main__":
+    from lib.config import SessionLocal, ensure_schema
+
+    ensure_schema()
+    with SessionLocal() as db:
+        plans, failures = check_query_plans(db)
+    for name, plan in plans.items():
+        print(f"{'❌' if name in failures else '✅'} {name}")
+        for line in plan:
+            print(f"    {line}")
+    if failures:
+        print(f"\n{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} fall back to a full scan: {', '.join(failures)}")
+        sys.exit(1)
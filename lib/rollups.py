@@ -0,0 +1,75 @@
+"""Rebuilds the revenue and usage rollup tables from the raw rows.
+
+Normal writes keep the rollups current incrementally (Payment.add_payment,
+Payment.refund and the inventory usage writers add to them in the same
+transaction). The rebuild reads archived rows too, and skips refunded
+payments just as Payment.refund takes them out. Revenue is attributed to the
+service and staff member stored on each payment when it was taken, so moving
+an appointment later does not move its revenue; payments written without that
+snapshot get it filled in first. A rebuild is only needed after writing
+payments or usage rows behind the models' backs (bulk loads, manual SQL):
+
+    python cli.py rebuild-rollups
+"""
+from sqlalchemy import bindparam, delete, func, literal, select
+from sqlalchemy.orm import Session
+from lib.models.appointment import Appointment
+from lib.models.appointment_inventory import AppointmentInventory
+from lib.models.payment import STATUS_REFUNDED, Payment
+from lib.models.archive import ARCHIVE_TABLES, with_archive
+from lib.models.rollup import UNATTRIBUTED, RevenueRollup, UsageRollup, to_cents
+
+
+def _periods(column):
+    """(grain, SQL expression for the first day of the period), matching `period_starts`."""
+    return (("day", func.date(column)), ("month", func.date(column, "start of month")))
+
+
+def fill_payment_snapshots(db: Session):
+    """Fills in amount_cents, service_id and staff_id on payments inserted without them."""
+    appointments = with_archive(Appointment)
+    for table in (Payment.__table__, ARCHIVE_TABLES[Payment]):
+        for column in ("service_id", "staff_id"):
+            db.execute(
+                table.update()
+                .where(table.c[column].is_(None))
+                .values({column: func.coalesce(
+                    select(appointments.c[column]).where(appointments.c.id == table.c.appointment_id).scalar_subquery(),
+                    UNATTRIBUTED,
+                )})
+            )
+        missing = db.execute(select(table.c.id, table.c.amount).where(table.c.amount_cents.is_(None))).all()
+        if missing:
+            db.execute(
+                table.update().where(table.c.id == bindparam("payment_id")).values(amount_cents=bindparam("cents")),
+                [{"payment_id": payment_id, "cents": to_cents(amount)} for payment_id, amount in missing],
+            )
+
+
+def rebuild_rollups(db: Session):
+    """Recomputes both rollup tables with one aggregate INSERT ... SELECT per grain; returns row counts."""
+    db.execute(delete(RevenueRollup))
+    db.execute(delete(UsageRollup))
+    fill_payment_snapshots(db)
+
+    payments, usage = with_archive(Payment), with_archive(AppointmentInventory)
+    for grain, period in _periods(payments.c.payment_date):
+        db.execute(RevenueRollup.__table__.insert().from_select(
+            ["grain", "period_start", "service_id", "staff_id", "payments", "amount_cents"],
+            select(literal(grain), period, payments.c.service_id, payments.c.staff_id, func.count(), func.sum(payments.c.amount_cents))
+            .where(payments.c.payment_date.is_not(None), payments.c.status != STATUS_REFUNDED)
+            .group_by(period, payments.c.service_id, payments.c.staff_id),
+        ))
+
+    for grain, period in _periods(usage.c.created_at):
+        db.execute(UsageRollup.__table__.insert().from_select(
+            ["grain", "period_start", "inventory_id", "units"],
+            select(literal(grain), period, usage.c.inventory_id, func.sum(usage.c.quantity_used))
+            .where(usage.c.created_at.is_not(None))
+            .group_by(period, usage.c.inventory_id),
+        ))
+    db.commit()
+    return {
+        "revenue_rollups": db.scalar(select(func.count()).select_from(RevenueRollup)),
+        "usage_rollups": db.scalar(select(func.count()).select_from(UsageRollup)),
+    }
@@ -0,0 +1,73 @@
+"""Live schedule board: the day's appointments once, then every change as it commits.
+
+Front-desk screens subscribe instead of re-listing appointments. Each
+booking, cancellation, reschedule and completion queues an event on the
+writing session. Just before the commit, and only if a board is subscribed,
+the appointment is loaded and rendered as an SSE message once; after the
+commit it is fanned out to every subscriber whose day (and staff member, if
+they filtered on one) it touches. With no board open, writes load nothing.
+"""
+import asyncio
+from datetime import date
+from sqlalchemy.orm import Session
+from lib.broadcast import HEARTBEAT_SECONDS, Broadcaster, format_sse, publish_on_commit
+
+BOARD_EVENTS = ("booked", "cancelled", "rescheduled", "completed")
+
+schedule_events = Broadcaster()
+
+
+def board_event(event_type: str, appointment: dict, previous: dict = None):
+    """The broadcast event for `appointment` (a dict with customer, service and staff inlined).
+
+    For a reschedule, `previous` holds the old scheduled_time and staff_id, so
+    the board the appointment moved away from hears about it too.
+    """
+    payload = {"type": event_type, "appointment": appointment}
+    slots = [appointment]
+    if previous is not None:
+        payload["previous"] = previous
+        slots.append(previous)
+    return {
+        "type": event_type,
+        "days": {slot["scheduled_time"].date() for slot in slots},
+        "staff_ids": {slot["staff_id"] for slot in slots},
+        "message": format_sse(payload, event_type),
+    }
+
+
+def queue_schedule_event(db: Session, event_type: str, load_appointment, previous: dict = None):
+    """Queues a board event; `load_appointment()` returns the appointment dict and runs only if a board is listening."""
+    publish_on_commit(db, schedule_events, {
+        "type": event_type,
+        "render": lambda: [board_event(event_type, load_appointment(), previous)],
+    })
+
+
+def queue_schedule_events(db: Session, event_type: str, load_appointments):
+    """Queues one board event per dict returned by `load_appointments()`, which runs only if a board is listening."""
+    publish_on_commit(db, schedule_events, {
+        "type": event_type,
+        "render": lambda: [board_event(event_type, appointment) for appointment in load_appointments()],
+    })
+
+
+async def sse_schedule(request, load_schedule, day: date, staff_id: int = None):
+    """Yields a `snapshot` message with the day's schedule, then the board events for that day.
+
+    `load_schedule()` is awaited after subscribing, so nothing committed in
+    between is missed (short of a write that checked for subscribers in the
+    instant before this one subscribed and commits after the snapshot is read);
+    a change may show up both in the snapshot and as an event, so clients apply
+    events by appointment id.
+    """
+    with schedule_events.subscribe() as queue:
+        yield format_sse(await load_schedule(), "snapshot")
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if day in event["days"] and (staff_id is None or staff_id in event["staff_ids"]):
+                yield event["message"]
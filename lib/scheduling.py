@@ -0,0 +1,102 @@
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import islice, repeat
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from lib.models.appointment import STATUS_CANCELLED, Appointment
+from lib.models.service import Service
+from lib.models.staff import Staff
+
+THERAPIST_ROLE = "Therapist"
+OPENING_TIME = time(9, 0)
+CLOSING_TIME = time(18, 0)
+SLOT_STEP_MINUTES = 15
+
+
+def busy_intervals_select(staff_ids, start: datetime, end: datetime, max_duration: int):
+    """The range query behind `load_busy_intervals`, in (staff_id, scheduled_time) order."""
+    return (
+        select(Appointment.staff_id, Appointment.scheduled_time, Appointment.end_time, Service.duration_minutes)
+        .join(Service, Service.id == Appointment.service_id)
+        .where(
+            Appointment.staff_id.in_(staff_ids),
+            Appointment.scheduled_time > start - timedelta(minutes=max_duration),
+            Appointment.scheduled_time < end,
+            or_(Appointment.end_time > start, Appointment.end_time.is_(None)),
+            Appointment.status != STATUS_CANCELLED,
+        )
+        .order_by(Appointment.staff_id, Appointment.scheduled_time)
+    )
+
+
+def load_busy_intervals(db: Session, staff_ids, start: datetime, end: datetime):
+    """Loads every staff member's merged busy intervals overlapping [start, end) in one query."""
+    rows = db.execute(busy_intervals_select(staff_ids, start, end, Service.max_duration(db)))
+
+    busy = {staff_id: [] for staff_id in staff_ids}
+    for staff_id, busy_start, busy_end, duration in rows:
+        busy_end = busy_end or busy_start + timedelta(minutes=duration)
+        intervals = busy[staff_id]
+        if intervals and busy_start <= intervals[-1][1]:
+            intervals[-1][1] = max(intervals[-1][1], busy_end)
+        else:
+            intervals.append([busy_start, busy_end])
+    return busy
+
+
+def _round_up(moment: datetime, step: timedelta):
+    midnight = datetime.combine(moment.date(), time())
+    remainder = (moment - midnight) % step
+    return moment if not remainder else moment + (step - remainder)
+
+
+def _free_slots(busy, start: datetime, end: datetime, duration: timedelta, step: timedelta):
+    """Yields slot start times for one staff member in order, skipping over busy intervals."""
+    busy_index = 0
+    day = start.date()
+    while day <= end.date():
+        cursor = max(start, datetime.combine(day, OPENING_TIME))
+        day_close = min(end, datetime.combine(day, CLOSING_TIME))
+        cursor = _round_up(cursor, step)
+
+        while cursor + duration <= day_close:
+            while busy_index < len(busy) and busy[busy_index][1] <= cursor:
+                busy_index += 1
+            if busy_index < len(busy) and busy[busy_index][0] < cursor + duration:
+                cursor = _round_up(busy[busy_index][1], step)
+                continue
+            yield cursor
+            cursor += step
+        day += timedelta(days=1)
+
+
+def find_available_slots(db: Session, service_id: int, start: datetime, end: datetime, limit: int = 10):
+    """Returns the earliest `limit` free slots for a service across all therapists.
+
+    Busy intervals for every therapist come from a single range query; each
+    therapist's free slots are then generated lazily and merged in time order,
+    so the search stops as soon as `limit` slots are found.
+    """
+    service = db.get(Service, service_id)
+    if not service:
+        raise ValueError("Service not found!")
+    if end <= start:
+        raise ValueError("End of the search window must be after its start.")
+
+    start = max(start, datetime.utcnow())
+    therapists = dict(db.execute(Staff.role_roster_select(THERAPIST_ROLE)).all())
+    if not therapists:
+        return []
+
+    duration = timedelta(minutes=service.duration_minutes)
+    step = timedelta(minutes=SLOT_STEP_MINUTES)
+    busy = load_busy_intervals(db, list(therapists), start, end)
+
+    candidates = heapq.merge(*(
+        zip(_free_slots(busy[staff_id], start, end, duration, step), repeat(staff_id))
+        for staff_id in therapists
+    ))
+    return [
+        {"staff_id": staff_id, "staff_name": therapists[staff_id], "start": slot, "end": slot + duration}
+        for slot, staff_id in islice(candidates, limit)
+    ]
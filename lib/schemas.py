@@ -0,0 +1,148 @@
+from datetime import date, datetime
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+
+# ---------------------- REQUEST BODIES ----------------------
+
+class AppointmentRequest(BaseModel):
+    customer_id: int
+    service_id: int
+    staff_id: int
+    scheduled_time: datetime
+
+
+# ---------------------- RESPONSES ----------------------
+# Built from column projections (row mappings) or already-loaded ORM columns;
+# relationships are never part of a schema, so serializing can't trigger lazy loads.
+
+class RowModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MessageOut(BaseModel):
+    message: str
+
+
+class CustomerOut(RowModel):
+    id: int
+    name: str
+    email: str
+    phone: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+
+class ServiceOut(RowModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    price: float
+    duration_minutes: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+
+class StaffOut(RowModel):
+    id: int
+    name: str
+    role: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+
+class AppointmentOut(RowModel):
+    id: int
+    customer_id: int
+    service_id: int
+    staff_id: int
+    scheduled_time: datetime
+    end_time: Optional[datetime] = None
+    status: str
+    completed_at: Optional[datetime] = None
+    cancelled_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    archived: Optional[bool] = None  # only set when archived rows were asked for
+
+
+class AppointmentDetailOut(AppointmentOut):
+    """An appointment with any `?expand=`ed relationships inlined."""
+    customer: Optional[CustomerOut] = None
+    service: Optional[ServiceOut] = None
+    staff: Optional[StaffOut] = None
+
+
+class PaymentOut(RowModel):
+    id: int
+    customer_id: int
+    appointment_id: int
+    amount: float
+    payment_date: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    idempotency_key: Optional[str] = None
+    status: Optional[str] = None
+    refunded_at: Optional[datetime] = None
+    archived: Optional[bool] = None  # only set when archived rows were asked for
+
+
+class InventoryOut(RowModel):
+    id: int
+    product_name: str
+    quantity: int
+    reorder_threshold: int
+    is_low_stock: bool
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+
+class AvailableSlotOut(BaseModel):
+    staff_id: int
+    staff_name: str
+    start: datetime
+    end: datetime
+
+
+class BulkBookingResultOut(BaseModel):
+    index: int
+    status: str
+    appointment_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class CompletionOut(BaseModel):
+    completed: list[int]
+    skipped: list[int]
+    inventory_consumed: dict[int, int]
+
+
+class RevenueReportOut(BaseModel):
+    period_start: date
+    service_id: Optional[int] = None
+    staff_id: Optional[int] = None
+    payments: int
+    amount_cents: int
+
+
+class UsageReportOut(BaseModel):
+    period_start: date
+    inventory_id: int
+    units: int
+
+
+class ChangeOut(BaseModel):
+    id: int
+    entity: str
+    entity_id: int
+    op: str
+    changed_at: datetime
+    data: Optional[dict] = None  # the row as it is now; None once deleted
+
+
+class ChangeFeedOut(BaseModel):
+    changes: list[ChangeOut]
+    next_cursor: int
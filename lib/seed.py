@@ -1,6 +1,5 @@
 from sqlalchemy.orm import Session
-from lib.config import SessionLocal, engine
-from lib.base import Base
+from lib.config import SessionLocal, create_schema
 from lib.models.customer import Customer
 from lib.models.service import Service
 from lib.models.staff import Staff
@@ -9,13 +8,12 @@ from lib.models.payment import Payment
 from lib.models.inventory import Inventory
 from lib.models.service_inventory import ServiceInventory
 from lib.models.appointment_inventory import AppointmentInventory
+from lib.rollups import rebuild_rollups
 from datetime import datetime
 
-# Ensure database tables exist
-Base.metadata.create_all(bind=engine)
-
 # Function to seed the database
 def seed_data():
+    create_schema()  # Ensure database tables exist
     db = SessionLocal()  # Initialize the database session
 
     # Clears existing data before seeding
@@ -96,6 +94,7 @@ def seed_data():
     # Add all data to session and commit
     db.add_all(customers + services + staff_members + inventory_items + appointments + payments + service_inventory_links + appointment_inventory_links)
     db.commit()
+    rebuild_rollups(db)
     db.close()
 
     print("✅ Database seeded successfully!")
@@ -0,0 +1,21 @@
+import json
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def json_default(value):
+    """JSON fallback for the column types our rows contain."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Serializes plain rows/dicts to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=json_default).encode()
@@ -0,0 +1,23 @@
+import logging
+import random
+import time
+from sqlalchemy import event
+
+logger = logging.getLogger("spa.slow_query")
+
+
+def install_slow_query_logger(engine, threshold_ms: float, sample_rate: float = 1.0):
+    """Logs statements slower than `threshold_ms`, keeping only a `sample_rate` fraction of them.
+
+    Replaces blanket `echo=True`: fast statements cost two perf_counter calls
+    and are never formatted or written.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def log_if_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        if elapsed_ms >= threshold_ms and random.random() < sample_rate:
+            logger.warning("Slow query (%.1f ms): %s | params=%r", elapsed_ms, statement, parameters)
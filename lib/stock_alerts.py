@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+from lib.broadcast import Broadcaster, publish_on_commit
+
+DEFAULT_REORDER_THRESHOLD = 5
+
+# Threshold-crossing events ("low_stock" / "restocked"), published after the change commits
+stock_events = Broadcaster()
+
+
+def queue_crossing(db: Session, inventory_id: int, was_low: bool, new_quantity: int, reorder_threshold: int):
+    """Records a threshold crossing on the session; it is published only if the transaction commits."""
+    is_low = new_quantity < reorder_threshold
+    if was_low == is_low:
+        return
+    publish_on_commit(db, stock_events, {
+        "type": "low_stock" if is_low else "restocked",
+        "inventory_id": inventory_id,
+        "quantity": new_quantity,
+        "reorder_threshold": reorder_threshold,
+        "at": datetime.utcnow().isoformat(),
+    })
@@ -0,0 +1,42 @@
+"""Optimistic concurrency for the mutable entities (customers, services, staff, inventory).
+
+Each of those models has a `version` column registered as the mapper's
+version_id_col, so every ORM UPDATE is a compare-and-swap:
+`UPDATE ... SET version = :new WHERE id = :id AND version = :loaded`.
+If another writer got there first the UPDATE matches no row, SQLAlchemy
+raises StaleDataError and we report a VersionConflictError instead of
+silently overwriting their change. Callers that know which version they
+edited (an HTTP If-Match header) pass it as `expected_version`.
+"""
+from sqlalchemy import Column, Integer
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+
+def version_column():
+    return Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class VersionConflictError(ValueError):
+    """The row changed since the caller read it."""
+
+    def __init__(self, entity: str, object_id: int, current_version: int = None):
+        detail = f" (now at version {current_version})" if current_version is not None else ""
+        super().__init__(f"{entity} {object_id} was modified by someone else{detail}; reload it and retry.")
+        self.current_version = current_version
+
+
+def check_version(obj, expected_version: int = None):
+    """Raises VersionConflictError if the caller edited an older version than the one loaded."""
+    if expected_version is not None and obj.version != expected_version:
+        raise VersionConflictError(type(obj).__name__, obj.id, obj.version)
+
+
+def commit_versioned(db: Session, obj):
+    """Commits, turning a lost compare-and-swap on `obj` (or any versioned row) into VersionConflictError."""
+    entity, object_id = type(obj).__name__, obj.id
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise VersionConflictError(entity, object_id)
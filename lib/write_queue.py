@@ -0,0 +1,125 @@
+"""Single-writer mutation queue with group commit (opt-in with SPA_WRITE_QUEUE=1).
+
+SQLite allows one writer at a time and syncs on every COMMIT, so many small
+concurrent transactions mostly wait on each other's locks and fsyncs. With
+the queue, mutating endpoints hand their model method to one writer thread
+instead. The writer opens a transaction, runs every mutation that is waiting
+(plus any arriving within SPA_GROUP_COMMIT_MS) in its own SAVEPOINT, commits
+once and then resolves each caller with its own result or exception.
+
+The model methods need no changes: each gets a Session joined to the
+writer's transaction with join_transaction_mode="create_savepoint", so their
+`commit()` releases the savepoint and their `rollback()` only undoes that one
+mutation. Nothing a caller sees is resolved before the group's COMMIT.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy.orm import Session
+
+WRITE_QUEUE_ENABLED = os.environ.get("SPA_WRITE_QUEUE") == "1"
+GROUP_COMMIT_MS = float(os.environ.get("SPA_GROUP_COMMIT_MS", "0"))  # extra wait for followers; 0 = take what is queued
+MAX_GROUP_SIZE = int(os.environ.get("SPA_GROUP_COMMIT_MAX", "256"))
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Runs `fn(session, *args)` mutations on one thread, committing them in groups."""
+
+    def __init__(self, engine, group_commit_ms: float = GROUP_COMMIT_MS, max_group_size: int = MAX_GROUP_SIZE):
+        self.engine = engine
+        self.group_commit_seconds = group_commit_ms / 1000
+        self.max_group_size = max_group_size
+        self.groups = 0
+        self.mutations = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spa-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Finishes the queued mutations, then stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn, *args) -> Future:
+        if self._thread is None:
+            raise RuntimeError("Write queue is not running")
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    async def run(self, fn, *args):
+        """Awaitable `submit`: the mutation's return value once its group has committed."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _next_group(self, first):
+        group = [first]
+        deadline = time.monotonic() + self.group_commit_seconds
+        while len(group) < self.max_group_size:
+            # Everything that queued up during the previous commit joins this one
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            group.append(item)
+        return group
+
+    def _run(self):
+        with self.engine.connect() as connection:
+            while (item := self._queue.get()) is not _STOP:
+                self._commit_group(connection, self._next_group(item))
+
+    def _commit_group(self, connection, group):
+        outcomes, deferred_events = [], []
+        try:
+            with connection.begin():
+                for future, fn, args in group:
+                    if not future.set_running_or_notify_cancel():
+                        outcomes.append(None)
+                        continue
+                    with Session(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False,
+                                 info={"deferred_events": deferred_events}) as session:
+                        try:
+                            outcomes.append((True, fn(session, *args)))
+                        except Exception as e:
+                            session.rollback()
+                            outcomes.append((False, e))
+        except Exception as e:
+            # The COMMIT itself failed: nothing in the group was written
+            for future, _, _ in group:
+                if future.running():
+                    future.set_exception(e)
+            return
+
+        self.groups += 1
+        self.mutations += len(group)
+        for publish, event in deferred_events:
+            publish(event)
+        for (future, _, _), outcome in zip(group, outcomes):
+            if outcome is None:
+                continue  # cancelled before it ran
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
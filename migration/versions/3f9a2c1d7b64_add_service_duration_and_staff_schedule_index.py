@@ -0,0 +1,40 @@
+"""Add service duration, appointment end time and staff schedule index
+
+Revision ID: 3f9a2c1d7b64
+Revises: 7d1202d03ac4
+Create Date: 2026-10-18 09:12:41.530214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c1d7b64'
+down_revision: Union[str, None] = '7d1202d03ac4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('services', sa.Column('duration_minutes', sa.Integer(), server_default='60', nullable=False))
+    op.add_column('appointments', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.create_index('ix_appointments_staff_id_scheduled_time', 'appointments', ['staff_id', 'scheduled_time'], unique=False)
+
+    # Backfill end times from each appointment's service duration
+    op.execute(
+        "UPDATE appointments SET end_time = datetime(scheduled_time, '+' || "
+        "(SELECT duration_minutes FROM services WHERE services.id = appointments.service_id) || ' minutes')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_appointments_staff_id_scheduled_time', table_name='appointments')
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_column('end_time')
+    with op.batch_alter_table('services') as batch_op:
+        batch_op.drop_column('duration_minutes')
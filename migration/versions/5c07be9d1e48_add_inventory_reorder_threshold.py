@@ -0,0 +1,34 @@
+"""Add inventory reorder threshold and low-stock flag
+
+Revision ID: 5c07be9d1e48
+Revises: a81e4f0c2d93
+Create Date: 2026-10-18 12:20:54.906127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c07be9d1e48'
+down_revision: Union[str, None] = 'a81e4f0c2d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('inventory', sa.Column('reorder_threshold', sa.Integer(), server_default='5', nullable=False))
+    op.add_column('inventory', sa.Column('is_low_stock', sa.Boolean(), server_default='0', nullable=False))
+    op.execute("UPDATE inventory SET is_low_stock = (quantity < reorder_threshold)")
+    op.create_index('ix_inventory_low_stock', 'inventory', ['is_low_stock'], unique=False, sqlite_where=sa.text('is_low_stock = 1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_low_stock', table_name='inventory')
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.drop_column('is_low_stock')
+        batch_op.drop_column('reorder_threshold')
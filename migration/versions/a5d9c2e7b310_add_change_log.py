@@ -0,0 +1,57 @@
+"""Add change log
+
+Revision ID: a5d9c2e7b310
+Revises: f3a6d2b8c417
+Create Date: 2026-10-18 17:12:40.581206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d9c2e7b310'
+down_revision: Union[str, None] = 'f3a6d2b8c417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same tables and triggers as lib.models.change. Note that batch_alter_table rebuilds a table
+# and loses its triggers, so later migrations doing that must recreate them.
+CHANGE_LOGGED_TABLES = (
+    'customers', 'services', 'staff', 'appointments', 'payments',
+    'inventory', 'service_inventory', 'appointment_inventory',
+)
+OPERATIONS = (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True,
+    )
+    op.create_index('ix_changes_entity_id', 'changes', ['entity', 'id'], unique=False)
+    for table in CHANGE_LOGGED_TABLES:
+        for change, row in OPERATIONS:
+            op.execute(
+                f"CREATE TRIGGER changes_{table}_{change} AFTER {change.upper()} ON {table} "
+                f"BEGIN INSERT INTO changes (entity, entity_id, op, changed_at) "
+                f"VALUES ('{table}', {row}.id, '{change}', strftime('%Y-%m-%d %H:%M:%f', 'now')); END"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in CHANGE_LOGGED_TABLES:
+        for change, _ in OPERATIONS:
+            op.execute(f"DROP TRIGGER IF EXISTS changes_{table}_{change}")
+    op.drop_index('ix_changes_entity_id', table_name='changes')
+    op.drop_table('changes')
@@ -0,0 +1,31 @@
+"""Add appointment status and completion time
+
+Revision ID: a81e4f0c2d93
+Revises: 3f9a2c1d7b64
+Create Date: 2026-10-18 11:03:27.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81e4f0c2d93'
+down_revision: Union[str, None] = '3f9a2c1d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('appointments', sa.Column('status', sa.String(), server_default='Scheduled', nullable=False))
+    op.add_column('appointments', sa.Column('completed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_column('completed_at')
+        batch_op.drop_column('status')
@@ -0,0 +1,44 @@
+"""Add hot-path indexes
+
+Revision ID: b6d3e8f1a2c4
+Revises: 5c07be9d1e48
+Create Date: 2026-10-18 13:58:12.402817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d3e8f1a2c4'
+down_revision: Union[str, None] = '5c07be9d1e48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_appointments_customer_id_scheduled_time', 'appointments', ['customer_id', 'scheduled_time'], unique=False)
+    op.create_index('ix_appointments_scheduled_time', 'appointments', ['scheduled_time'], unique=False)
+    op.create_index('ix_payments_customer_id_payment_date', 'payments', ['customer_id', 'payment_date'], unique=False)
+    op.create_index('ix_payments_appointment_id', 'payments', ['appointment_id'], unique=False)
+    op.create_index('ix_staff_role_name', 'staff', ['role', 'name'], unique=False)
+    op.create_index('ix_service_inventory_service_id_covering', 'service_inventory', ['service_id', 'inventory_id', 'quantity_used'], unique=False)
+    op.create_index('ix_service_inventory_inventory_id', 'service_inventory', ['inventory_id'], unique=False)
+    op.create_index('ix_appointment_inventory_appointment_id', 'appointment_inventory', ['appointment_id'], unique=False)
+    op.create_index('ix_appointment_inventory_inventory_id', 'appointment_inventory', ['inventory_id'], unique=False)
+    op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_appointment_inventory_inventory_id', table_name='appointment_inventory')
+    op.drop_index('ix_appointment_inventory_appointment_id', table_name='appointment_inventory')
+    op.drop_index('ix_service_inventory_inventory_id', table_name='service_inventory')
+    op.drop_index('ix_service_inventory_service_id_covering', table_name='service_inventory')
+    op.drop_index('ix_staff_role_name', table_name='staff')
+    op.drop_index('ix_payments_appointment_id', table_name='payments')
+    op.drop_index('ix_payments_customer_id_payment_date', table_name='payments')
+    op.drop_index('ix_appointments_scheduled_time', table_name='appointments')
+    op.drop_index('ix_appointments_customer_id_scheduled_time', table_name='appointments')
@@ -0,0 +1,95 @@
+"""Add archive tables and cancellation / refund statuses
+
+Revision ID: b9e4f1a6c823
+Revises: a5d9c2e7b310
+Create Date: 2026-10-18 18:05:13.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e4f1a6c823'
+down_revision: Union[str, None] = 'a5d9c2e7b310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('appointments', sa.Column('cancelled_at', sa.DateTime(), nullable=True))
+    op.add_column('payments', sa.Column('status', sa.String(), server_default='Paid', nullable=False))
+    op.add_column('payments', sa.Column('refunded_at', sa.DateTime(), nullable=True))
+
+    op.create_table(
+        'appointments_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=False),
+        sa.Column('staff_id', sa.Integer(), nullable=False),
+        sa.Column('scheduled_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('cancelled_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_appointments_archive_customer_id_scheduled_time', 'appointments_archive', ['customer_id', 'scheduled_time'], unique=False)
+    op.create_index('ix_appointments_archive_scheduled_time', 'appointments_archive', ['scheduled_time'], unique=False)
+
+    op.create_table(
+        'payments_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('payment_date', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('idempotency_key', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('refunded_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_payments_archive_customer_id_payment_date', 'payments_archive', ['customer_id', 'payment_date'], unique=False)
+    op.create_index('ix_payments_archive_appointment_id', 'payments_archive', ['appointment_id'], unique=False)
+
+    op.create_table(
+        'appointment_inventory_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=False),
+        sa.Column('inventory_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_used', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_appointment_inventory_archive_appointment_id', 'appointment_inventory_archive', ['appointment_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('appointment_inventory_archive')
+    op.drop_table('payments_archive')
+    op.drop_table('appointments_archive')
+
+    # batch_alter_table rebuilds the tables, which drops their change log triggers (a5d9c2e7b310)
+    with op.batch_alter_table('payments') as batch_op:
+        batch_op.drop_column('refunded_at')
+        batch_op.drop_column('status')
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_column('cancelled_at')
+    for table in ('appointments', 'payments'):
+        for change, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS changes_{table}_{change} AFTER {change.upper()} ON {table} "
+                f"BEGIN INSERT INTO changes (entity, entity_id, op, changed_at) "
+                f"VALUES ('{table}', {row}.id, '{change}', strftime('%Y-%m-%d %H:%M:%f', 'now')); END"
+            )
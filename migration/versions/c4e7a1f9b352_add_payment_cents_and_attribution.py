@@ -0,0 +1,78 @@
+"""Add payment cents and revenue attribution
+
+Revision ID: c4e7a1f9b352
+Revises: b9e4f1a6c823
+Create Date: 2026-10-18 20:41:27.905113
+
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a1f9b352'
+down_revision: Union[str, None] = 'b9e4f1a6c823'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    for table in ('payments', 'payments_archive'):
+        # SQLite cannot add a NOT NULL column without a default; existing rows are filled in below
+        op.add_column(table, sa.Column('amount_cents', sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column('service_id', sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column('staff_id', sa.Integer(), nullable=True))
+
+        # Attribute existing payments to their appointment as it is now, as the rollups did so far
+        for column in ('service_id', 'staff_id'):
+            op.execute(f"""
+                UPDATE {table} SET {column} = coalesce(
+                    (SELECT {column} FROM appointments WHERE appointments.id = {table}.appointment_id),
+                    (SELECT {column} FROM appointments_archive WHERE appointments_archive.id = {table}.appointment_id),
+                    0)
+            """)
+        # Same rounding as lib.models.rollup.to_cents
+        amounts = bind.execute(sa.text(f"SELECT id, amount FROM {table}")).all()
+        if amounts:
+            bind.execute(sa.text(f"UPDATE {table} SET amount_cents = :cents WHERE id = :id"), [
+                {"id": payment_id, "cents": int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))}
+                for payment_id, amount in amounts
+            ])
+
+    # Recompute revenue from the stored cents, the same aggregation as lib.rollups.rebuild_rollups
+    op.execute("DELETE FROM revenue_rollups")
+    for grain, modifier in (('day', ''), ('month', ", 'start of month'")):
+        op.execute(f"""
+            INSERT INTO revenue_rollups (grain, period_start, service_id, staff_id, payments, amount_cents)
+            SELECT '{grain}', date(payment_date{modifier}), service_id, staff_id, count(*), sum(amount_cents)
+            FROM (SELECT payment_date, service_id, staff_id, amount_cents, status FROM payments
+                  UNION ALL
+                  SELECT payment_date, service_id, staff_id, amount_cents, status FROM payments_archive)
+            WHERE payment_date IS NOT NULL AND status != 'Refunded'
+            GROUP BY 2, 3, 4
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('payments_archive') as batch_op:
+        batch_op.drop_column('staff_id')
+        batch_op.drop_column('service_id')
+        batch_op.drop_column('amount_cents')
+
+    # batch_alter_table rebuilds the table, which drops its change log triggers (a5d9c2e7b310)
+    with op.batch_alter_table('payments') as batch_op:
+        batch_op.drop_column('staff_id')
+        batch_op.drop_column('service_id')
+        batch_op.drop_column('amount_cents')
+    for change, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS changes_payments_{change} AFTER {change.upper()} ON payments "
+            f"BEGIN INSERT INTO changes (entity, entity_id, op, changed_at) "
+            f"VALUES ('payments', {row}.id, '{change}', strftime('%Y-%m-%d %H:%M:%f', 'now')); END"
+        )
@@ -0,0 +1,31 @@
+"""Add payment idempotency key
+
+Revision ID: d42f7a9c3e15
+Revises: b6d3e8f1a2c4
+Create Date: 2026-10-18 15:10:41.550291
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd42f7a9c3e15'
+down_revision: Union[str, None] = 'b6d3e8f1a2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payments', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+    op.create_index('ix_payments_idempotency_key', 'payments', ['idempotency_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_idempotency_key', table_name='payments')
+    with op.batch_alter_table('payments') as batch_op:
+        batch_op.drop_column('idempotency_key')
@@ -0,0 +1,28 @@
+"""Add service duration index
+
+Revision ID: e5b2d9a7c160
+Revises: c4e7a1f9b352
+Create Date: 2026-10-18 21:26:40.318552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2d9a7c160'
+down_revision: Union[str, None] = 'c4e7a1f9b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_services_duration_minutes', 'services', ['duration_minutes'], unique=False)
+    op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_services_duration_minutes', table_name='services')
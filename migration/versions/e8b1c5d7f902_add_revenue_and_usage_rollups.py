@@ -0,0 +1,63 @@
+"""Add revenue and usage rollups
+
+Revision ID: e8b1c5d7f902
+Revises: d42f7a9c3e15
+Create Date: 2026-10-18 15:52:07.118430
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b1c5d7f902'
+down_revision: Union[str, None] = 'd42f7a9c3e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'revenue_rollups',
+        sa.Column('grain', sa.String(), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=False),
+        sa.Column('staff_id', sa.Integer(), nullable=False),
+        sa.Column('payments', sa.Integer(), nullable=False),
+        sa.Column('amount_cents', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('grain', 'period_start', 'service_id', 'staff_id'),
+    )
+    op.create_table(
+        'usage_rollups',
+        sa.Column('grain', sa.String(), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('inventory_id', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('grain', 'period_start', 'inventory_id'),
+    )
+    # Backfill from existing rows, the same aggregation as lib.rollups.rebuild_rollups
+    for grain, modifier in (('day', ''), ('month', ", 'start of month'")):
+        op.execute(f"""
+            INSERT INTO revenue_rollups (grain, period_start, service_id, staff_id, payments, amount_cents)
+            SELECT '{grain}', date(p.payment_date{modifier}), coalesce(a.service_id, 0), coalesce(a.staff_id, 0),
+                   count(*), sum(CAST(p.amount * 100 + 0.5 AS INTEGER))
+            FROM payments p LEFT OUTER JOIN appointments a ON a.id = p.appointment_id
+            WHERE p.payment_date IS NOT NULL
+            GROUP BY 2, 3, 4
+        """)
+        op.execute(f"""
+            INSERT INTO usage_rollups (grain, period_start, inventory_id, units)
+            SELECT '{grain}', date(created_at{modifier}), inventory_id, sum(quantity_used)
+            FROM appointment_inventory
+            WHERE created_at IS NOT NULL
+            GROUP BY 2, 3
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('usage_rollups')
+    op.drop_table('revenue_rollups')
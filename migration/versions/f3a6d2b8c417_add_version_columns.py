@@ -0,0 +1,33 @@
+"""Add version columns for optimistic concurrency
+
+Revision ID: f3a6d2b8c417
+Revises: e8b1c5d7f902
+Create Date: 2026-10-18 16:31:54.270913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a6d2b8c417'
+down_revision: Union[str, None] = 'e8b1c5d7f902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('customers', 'services', 'staff', 'inventory')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in VERSIONED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
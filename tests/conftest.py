@@ -0,0 +1,30 @@
+import os
+
+# Must be set before lib.config is imported: it picks the engine profile at import time
+os.environ.setdefault("SPA_DB_PROFILE", "test")
+
+import pytest
+from fastapi.testclient import TestClient
+from lib.base import Base
+from lib.cache import catalog_cache
+from lib.config import SessionLocal, create_schema, get_engine
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created in-memory schema, dropped again after the test."""
+    create_schema()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=get_engine())
+        catalog_cache.invalidate("services", "staff")  # cached rows of the dropped schema
+
+
+@pytest.fixture
+def client(db):
+    from app import app
+    with TestClient(app) as test_client:
+        yield test_client
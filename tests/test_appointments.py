@@ -0,0 +1,149 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from lib.base import Base
+from lib.config import build_engines
+from lib.models.appointment import Appointment, BookingConflictError
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+
+
+def book(client, customer_id, scheduled_time, service_id=1, staff_id=1):
+    response = client.post("/appointments/", params={
+        "customer_id": customer_id, "service_id": service_id, "staff_id": staff_id,
+        "scheduled_time": scheduled_time.isoformat(),
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def setup_catalog(db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Customer.create(db, "Bob", "bob@example.com", "0700000002")
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    Staff.register_staff(db, "Dave", "Therapist")
+    return (datetime.utcnow() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+
+def test_expand_keeps_appointments_whose_customer_was_deleted(client, db):
+    day = setup_catalog(db)
+    first = book(client, 1, day)
+    second = book(client, 2, day + timedelta(hours=2))
+    assert client.delete("/customers/1").status_code == 200
+
+    plain = client.get("/appointments/").json()
+    expanded = client.get("/appointments/", params={"expand": "customer,service,staff"}).json()
+    assert [a["id"] for a in expanded] == [a["id"] for a in plain] == [first["id"], second["id"]]
+    assert expanded[0]["customer"] is None and expanded[1]["customer"]["name"] == "Bob"
+
+    single = client.get(f"/appointments/{first['id']}", params={"expand": "customer"})
+    assert single.status_code == 200 and single.json()["customer"] is None
+
+    schedule = client.get("/appointments/schedule", params={"day": day.date().isoformat()}).json()
+    assert [a["id"] for a in schedule] == [first["id"], second["id"]]
+
+
+def test_overlapping_booking_is_rejected(client, db):
+    day = setup_catalog(db)
+    first = book(client, 1, day)
+
+    response = client.post("/appointments/", params={
+        "customer_id": 2, "service_id": 1, "staff_id": 1, "scheduled_time": (day + timedelta(minutes=30)).isoformat(),
+    })
+    assert response.status_code == 409
+    assert f"appointment {first['id']}" in response.json()["detail"]
+
+    # Back-to-back and other staff members' bookings don't overlap
+    book(client, 2, day + timedelta(minutes=60))
+    book(client, 2, day + timedelta(minutes=30), staff_id=2)
+    assert len(client.get("/appointments/").json()) == 3
+
+
+def test_concurrent_bookings_of_one_slot_let_exactly_one_through(tmp_path):
+    # Separate connections to a file database, as in dev/prod; the test profile shares one connection
+    url = f"sqlite:///{tmp_path / 'spa.db'}"
+    engine, _ = build_engines("dev", url, url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        day = setup_catalog(db)
+
+    workers = 8
+    barrier = threading.Barrier(workers)
+    results = []
+
+    def attempt(customer_id):
+        with Session(engine) as db:
+            barrier.wait()
+            try:
+                results.append(Appointment.book_appointment(db, customer_id, 1, 1, day).id)
+            except BookingConflictError:
+                results.append("conflict")
+
+    threads = [threading.Thread(target=attempt, args=(1 + i % 2,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    assert results.count("conflict") == workers - 1
+    assert len(results) == workers
+
+
+def bulk(client, requests, atomic=False):
+    response = client.post("/appointments/bulk", params={"atomic": atomic}, json=[
+        {"customer_id": customer_id, "service_id": 1, "staff_id": staff_id, "scheduled_time": scheduled_time.isoformat()}
+        for customer_id, staff_id, scheduled_time in requests
+    ])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_bulk_booking_rejects_overlaps_within_the_batch(client, db):
+    day = setup_catalog(db)
+    results = bulk(client, [(1, 1, day), (2, 1, day + timedelta(minutes=30)), (2, 2, day + timedelta(minutes=30))])
+
+    assert [r["status"] for r in results] == ["booked", "conflict", "booked"]
+    assert results[1]["detail"] == "Overlaps request 0 in this batch."
+    assert sorted(a["id"] for a in client.get("/appointments/").json()) == [results[0]["appointment_id"], results[2]["appointment_id"]]
+
+
+def test_bulk_booking_rejects_conflicts_with_stored_bookings(client, db):
+    day = setup_catalog(db)
+    stored = book(client, 1, day)
+    results = bulk(client, [(2, 1, day + timedelta(minutes=15)), (2, 1, day + timedelta(hours=1))])
+
+    assert [r["status"] for r in results] == ["conflict", "booked"]
+    assert results[0]["detail"] == f"Staff member is already booked (appointment {stored['id']})."
+    assert len(client.get("/appointments/").json()) == 2
+
+
+def test_atomic_bulk_booking_rolls_back_the_whole_batch(client, db):
+    day = setup_catalog(db)
+    stored = book(client, 1, day)
+    results = bulk(client, [(2, 2, day), (2, 1, day), (1, 2, day + timedelta(hours=2))], atomic=True)
+
+    assert [r["status"] for r in results] == ["not_booked", "conflict", "not_booked"]
+    assert all("appointment_id" not in r for r in results)
+    assert [a["id"] for a in client.get("/appointments/").json()] == [stored["id"]]
+
+
+def test_paging_by_scheduled_time_follows_x_next_after_id_through_ties(client, db):
+    day = setup_catalog(db)
+    # Booked out of time order, with two staff members at each of the first two times
+    booked = [book(client, 1, day + timedelta(hours=hours), staff_id=staff_id)["id"]
+              for hours, staff_id in ((4, 1), (0, 1), (0, 2), (2, 1), (2, 2))]
+
+    pages, after_id = [], None
+    while True:
+        params = {"order_by": "scheduled_time", "limit": 2, **({"after_id": after_id} if after_id else {})}
+        response = client.get("/appointments/", params=params)
+        pages.append([a["id"] for a in response.json()])
+        after_id = response.headers.get("X-Next-After-Id")
+        if after_id is None:
+            break
+        assert int(after_id) == pages[-1][-1]
+
+    assert pages == [[booked[1], booked[2]], [booked[3], booked[4]], [booked[0]]]
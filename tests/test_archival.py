@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from lib.archival import archive_closed
+from lib.models.appointment import STATUS_CANCELLED, STATUS_COMPLETED, Appointment
+from lib.models.customer import Customer
+from lib.models.payment import Payment
+from lib.models.service import Service
+from lib.models.staff import Staff
+
+
+def add_closed_history(db):
+    """Three closed appointments from last year, the first two paid for."""
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    start = (datetime.utcnow() - timedelta(days=400)).replace(hour=10, minute=0, second=0, microsecond=0)
+    for day, status in enumerate((STATUS_COMPLETED, STATUS_CANCELLED, STATUS_COMPLETED)):
+        scheduled_time = start + timedelta(days=day)
+        db.add(Appointment(customer_id=1, service_id=1, staff_id=1, scheduled_time=scheduled_time,
+                           end_time=scheduled_time + timedelta(hours=1), status=status))
+    db.flush()
+    for appointment_id in (1, 2):
+        db.add(Payment(customer_id=1, appointment_id=appointment_id, amount=80.0, payment_date=start))
+    db.commit()
+
+
+def ids(client, url, **params):
+    return [(row["id"], row.get("archived")) for row in client.get(url, params=params).json()]
+
+
+def test_archived_rows_leave_default_reads_but_not_include_archived(client, db):
+    add_closed_history(db)
+    totals = archive_closed(db, datetime.utcnow() - timedelta(days=30))
+
+    # The newest appointment and payment stay live so their ids are never handed out again
+    assert totals == {"appointments": 2, "payments": 1, "appointment_inventory": 0}
+    assert ids(client, "/appointments/") == [(3, None)]
+    assert ids(client, "/appointments/", include_archived=True) == [(1, True), (2, True), (3, False)]
+    assert ids(client, "/payments/") == [(2, None)]
+    assert ids(client, "/payments/", include_archived=True) == [(1, True), (2, False)]
+
+    assert client.get("/appointments/1").status_code == 404
+    archived = client.get("/appointments/1", params={"include_archived": True, "expand": "service"})
+    assert archived.status_code == 200
+    assert archived.json()["archived"] is True and archived.json()["service"]["name"] == "Massage"
+
+
+def test_change_feed_labels_archived_rows_as_archive(client, db):
+    add_closed_history(db)
+    since = client.get("/changes").json()["next_cursor"]
+    archive_closed(db, datetime.utcnow() - timedelta(days=30))
+
+    changes = client.get("/changes", params={"since": since}).json()["changes"]
+    assert [(c["entity"], c["entity_id"], c["op"], c["data"]) for c in changes] == [
+        ("payments", 1, "archive", None),
+        ("appointments", 1, "archive", None),
+        ("appointments", 2, "archive", None),
+    ]
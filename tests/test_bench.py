@@ -0,0 +1,36 @@
+import asyncio
+import json
+import os
+from sqlalchemy import func, select
+from lib.bench import DEFAULT_BASELINE_PATH, SCENARIOS, compare, prepare_dataset, run_benchmarks
+from lib.config import SessionLocal
+from lib.models.payment import Payment
+
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(__file__)), DEFAULT_BASELINE_PATH)
+SMALL_DATASET = {"customers": 200, "staff": 6, "days": 5, "seed": 42}
+
+
+def test_bench_scenarios_match_committed_baseline_query_counts(db):
+    with open(BASELINE) as f:
+        baseline = json.load(f)["results"]
+    assert set(baseline) == set(SCENARIOS)
+
+    results = asyncio.run(run_benchmarks(iterations=10, warmup=2, dataset=SMALL_DATASET))
+
+    # Latency depends on the machine; failed requests and extra queries per request don't
+    assert compare(results, baseline, threshold=float("inf")) == []
+
+
+def count_payments():
+    with SessionLocal() as session:
+        return session.scalar(select(func.count(Payment.id)))
+
+
+def test_bench_reseeds_the_dataset_before_each_run(db):
+    results = asyncio.run(run_benchmarks(["process_payment"], iterations=3, warmup=0, dataset=SMALL_DATASET))
+    assert results["process_payment"]["errors"] == 0
+    after_run = count_payments()
+
+    prepare_dataset(SMALL_DATASET)
+
+    assert count_payments() == after_run - 3
@@ -0,0 +1,35 @@
+from lib.models.service import Service
+from lib.models.staff import Staff
+
+
+def test_matching_if_none_match_gets_304(client, db):
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+
+    for url in ("/services/", "/staff/"):
+        first = client.get(url)
+        etag = first.headers["ETag"]
+        cached = client.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["ETag"] == etag
+        assert client.get(url, headers={"If-None-Match": '"stale"'}).json() == first.json()
+
+
+def test_writes_invalidate_the_cache_and_change_the_etag(client, db):
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    services_etag = client.get("/services/").headers["ETag"]
+    staff_etag = client.get("/staff/").headers["ETag"]
+
+    assert client.put("/services/1", params={"price": 95.0}).status_code == 200
+    response = client.get("/services/", headers={"If-None-Match": services_etag})
+    assert response.status_code == 200 and response.headers["ETag"] != services_etag
+    assert [s["price"] for s in response.json()] == [95.0]
+
+    assert client.post("/services/", params={"name": "Facial", "description": "Deep clean", "price": 60.0}).status_code == 200
+    assert [s["name"] for s in client.get("/services/").json()] == ["Massage", "Facial"]
+
+    assert client.put("/staff/1", params={"role": "Receptionist"}).status_code == 200
+    response = client.get("/staff/", headers={"If-None-Match": staff_etag})
+    assert response.status_code == 200 and response.headers["ETag"] != staff_etag
+    assert [s["role"] for s in response.json()] == ["Receptionist"]
@@ -0,0 +1,27 @@
+from lib.models.customer import Customer
+from lib.models.inventory import Inventory
+
+
+def feed(client, **params):
+    response = client.get("/changes", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_long_poll_cursor_advances_past_changes_the_entity_filter_skips(client, db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Inventory.add_product(db, "Oil", 10, 5)
+    Inventory.add_product(db, "Towels", 40, 5)
+
+    page = feed(client, since=0, entity="customers")
+    assert [(c["entity"], c["op"]) for c in page["changes"]] == [("customers", "insert")]
+    assert page["next_cursor"] == 3
+
+    Inventory.set_stock(db, 1, 2)
+    page = feed(client, since=page["next_cursor"], entity="customers", wait=0.2)
+    assert page == {"changes": [], "next_cursor": 4}
+
+    Customer.update_info(db, 1, phone="0700000009")
+    page = feed(client, since=page["next_cursor"], entity="customers", wait=1)
+    assert [(c["id"], c["op"], c["data"]["phone"]) for c in page["changes"]] == [(5, "update", "0700000009")]
+    assert page["next_cursor"] == 5
@@ -0,0 +1,9 @@
+from lib.import_budget import check_import_budget
+
+
+def test_entry_points_import_within_budget_and_lazily():
+    results, failures = check_import_budget(runs=3)
+    assert not failures, "\n".join(
+        f"{module}: {own_ms:.0f} ms of {budget_ms:.0f} ms" + ("" if lazy else ", built an engine at import")
+        for module, (_, own_ms, budget_ms, lazy) in results.items() if module in failures
+    )
@@ -0,0 +1,50 @@
+import json
+from sqlalchemy import select
+from lib.importer import import_file
+from lib.models.customer import Customer
+
+
+def customers(db):
+    stmt = select(Customer.email, Customer.name, Customer.phone, Customer.version).order_by(Customer.id)
+    return [tuple(row) for row in db.execute(stmt)]
+
+
+def test_customer_import_upserts_on_email(db, tmp_path):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    path = tmp_path / "customers.csv"
+    path.write_text(
+        "name,email,phone\n"
+        "Alice Smith,alice@example.com,0700000009\n"
+        "Bob,bob@example.com,0700000002\n"
+        "Bobby,bob@example.com,0700000003\n"
+    )
+
+    summary = import_file(db, "customers", str(path))
+
+    assert summary == {"imported": 2, "rejected": 0, "rejects_path": None}
+    assert customers(db) == [
+        ("alice@example.com", "Alice Smith", "0700000009", 2),  # updated in place, version bumped
+        ("bob@example.com", "Bobby", "0700000003", 1),  # last occurrence in the file wins
+    ]
+
+
+def test_invalid_rows_go_to_the_rejects_file(db, tmp_path):
+    path = tmp_path / "customers.ndjson"
+    path.write_text("\n".join([
+        json.dumps({"name": "Alice", "email": "alice@example.com", "phone": "0700000001"}),
+        json.dumps({"name": "Bob", "phone": "0700000002"}),
+        json.dumps({"name": "Carol", "email": "carol.example.com", "phone": "0700000003"}),
+        "{not json",
+    ]) + "\n")
+
+    summary = import_file(db, "customers", str(path), chunk_size=2)
+
+    assert summary == {"imported": 1, "rejected": 3, "rejects_path": f"{path}.rejected.ndjson"}
+    rejects = [json.loads(line) for line in open(summary["rejects_path"])]
+    assert [(r["line"], r["reason"]) for r in rejects] == [
+        (2, "email is required"),
+        (3, "email is not a valid email"),
+        (4, "unreadable line (Expecting property name enclosed in double quotes: line 1 column 2 (char 1))"),
+    ]
+    assert rejects[0]["record"] == {"name": "Bob", "phone": "0700000002"} and rejects[2]["record"] is None
+    assert [email for email, *_ in customers(db)] == ["alice@example.com"]
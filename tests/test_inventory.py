@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from lib.models.appointment import STATUS_SCHEDULED, Appointment
+from lib.models.appointment_inventory import AppointmentInventory
+from lib.models.customer import Customer
+from lib.models.inventory import Inventory
+from lib.models.service import Service
+from lib.models.service_inventory import ServiceInventory
+from lib.models.staff import Staff
+from lib.stock_alerts import stock_events
+
+
+def setup_service_with_materials(db, oil_quantity, oil_threshold=5):
+    """A massage using 2 oil and 1 towel, booked twice; returns the appointment ids."""
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    Inventory.add_product(db, "Oil", oil_quantity, oil_threshold)
+    Inventory.add_product(db, "Towels", 10, 0)
+    ServiceInventory.link_service_to_inventory(db, 1, 1, 2)
+    ServiceInventory.link_service_to_inventory(db, 1, 2, 1)
+    start = (datetime.utcnow() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+    return [Appointment.book_appointment(db, 1, 1, 1, start + timedelta(hours=hour)).id for hour in (0, 2)]
+
+
+def stock(db):
+    return dict(db.execute(select(Inventory.product_name, Inventory.quantity).execution_options(populate_existing=True)).all())
+
+
+def test_insufficient_stock_rolls_back_the_status_change(client, db):
+    appointment_ids = setup_service_with_materials(db, oil_quantity=3)
+
+    response = client.post("/appointments/complete", json=appointment_ids)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Not enough stock available: item 1 (needs 4)"
+
+    db.expire_all()
+    assert [db.get(Appointment, i).status for i in appointment_ids] == [STATUS_SCHEDULED, STATUS_SCHEDULED]
+    assert stock(db) == {"Oil": 3, "Towels": 10}
+    assert db.scalar(select(func.count(AppointmentInventory.id))) == 0
+
+    # There is enough stock for one of them on its own
+    result = client.post("/appointments/complete", json=appointment_ids[:1]).json()
+    assert result == {"completed": appointment_ids[:1], "skipped": [], "inventory_consumed": {"1": 2, "2": 1}}
+    assert stock(db) == {"Oil": 1, "Towels": 9}
+
+
+def test_crossing_the_reorder_threshold_flags_low_stock_and_publishes_one_event(client, db):
+    appointment_ids = setup_service_with_materials(db, oil_quantity=6, oil_threshold=5)
+    published = []
+    stock_events.add_listener(published.append)
+    try:
+        client.post("/appointments/complete", json=appointment_ids[:1])  # 6 -> 4 crosses below 5
+        client.post("/appointments/complete", json=appointment_ids[1:])  # 4 -> 2 was already low
+        assert [(e["type"], e["inventory_id"], e["quantity"]) for e in published] == [("low_stock", 1, 4)]
+        assert [item["product_name"] for item in client.get("/inventory/low-stock/").json()] == ["Oil"]
+
+        client.put("/inventory/1", params={"quantity": 8})
+        assert [e["type"] for e in published] == ["low_stock", "restocked"]
+    finally:
+        stock_events.remove_listener(published.append)
+
+    db.expire_all()
+    assert db.get(Inventory, 1).is_low_stock is False
+    assert client.get("/inventory/low-stock/").json() == []
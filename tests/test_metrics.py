@@ -0,0 +1,25 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from lib.metrics import install_engine_metrics, render
+
+
+def pool_metrics(name):
+    return [line for line in render().splitlines() if f'engine="{name}"' in line and ("checked_out" in line or "_count" in line)]
+
+
+def test_pool_metrics_follow_checkouts_on_static_pools_and_across_dispose():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    install_engine_metrics(engine, "metrics-test")
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert 'spa_db_pool_checked_out{engine="metrics-test"} 1' in pool_metrics("metrics-test")
+
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert pool_metrics("metrics-test") == [
+        'spa_db_pool_checkout_seconds_count{engine="metrics-test"} 2',
+        'spa_db_pool_checked_out{engine="metrics-test"} 0',
+    ]
@@ -0,0 +1,34 @@
+import os
+import shutil
+import sqlite3
+from alembic import command
+from alembic.config import Config
+from lib.models.change import CHANGE_LOGGED_TABLES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Databases created before the migrations were usable are at this revision (see README)
+BASELINE_REVISION = "7d1202d03ac4"
+
+
+def test_upgrade_head_installs_the_change_log_triggers(tmp_path):
+    path = tmp_path / "spa.db"
+    shutil.copy(os.path.join(ROOT, "rejuvenate_spa.db"), path)
+    # No ini file: its logging section would reconfigure (and silence) the test run's loggers
+    config = Config()
+    config.set_main_option("script_location", os.path.join(ROOT, "migration"))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+    connection = sqlite3.connect(path)
+    triggers = {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert triggers == {f"changes_{table}_{op}" for table in CHANGE_LOGGED_TABLES for op in ("insert", "update", "delete")}
+
+    since = connection.execute("SELECT coalesce(max(id), 0) FROM changes").fetchone()[0]
+    customer_id = connection.execute(
+        "INSERT INTO customers (name, email, phone) VALUES ('Test', 'migration-test@example.com', '0700000001')"
+    ).lastrowid
+    assert connection.execute("SELECT entity, entity_id, op FROM changes WHERE id > ?", (since,)).fetchall() == [
+        ("customers", customer_id, "insert"),
+    ]
+    connection.close()
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from lib.models.appointment import Appointment
+from lib.models.customer import Customer
+from lib.models.payment import Payment
+from lib.models.service import Service
+from lib.models.staff import Staff
+
+
+def setup_appointment(db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    start = (datetime.utcnow() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+    return Appointment.book_appointment(db, 1, 1, 1, start).id
+
+
+def pay(client, appointment_id, amount, key):
+    return client.post("/payments/", params={"customer_id": 1, "appointment_id": appointment_id, "amount": amount},
+                       headers={"Idempotency-Key": key})
+
+
+def test_retry_with_the_same_idempotency_key_returns_the_original_payment(client, db):
+    appointment_id = setup_appointment(db)
+    first = pay(client, appointment_id, 80.0, "retry-1")
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+
+    retry = pay(client, appointment_id, 80.0, "retry-1")
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(client.get("/payments/").json()) == 1
+
+
+def test_idempotency_key_reused_with_a_different_amount_is_a_conflict(client, db):
+    appointment_id = setup_appointment(db)
+    first = pay(client, appointment_id, 80.0, "retry-2").json()
+
+    response = pay(client, appointment_id, 60.0, "retry-2")
+    assert response.status_code == 409
+    assert f"payment {first['id']}" in response.json()["detail"]
+    assert [p["amount"] for p in client.get("/payments/").json()] == [80.0]
+
+
+def test_paging_by_payment_date_passes_rows_without_a_date(client, db):
+    appointment_id = setup_appointment(db)
+    ids = [Payment.process_payment(db, 1, appointment_id, 10.0 + i)["payment"].id for i in range(5)]
+    db.execute(update(Payment).where(Payment.id.in_([ids[1], ids[3]])).values(payment_date=None))
+    db.commit()
+
+    pages, after_id = [], None
+    while True:
+        params = {"order_by": "payment_date", "limit": 2, **({"after_id": after_id} if after_id else {})}
+        response = client.get("/payments/", params=params)
+        assert response.status_code == 200, response.text
+        pages.append([p["id"] for p in response.json()])
+        after_id = response.headers.get("X-Next-After-Id")
+        if after_id is None:
+            break
+
+    # Rows without a date sort first; a cursor on one of them still pages on
+    assert pages == [[ids[1], ids[3]], [ids[0], ids[2]], [ids[4]]]
@@ -0,0 +1,12 @@
+from datetime import date
+from lib.datagen import generate
+from lib.query_plans import check_query_plans
+
+
+def test_hot_queries_use_indexes(db):
+    # Enough rows, with realistic statistics, that the planner picks what it would in production
+    generate(db, customers=500, staff=16, days=30, start=date(2030, 1, 1))
+    db.connection().exec_driver_sql("ANALYZE")
+
+    plans, failures = check_query_plans(db)
+    assert not failures, "\n".join(f"{name}: {plans[name]}" for name in failures)
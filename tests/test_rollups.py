@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from lib.models.appointment import Appointment
+from lib.models.customer import Customer
+from lib.models.payment import Payment
+from lib.models.rollup import RevenueRollup, to_cents
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.rollups import rebuild_rollups
+
+
+def rollup_rows(db):
+    rows = db.execute(select(RevenueRollup.__table__).order_by(*RevenueRollup.__table__.primary_key.columns)).mappings()
+    return [dict(row) for row in rows if row["payments"] or row["amount_cents"]]
+
+
+def test_to_cents_rounds_the_written_amount():
+    assert to_cents(1.005) == 101
+    assert to_cents(0.285) == 29
+    assert to_cents(40.0) == 4000
+    assert to_cents(-1.005) == -101
+
+
+def test_refund_after_reschedule_matches_rebuild(db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Service.add_service(db, "Massage", "Full body", 40.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    Staff.register_staff(db, "Dana", "Therapist")
+    start = (datetime.utcnow() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+    appointment = Appointment.book_appointment(db, 1, 1, 1, start)
+
+    payment = Payment.process_payment(db, 1, appointment.id, 40.0)["payment"]
+    assert (payment.amount_cents, payment.service_id, payment.staff_id) == (4000, 1, 1)
+    Appointment.reschedule(db, appointment.id, start + timedelta(hours=3), staff_id=2)
+    Payment.refund(db, payment.id)
+    assert rollup_rows(db) == []
+
+    Payment.process_payment(db, 1, appointment.id, 1.005)
+    incremental = rollup_rows(db)
+    assert {(row["staff_id"], row["amount_cents"]) for row in incremental} == {(2, 101)}
+    rebuild_rollups(db)
+    assert rollup_rows(db) == incremental
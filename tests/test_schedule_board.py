@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from lib.config import get_engine
+from lib.models.appointment import Appointment
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.schedule_board import schedule_events
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(get_engine(), "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", record)
+
+
+def setup_catalog(db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    return (datetime.utcnow() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+
+def test_booking_loads_nothing_for_the_board_without_subscribers(db):
+    start = setup_catalog(db)
+    with count_statements() as unobserved:
+        Appointment.book_appointment(db, 1, 1, 1, start)
+
+    received = []
+    schedule_events.add_listener(received.append)
+    try:
+        with count_statements() as observed:
+            Appointment.book_appointment(db, 1, 1, 1, start + timedelta(hours=2))
+    finally:
+        schedule_events.remove_listener(received.append)
+
+    # The board payload costs the customer and staff lookups; the service was already loaded
+    assert len(observed) == len(unobserved) + 2
+    assert [e["type"] for e in received] == ["booked"]
+    assert '"name": "Alice"' in received[0]["message"] and '"name": "Massage"' in received[0]["message"]
+
+
+def test_rolled_back_booking_publishes_nothing(db):
+    start = setup_catalog(db)
+    received = []
+    schedule_events.add_listener(received.append)
+    try:
+        Appointment.add_booking(db, 1, 1, 1, start)
+        db.rollback()
+        Appointment.cancel_appointment(db, Appointment.book_appointment(db, 1, 1, 1, start).id)
+    finally:
+        schedule_events.remove_listener(received.append)
+    assert [e["type"] for e in received] == ["booked", "cancelled"]
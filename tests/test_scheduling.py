@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+from lib.models.appointment import Appointment
+from lib.models.customer import Customer
+from lib.models.service import Service
+from lib.models.staff import Staff
+from lib.scheduling import load_busy_intervals
+
+
+def test_available_slots_merge_therapists_around_existing_bookings(client, db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Service.add_service(db, "Massage", "Full body", 80.0, 60)
+    Staff.register_staff(db, "Carol", "Therapist")
+    Staff.register_staff(db, "Dave", "Therapist")
+    Staff.register_staff(db, "Erin", "Receptionist")
+    opening = (datetime.utcnow() + timedelta(days=2)).replace(hour=9, minute=0, second=0, microsecond=0)
+    # Carol back to back 9:00-11:00, Dave 9:30-10:30
+    for staff_id, offset in ((1, 0), (1, 60), (2, 30)):
+        Appointment.book_appointment(db, 1, 1, staff_id, opening + timedelta(minutes=offset))
+
+    busy = load_busy_intervals(db, [1, 2], opening, opening + timedelta(hours=3))
+    assert busy == {
+        1: [[opening, opening + timedelta(hours=2)]],
+        2: [[opening + timedelta(minutes=30), opening + timedelta(minutes=90)]],
+    }
+
+    response = client.get("/appointments/available-slots", params={
+        "service_id": 1, "start": opening.isoformat(), "end": (opening + timedelta(hours=3)).isoformat(),
+    })
+    assert response.status_code == 200
+    assert [(slot["staff_name"], slot["start"][11:16]) for slot in response.json()] == [
+        ("Dave", "10:30"), ("Dave", "10:45"), ("Carol", "11:00"), ("Dave", "11:00"),
+    ]
@@ -0,0 +1,30 @@
+from lib.models.customer import Customer
+from lib.models.inventory import Inventory
+
+
+def test_update_with_matching_if_match_succeeds_and_returns_the_new_etag(client, db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    etag = client.get("/customers/alice@example.com").headers["ETag"]
+
+    response = client.put("/customers/1", params={"phone": "0700000009"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["phone"] == "0700000009"
+    assert response.headers["ETag"] != etag
+    assert response.headers["ETag"] == f'"{response.json()["version"]}"'
+    assert client.get("/customers/alice@example.com").headers["ETag"] == response.headers["ETag"]
+
+
+def test_update_with_stale_if_match_is_a_conflict(client, db):
+    Customer.create(db, "Alice", "alice@example.com", "0700000001")
+    Inventory.add_product(db, "Oil", 10, 5)
+    stale = client.get("/customers/alice@example.com").headers["ETag"]
+    assert client.put("/customers/1", params={"name": "Alicia"}, headers={"If-Match": stale}).status_code == 200
+
+    response = client.put("/customers/1", params={"phone": "0700000009"}, headers={"If-Match": stale})
+    assert response.status_code == 409
+    customer = client.get("/customers/alice@example.com").json()
+    assert (customer["name"], customer["phone"]) == ("Alicia", "0700000001")
+
+    current = client.put("/inventory/1", params={"quantity": 8}).headers["ETag"]
+    assert client.put("/inventory/1", params={"quantity": 3}, headers={"If-Match": '"1"'}).status_code == 409
+    assert client.put("/inventory/1", params={"quantity": 3}, headers={"If-Match": current}).status_code == 200
@@ -0,0 +1,56 @@
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from lib.base import Base
+from lib.config import build_engines
+from lib.models.customer import Customer
+from lib.models.inventory import Inventory
+from lib.stock_alerts import stock_events
+from lib.write_queue import WriteQueue
+
+
+def lower_stock_then_fail(db, product_id):
+    db.get(Inventory, product_id).apply_stock(db, quantity=1)  # queues a low_stock crossing
+    raise RuntimeError("card declined")
+
+
+def test_failed_write_rolls_back_only_its_savepoint_and_events_wait_for_commit(tmp_path):
+    url = f"sqlite:///{tmp_path / 'spa.db'}"
+    engine, _ = build_engines("dev", url, url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        product_id = Inventory.add_product(db, "Oil", 10, 5).id
+
+    published = []
+
+    def record(event):
+        # Runs on the writer thread; a separate connection only sees committed data
+        with engine.connect() as connection:
+            committed = connection.scalar(select(Inventory.quantity).where(Inventory.id == product_id))
+        published.append((event["type"], event["quantity"], committed))
+
+    stock_events.add_listener(record)
+    writer = WriteQueue(engine, group_commit_ms=200)
+    writer.start()
+    try:
+        futures = [
+            writer.submit(Customer.create, "Alice", "alice@example.com", "0700000001"),
+            writer.submit(lower_stock_then_fail, product_id),
+            writer.submit(Customer.create, "Alice again", "alice@example.com", "0700000002"),
+            writer.submit(Inventory.set_stock, product_id, 2),
+        ]
+        assert futures[0].result(timeout=5).email == "alice@example.com"
+        assert isinstance(futures[1].exception(timeout=5), RuntimeError)
+        assert isinstance(futures[2].exception(timeout=5), IntegrityError)
+        assert futures[3].result(timeout=5).quantity == 2
+    finally:
+        writer.stop()
+        stock_events.remove_listener(record)
+
+    assert writer.groups == 1 and writer.mutations == 4
+    # Only the successful set_stock's crossing is published, and only once it was committed;
+    # it still crossed, so the failed write's stock change was undone before it ran
+    assert published == [("low_stock", 2, 2)]
+    with Session(engine) as db:
+        assert db.scalars(select(Customer.name)).all() == ["Alice"]
+    engine.dispose()